@@ -1,8 +1,12 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as DjangoUserAdmin
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
+from datetime import timedelta
 from .models import User, Onboarding
-from .models import Upload, StyleProfile, CreditTransaction, ContentItem, ContentVersion
-from .models import GuidelinePillar, GuidelineSchedule
+from .models import Upload, UserCorpus, StyleProfile, CreditTransaction, ContentItem, ContentVersion
+from .models import GuidelinePillar, GuidelineSchedule, TopicSuggestion, Job, BatchItem, LLMCall
 from .utils import record_credit_change  # for the admin action
 
 
@@ -53,13 +57,21 @@ class OnboardingAdmin(admin.ModelAdmin):
 
 @admin.register(Upload)
 class UploadAdmin(admin.ModelAdmin):
-    list_display = ("user","file_type","bytes","created_at")
+    list_display = ("user","file_type","bytes","status","created_at")
+    list_filter = ("status",)
     search_fields = ("user__username","user__email")
 
+@admin.register(UserCorpus)
+class UserCorpusAdmin(admin.ModelAdmin):
+    list_display = ("user","length","content_hash","updated_at")
+    search_fields = ("user__username","user__email")
+    readonly_fields = ("text","length","segments","stats","content_hash","updated_at")
+
 @admin.register(StyleProfile)
 class StyleProfileAdmin(admin.ModelAdmin):
-    list_display = ("user","version","active","created_at")
+    list_display = ("user","version","active","prompt_tokens_est","created_at")
     list_filter = ("active",)
+    readonly_fields = ("compiled_prompts","prompt_tokens_est")
 
 @admin.register(CreditTransaction)
 class CreditTransactionAdmin(admin.ModelAdmin):
@@ -75,7 +87,8 @@ class ContentItemAdmin(admin.ModelAdmin):
 
 @admin.register(ContentVersion)
 class ContentVersionAdmin(admin.ModelAdmin):
-    list_display = ("content","version_no","created_at")
+    list_display = ("content","version_no","is_keyframe","created_at")
+    list_filter = ("is_keyframe",)
     search_fields = ("content__topic",)
 
 @admin.register(GuidelinePillar)
@@ -86,4 +99,89 @@ class GuidelinePillarAdmin(admin.ModelAdmin):
 @admin.register(GuidelineSchedule)
 class GuidelineScheduleAdmin(admin.ModelAdmin):
     list_display = ("user","day_of_week","pillar","notes")
-    list_filter = ("day_of_week",)
\ No newline at end of file
+    list_filter = ("day_of_week",)
+
+@admin.register(TopicSuggestion)
+class TopicSuggestionAdmin(admin.ModelAdmin):
+    list_display = ("user","target_date","pillar","rank","topic","used")
+    list_filter = ("used",)
+    search_fields = ("topic","user__username","user__email")
+
+class BatchItemInline(admin.TabularInline):
+    model = BatchItem
+    extra = 0
+    fields = ("target_date","status","content","error","updated_at")
+    readonly_fields = fields
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id","user","kind","status","progress","attempts","created_at","finished_at")
+    list_filter = ("kind","status")
+    search_fields = ("user__username","user__email")
+    readonly_fields = ("started_at","heartbeat_at","finished_at","locked_by")
+    inlines = [BatchItemInline]
+
+def _percentile(sorted_vals, pct):
+    if not sorted_vals:
+        return 0
+    k = min(len(sorted_vals) - 1, max(0, round(pct / 100 * (len(sorted_vals) - 1))))
+    return sorted_vals[k]
+
+@admin.register(LLMCall)
+class LLMCallAdmin(admin.ModelAdmin):
+    list_display = ("created_at","user","feature","model","prompt_tokens","completion_tokens","latency_ms","retries","outcome","cost_usd")
+    list_filter = ("feature","outcome","model")
+    search_fields = ("user__username","user__email")
+    date_hierarchy = "created_at"
+    change_list_template = "admin/accounts/llmcall/change_list.html"
+
+    def get_urls(self):
+        custom = [path("report/", self.admin_site.admin_view(self.report_view), name="accounts_llmcall_report")]
+        return custom + super().get_urls()
+
+    def report_view(self, request):
+        """p50/p95 latency, tokens and cost per feature over the last N days (?days=7)."""
+        try:
+            days = max(1, min(90, int(request.GET.get("days", 7))))
+        except ValueError:
+            days = 7
+        rows = LLMCall.objects.filter(created_at__gte=timezone.now() - timedelta(days=days)).values_list(
+            "feature", "latency_ms", "prompt_tokens", "completion_tokens", "cost_usd", "outcome"
+        )
+        by_feature = {}
+        for feature, latency, p_tok, c_tok, cost, outcome in rows.iterator():
+            f = by_feature.setdefault(feature, {"latencies": [], "calls": 0, "errors": 0, "cached": 0,
+                                                "prompt_tokens": 0, "completion_tokens": 0, "cost": 0})
+            f["calls"] += 1
+            f["errors"] += outcome == LLMCall.OUTCOME_ERROR
+            f["cached"] += outcome == LLMCall.OUTCOME_CACHED
+            if outcome == LLMCall.OUTCOME_OK:
+                f["latencies"].append(latency)  # cache hits would flatten the percentiles
+            f["prompt_tokens"] += p_tok
+            f["completion_tokens"] += c_tok
+            f["cost"] += cost
+
+        labels = dict(LLMCall.FEATURE_CHOICES)
+        report = []
+        for feature, f in sorted(by_feature.items()):
+            lat = sorted(f["latencies"])
+            upstream = f["calls"] - f["cached"]
+            report.append({
+                "feature": labels.get(feature, feature),
+                "calls": f["calls"],
+                "errors": f["errors"],
+                "cached": f["cached"],
+                "p50": _percentile(lat, 50),
+                "p95": _percentile(lat, 95),
+                "avg_prompt_tokens": round(f["prompt_tokens"] / upstream) if upstream else 0,
+                "avg_completion_tokens": round(f["completion_tokens"] / upstream) if upstream else 0,
+                "cost": f["cost"],
+            })
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": f"LLM usage by feature (last {days} days)",
+            "days": days,
+            "report": report,
+        }
+        return TemplateResponse(request, "admin/accounts/llmcall/report.html", context)
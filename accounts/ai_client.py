@@ -1,124 +1,334 @@
 import time
-from typing import List, Dict, Tuple
-from openai import OpenAI, APIConnectionError, RateLimitError, APIError
+import json
+from typing import Callable, List, Dict, Tuple, Iterator, Generator, Union
 from django.conf import settings
+from .clients import get_openai
+from .fanout import fan_out, submit
+from . import llm_cache, prompts, resilience, sections, structured, token_budget, usage
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
 MODEL = settings.OPENAI_MODEL
 
 # --- Backoff wrapper (handles 429s/transient errors) ---
-def _chat_with_backoff(messages: List[Dict], max_retries: int = 3, **kwargs):
-    delay = 1.5
-    last_err = None
-    for _ in range(max_retries):
-        try:
-            resp = client.chat.completions.create(
+# Retries, Retry-After, jitter and the circuit breaker live in resilience.call("openai", ...).
+def _chat_with_backoff(messages: List[Dict], cache: bool = False, feature: str = "other", response_format: dict = None,
+                       prompt_cache_key: str = None, cacheable: Callable[[str], bool] = None, **kwargs):
+    """
+    cache=True serves identical (model, messages, params) requests from the LLM cache and
+    coalesces concurrent duplicates into one upstream call. Off by default: only calls whose
+    answer should stay the same for the same input opt in, with `cacheable` rejecting replies
+    their parser can't use (so a malformed reply is retried, not replayed).
+    Every call (hit or miss) lands in the usage ledger under `feature`.
+    response_format and prompt_cache_key are sent to the API; prompt_cache_key only steers
+    upstream prefix caching, so it is not part of our cache key.
+    """
+    with usage.track(feature, MODEL) as stats:
+        if cache and llm_cache.enabled():
+            key = llm_cache.make_key(MODEL, messages, {**kwargs, "response_format": response_format})
+            ran = []
+
+            def call():
+                ran.append(True)
+                return _chat_uncached(messages, stats, response_format, prompt_cache_key, **kwargs)
+
+            content = llm_cache.cache.get_or_call(key, call, cacheable)
+            stats.cached = not ran
+            return content
+        return _chat_uncached(messages, stats, response_format, prompt_cache_key, **kwargs)
+
+def _is_json_object(raw: str) -> bool:
+    """`cacheable` check for calls whose reply is parsed with json.loads."""
+    try:
+        return isinstance(json.loads(raw), dict)
+    except ValueError:
+        return False
+
+def _upstream_params(response_format: dict = None, prompt_cache_key: str = None, **kwargs) -> dict:
+    """
+    Extra chat.completions.create arguments; every call path builds them here. A
+    max_completion_tokens cap is for visible output: reasoning models spend completion tokens
+    on thinking first, so OPENAI_REASONING_TOKENS is added on top.
+    """
+    params = dict(kwargs)
+    if "max_completion_tokens" in params:
+        params["max_completion_tokens"] += settings.OPENAI_REASONING_TOKENS
+    if response_format:
+        params["response_format"] = response_format
+    if prompt_cache_key:
+        params["prompt_cache_key"] = prompt_cache_key
+    return params
+
+def _chat_uncached(messages: List[Dict], stats=None, response_format: dict = None, prompt_cache_key: str = None, **kwargs):
+    extra = _upstream_params(response_format, prompt_cache_key, **kwargs)
+    resp = resilience.call(
+        "openai",
+        lambda: get_openai().chat.completions.create(model=MODEL, messages=messages, **extra),
+        stats=stats,
+    )
+    if stats is not None:
+        stats.add_usage(resp.usage)
+    return resp.choices[0].message.content or ""
+
+def _stream_chat_with_backoff(messages: List[Dict], feature: str = "other", prompt_cache_key: str = None, **kwargs) -> Iterator[str]:
+    """
+    Token-iterator variant of _chat_with_backoff: yields content deltas as they arrive.
+    Only opening the stream is retried; once text has been yielded a failure propagates,
+    since the caller has already shown it to the user.
+    """
+    with usage.track(feature, MODEL) as stats:
+        stream = resilience.call(
+            "openai",
+            lambda: get_openai().chat.completions.create(
                 model=MODEL,
                 messages=messages,
-            )
-            return resp.choices[0].message.content or ""
-        except (RateLimitError, APIConnectionError, APIError) as e:
-            last_err = e
-            time.sleep(delay)
-            delay *= 2
-    raise last_err or RuntimeError("OpenAI request failed")
+                stream=True,
+                stream_options={"include_usage": True},
+                **_upstream_params(prompt_cache_key=prompt_cache_key, **kwargs),
+            ),
+            stats=stats,
+        )
+        for chunk in stream:
+            if getattr(chunk, "usage", None):
+                stats.add_usage(chunk.usage)  # final chunk, empty choices
+            if not chunk.choices:
+                continue
+            text = chunk.choices[0].delta.content
+            if text:
+                yield text
 
 # --- Prompt builders ---
-def _style_blurb(style_summary: dict) -> str:
-    tone = ", ".join(style_summary.get("tone_adjectives", [])[:5]) or style_summary.get("onboarding_style_keywords","")
-    formality = style_summary.get("formality","neutral")
-    cadence = style_summary.get("cadence","")
-    vocab = style_summary.get("vocabulary_level","moderate")
-    do_rules = style_summary.get("style_do", [])[:6]
-    dont_rules = style_summary.get("style_dont", [])[:6]
-    sent_len = style_summary.get("avg_sentence_length", 14)
-    para_len = style_summary.get("avg_paragraph_length", 3)
-
-    do_txt = "; ".join(do_rules) if do_rules else ""
-    dont_txt = "; ".join(dont_rules) if dont_rules else ""
+# `style` is a StyleProfile (compiled prompts, shared prefix cache key) or a bare summary dict
+Style = Union["StyleProfile", dict]
 
-    return (
-        f"Imitate the user's style: tone={tone}; formality={formality}; cadence={cadence}; "
-        f"vocabulary={vocab}; avg_sentence_length≈{sent_len} words; avg_paragraph_length≈{para_len} sentences. "
-        f"Follow these DO rules: {do_txt}. Avoid these DON'Ts: {dont_txt}."
-    )
+def _system(kind: str, style: Style) -> str:
+    if isinstance(style, dict):
+        return prompts.compile_style_prompts(style)[kind]
+    return style.system_prompt(kind)
 
-def _blog_system(style_summary: dict) -> str:
-    return (
-        "You are an SEO blog writer. Write scannable, helpful blog posts between 800 to 1200 words with headings, bullets, and examples. "
-        + _style_blurb(style_summary)
-    )
+def _cache_key(style: Style):
+    return None if isinstance(style, dict) else style.prompt_cache_key
 
-def _linkedin_system(style_summary: dict) -> str:
-    return "You write concise LinkedIn posts with a strong hook and clear CTA. " + _style_blurb(style_summary)
-
-# --- Public functions (drop-in replacements for stubs) ---
+def _parse_topic_meta(raw: str, topic: str) -> dict:
+    # Very light guard against the model returning text not JSON—store as string if needed
+    try:
+        import json
+        meta_json = json.loads(raw)
+        if "keywords" in meta_json and isinstance(meta_json["keywords"], str):
+            meta_json["keywords"] = [k.strip() for k in meta_json["keywords"].split(",") if k.strip()]
+    except Exception:
+        meta_json = {"meta_title": topic, "meta_description": "", "keywords": []}
+    return meta_json
 
-def generate_blog(topic: str, style_summary: dict) -> Tuple[str, dict]:
-    sys = _blog_system(style_summary)
+def _blog_messages(topic: str, style: Style) -> List[Dict]:
     user = (
         f"Write an SEO-friendly blog draft between 800-1200 words for the topic: '{topic}'. "
         "Include: H1, 3–5 H2 sections, bullets, a short summary, and a CTA. "
         "Return pure markdown."
     )
-    content = _chat_with_backoff(
-        [{"role": "system", "content": sys}, {"role": "user", "content": user}],
+    return [{"role": "system", "content": _system("blog", style)}, {"role": "user", "content": user}]
+
+def _topic_meta_messages(topic: str) -> List[Dict]:
+    return [{"role": "system", "content": "You write SEO metadata only. Return valid JSON."},
+            {"role": "user", "content": f"Generate {{\"meta_title\",\"meta_description\",\"keywords\"}} for: {topic}"}]
+
+_DRAFT_JSON_RULES = (
+    "Return a JSON object with: body_md (the full draft as pure markdown), "
+    "meta_title (max 60 characters), meta_description (max 155 characters) and "
+    "keywords (array of up to 8 search terms actually covered by the draft)."
+)
+
+def _blog_structured_messages(topic: str, style: Style) -> List[Dict]:
+    user = (
+        f"Write an SEO-friendly blog draft between 800-1200 words for the topic: '{topic}'. "
+        "Include: H1, 3–5 H2 sections, bullets, a short summary, and a CTA. "
+        + _DRAFT_JSON_RULES
     )
-    meta = _chat_with_backoff(
-        [{"role": "system", "content": "You write SEO metadata only. Return valid JSON."},
-         {"role": "user", "content": f"Generate {{\"meta_title\",\"meta_description\",\"keywords\"}} for: {topic}"}],
+    return [{"role": "system", "content": _system("blog", style)}, {"role": "user", "content": user}]
+
+def _structured_draft(messages: List[Dict], feature: str, style: Style) -> Tuple[str, dict]:
+    """One call returning body and SEO meta, validated against structured.DRAFT_SCHEMA."""
+    raw = _chat_with_backoff(
+        messages,
+        cache=False,
+        feature=feature,
+        response_format=structured.response_format("draft", structured.DRAFT_SCHEMA),
+        prompt_cache_key=_cache_key(style),
     )
-    # Very light guard against the model returning text not JSON—store as string if needed
-    try:
-        import json
-        meta_json = json.loads(meta)
-        if "keywords" in meta_json and isinstance(meta_json["keywords"], str):
-            meta_json["keywords"] = [k.strip() for k in meta_json["keywords"].split(",") if k.strip()]
-    except Exception:
-        meta_json = {"meta_title": topic, "meta_description": "", "keywords": []}
-    return content, meta_json
+    data = structured.parse(raw, structured.DRAFT_SCHEMA)
+    meta = {k: data[k] for k in ("meta_title", "meta_description", "keywords")}
+    return data["body_md"], meta
 
-def generate_linkedin(topic: str, style_summary: dict) -> Tuple[str, dict]:
-    sys = _linkedin_system(style_summary)
+def _linkedin_messages(topic: str, style: Style) -> List[Dict]:
     user = (
         f"Write a LinkedIn post about '{topic}'. Hook in first line. 5–8 short lines total. "
         "End with a question. Include 3-5 relevant hashtags on the last line."
     )
-    content = _chat_with_backoff(
-        [{"role": "system", "content": sys}, {"role": "user", "content": user}],
-    )
+    return [{"role": "system", "content": _system("linkedin", style)}, {"role": "user", "content": user}]
+
+def _linkedin_meta(content: str) -> dict:
     # Extract hashtags to meta
     import re
     tags = re.findall(r"#\w+", content)
-    return content, {"hashtags": tags[:6]}
+    return {"hashtags": tags[:6]}
 
-def improve_content(item_type: str, prev_body: str, style_summary: dict, opts: dict) -> Tuple[str, dict]:
-    sys = _blog_system(style_summary) if item_type == "BLOG" else _linkedin_system(style_summary)
+def _improve_messages(item_type: str, prev_body: str, style: Style, opts: dict, structured_output: bool = False) -> List[Dict]:
+    sys = _system("blog", style) if item_type == "BLOG" else _system("linkedin", style)
     knobs = (
         f"Length={opts.get('length','medium')}, Tone={opts.get('tone','as_is')}, "
         f"Add example={opts.get('add_example', False)}, Add data={opts.get('add_data', False)}. "
         f"Note: {opts.get('custom_note','').strip()}"
     )
+    fmt = _DRAFT_JSON_RULES if structured_output else "Return the full revised content in the same format."
     user = (
         "Improve the following draft in-place without changing the core message. "
-        "Return the full revised content in the same format.\n\n"
+        f"{fmt}\n\n"
         f"Knobs: {knobs}\n\n---\n{prev_body}"
     )
+    return [{"role": "system", "content": sys}, {"role": "user", "content": user}]
+
+# --- Public functions (drop-in replacements for stubs) ---
+
+def generate_blog(topic: str, style: Style) -> Tuple[str, dict]:
+    if settings.AI_STRUCTURED_OUTPUT:
+        return _structured_draft(_blog_structured_messages(topic, style), "blog", style)
+    # Meta only needs the topic, so both calls run side by side: wall time = slower of the two
+    results = fan_out(
+        {
+            "body": lambda: _chat_with_backoff(
+                _blog_messages(topic, style), cache=False, feature="blog", prompt_cache_key=_cache_key(style)
+            ),
+            "meta": lambda: _chat_with_backoff(
+                _topic_meta_messages(topic), cache=True, cacheable=_is_json_object, feature="meta"
+            ),
+        },
+        deadline=settings.AI_FANOUT_DEADLINE,
+    )
+    content = results["body"]
+    if isinstance(content, BaseException):
+        raise content  # no draft, nothing to salvage
+
+    meta = results["meta"]
+    if isinstance(meta, BaseException):
+        # Partial result: keep the body, fall back to topic-based meta
+        meta = ""
+    return content, _parse_topic_meta(meta, topic)
+
+def generate_linkedin(topic: str, style: Style) -> Tuple[str, dict]:
     content = _chat_with_backoff(
-        [{"role": "system", "content": sys}, {"role": "user", "content": user}],
+        _linkedin_messages(topic, style), cache=False, feature="linkedin", prompt_cache_key=_cache_key(style)
     )
-    return content, {"improved": True, "knobs": opts}
+    return content, _linkedin_meta(content)
 
-def change_topic(item_type: str, new_topic: str, style_summary: dict) -> Tuple[str, dict]:
+def _improve_sections_messages(item_type: str, parts: List[Dict], targets: List[int], style: Style, opts: dict) -> List[Dict]:
+    sys = _system("blog", style) if item_type == "BLOG" else _system("linkedin", style)
+    knobs = (
+        f"Length={opts.get('length','medium')}, Tone={opts.get('tone','as_is')}, "
+        f"Add example={opts.get('add_example', False)}, Add data={opts.get('add_data', False)}. "
+        f"Note: {opts.get('custom_note','').strip()}"
+    )
+    chosen = "\n\n".join(f"<<<SECTION {i}>>>\n{parts[i]['text'].strip()}" for i in targets)
+    user = (
+        "Improve ONLY the sections given below; the rest of the draft stays as it is, so keep "
+        "each section consistent with the outline and don't repeat what other sections cover. "
+        "Keep every section's '## ' heading line unchanged and its markdown format. "
+        'Return JSON {"sections": [{"index": <section number>, "markdown": "<full revised section>"}]}, '
+        "one entry per section given.\n\n"
+        f"Knobs: {knobs}\n\n"
+        f"OUTLINE OF THE WHOLE DRAFT:\n{sections.outline(parts)}\n\n"
+        f"SECTIONS TO IMPROVE:\n{chosen}"
+    )
+    return [{"role": "system", "content": sys}, {"role": "user", "content": user}]
+
+def improve_sections(item_type: str, prev_body: str, style: Style, opts: dict, targets: List[int]) -> str:
+    """
+    Rewrites only the `targets` sections (accounts/sections.py) and returns the reassembled
+    body. Output tokens scale with the sections chosen, not the whole draft.
+    """
+    parts = sections.split(prev_body)
+    raw = _chat_with_backoff(
+        _improve_sections_messages(item_type, parts, targets, style, opts),
+        cache=False,
+        feature="improve",
+        response_format=structured.response_format("sections", structured.SECTIONS_SCHEMA),
+        prompt_cache_key=_cache_key(style),
+    )
+    data = structured.parse(raw, structured.SECTIONS_SCHEMA)
+    rewritten = {s["index"]: s["markdown"] for s in data["sections"] if s["index"] in targets and s["markdown"].strip()}
+    if not rewritten:
+        raise structured.StructuredOutputError("Model returned none of the requested sections.", raw=raw)
+    return sections.replace(parts, rewritten)
+
+def improve_content(item_type: str, prev_body: str, style: Style, opts: dict) -> Tuple[str, dict]:
+    """
+    Returns (new_body, meta). For blogs meta is fresh SEO meta for the new body. When the knobs
+    target some sections (sections.pick), only those are rewritten and meta is {}: the title and
+    most of the body are unchanged, so callers keep the previous version's meta.
+    """
+    targets = sections.pick(sections.split(prev_body), opts)
+    if targets:
+        return improve_sections(item_type, prev_body, style, opts, targets), {}
+    if item_type == "BLOG" and settings.AI_STRUCTURED_OUTPUT:
+        messages = _improve_messages(item_type, prev_body, style, opts, structured_output=True)
+        return _structured_draft(messages, "improve", style)
+    content = _chat_with_backoff(
+        _improve_messages(item_type, prev_body, style, opts),
+        cache=False, feature="improve", prompt_cache_key=_cache_key(style),
+    )
+    if item_type == "BLOG":
+        return content, generate_meta_from_body(content)
+    return content, _linkedin_meta(content)
+
+def change_topic(item_type: str, new_topic: str, style: Style) -> Tuple[str, dict]:
     return (
-        generate_blog(new_topic, style_summary)
+        generate_blog(new_topic, style)
         if item_type == "BLOG"
-        else generate_linkedin(new_topic, style_summary)
+        else generate_linkedin(new_topic, style)
+    )
+
+# --- Streaming variants ---
+# Each yields body chunks and *returns* the meta dict, so callers can use
+# `meta = yield from stream_...(...)` or catch StopIteration.value.
+
+def stream_blog(topic: str, style: Style) -> Generator[str, None, dict]:
+    # Meta runs in the background while the body streams
+    meta_future = submit(
+        _chat_with_backoff, _topic_meta_messages(topic), cache=True, cacheable=_is_json_object, feature="meta"
+    )
+    started = time.monotonic()
+    yield from _stream_chat_with_backoff(
+        _blog_messages(topic, style), feature="blog", prompt_cache_key=_cache_key(style)
+    )
+    try:
+        remaining = max(0.0, settings.AI_FANOUT_DEADLINE - (time.monotonic() - started))
+        meta = meta_future.result(timeout=remaining)
+    except Exception:
+        meta_future.cancel()
+        meta = ""
+    return _parse_topic_meta(meta, topic)
+
+def stream_linkedin(topic: str, style: Style) -> Generator[str, None, dict]:
+    parts = []
+    for text in _stream_chat_with_backoff(
+        _linkedin_messages(topic, style), feature="linkedin", prompt_cache_key=_cache_key(style)
+    ):
+        parts.append(text)
+        yield text
+    return _linkedin_meta("".join(parts))
+
+def stream_improve(item_type: str, prev_body: str, style: Style, opts: dict) -> Generator[str, None, dict]:
+    """A section-level improve (see improve_content) comes back as one chunk: the reassembled body."""
+    targets = sections.pick(sections.split(prev_body), opts)
+    if targets:
+        yield improve_sections(item_type, prev_body, style, opts, targets)
+        return {"improved": True, "knobs": opts, "sections": targets}
+    yield from _stream_chat_with_backoff(
+        _improve_messages(item_type, prev_body, style, opts), feature="improve", prompt_cache_key=_cache_key(style)
     )
+    return {"improved": True, "knobs": opts}
 
 def analyze_style_profile(corpus: str, onboarding_keywords: str = "") -> dict:
     """
-    Returns a JSON dict describing the user's style based on their uploads.
+    Returns a JSON dict describing the qualitative side of the user's style. Numeric metrics
+    (sentence/paragraph length, emoji/link usage, punctuation) are measured locally by stylometry.py.
     """
     sys = "You are a writing-style analyst. You read a corpus and output a compact JSON profile of how the author writes."
     user = f"""
@@ -126,17 +336,12 @@ def analyze_style_profile(corpus: str, onboarding_keywords: str = "") -> dict:
     - tone_adjectives: array of 3-7 adjectives
     - formality: one of ["casual","neutral","formal"]
     - cadence: description of rhythm/sentence flow (1-2 short phrases)
-    - avg_sentence_length: number (approx words)
-    - avg_paragraph_length: number (approx sentences)
     - sentence_patterns: array of 3-6 recurring patterns (e.g., asks rhetorical questions, starts with imperative)
-    - punctuation_habits: 2-4 notes
     - vocabulary_level: one of ["simple","moderate","advanced"]
     - jargon_domains: array of domain terms frequently used
     - thematic_pillars: array of 3-8 recurring themes/topics
     - hook_styles: array of 2-5 typical opening moves
     - call_to_action_styles: array of 2-4 CTA patterns
-    - emoji_usage: "none","light","moderate","heavy"
-    - link_usage: "rare","sometimes","frequent"
     - style_do: array of 5-10 "do" rules for imitating the style
     - style_dont: array of 5-10 "don't" rules to avoid
     - voice_summary: 1-2 sentence summary
@@ -151,8 +356,10 @@ def analyze_style_profile(corpus: str, onboarding_keywords: str = "") -> dict:
     """
     raw = _chat_with_backoff(
         [{"role": "system", "content": sys}, {"role": "user", "content": user}],
-        max_completion_tokens=900,
-
+        max_completion_tokens=700,
+        cache=True,
+        cacheable=_is_json_object,  # an unparseable analysis is retried, not replayed
+        feature="style",
     )
     import json
     try:
@@ -171,7 +378,7 @@ def generate_meta_from_body(body_md: str) -> dict:
     )
     raw = _chat_with_backoff(
         [{"role":"system","content":sys},{"role":"user","content":user}],
-        max_tokens=220, temperature=0.3
+        max_completion_tokens=220, cache=True, cacheable=_is_json_object, feature="meta",
     )
     import json
     try:
@@ -184,6 +391,48 @@ def generate_meta_from_body(body_md: str) -> dict:
     except Exception:
         return {}
 
+def plan_topics(days: List[Dict], context: Dict, per_day: int, avoid: List[str]) -> Dict[str, List[str]]:
+    """
+    Topic ideas for many days in one call. days: [{"date", "weekday", "pillar", "about",
+    "keywords"}, ...]; context: {"topics", "industry", "themes"}; avoid: topics already covered.
+    Returns {date: [topic, ...]}; days the model skipped are missing.
+    """
+    lines = []
+    for d in days:
+        line = f"- {d['date']} ({d['weekday']}): "
+        if d.get("pillar"):
+            line += f"pillar “{d['pillar']}”"
+            if d.get("about"):
+                line += f" — {d['about']}"
+            if d.get("keywords"):
+                line += f"; keywords: {', '.join(d['keywords'])}"
+        else:
+            line += "no pillar; pick from the general topics"
+        lines.append(line)
+    history = token_budget.truncate("\n".join(f"- {t}" for t in avoid), token_budget.budget("topic_history"))
+    sys = "You are a content strategist planning a creator's editorial calendar. Return VALID JSON."
+    user = (
+        f"Plan {per_day} distinct post topics for each day below. Each topic is a specific, "
+        "concrete working title (max 12 words), on that day's pillar when it has one. Vary the "
+        "angle across days (how-to, opinion, story, mistakes, checklist...). Never repeat or "
+        "closely rephrase a topic, within this plan or from the already-covered list.\n\n"
+        f"General topics: {', '.join(context.get('topics') or []) or 'n/a'}\n"
+        f"Industry: {context.get('industry') or 'n/a'}\n"
+        f"Recurring themes in their writing: {', '.join(context.get('themes') or []) or 'n/a'}\n\n"
+        "DAYS:\n" + "\n".join(lines) + "\n\n"
+        "ALREADY COVERED (do not reuse):\n" + (history or "- none") + "\n\n"
+        'Return {"days": [{"date": "YYYY-MM-DD", "topics": ["...", ...]}, ...]} with one entry per day.'
+    )
+    raw = _chat_with_backoff(
+        [{"role": "system", "content": sys}, {"role": "user", "content": user}],
+        cache=False,  # a re-plan should bring new ideas
+        feature="topics",
+        response_format=structured.response_format("topic_plan", structured.TOPIC_PLAN_SCHEMA),
+        max_completion_tokens=40 * per_day * len(days) + 100,
+    )
+    data = structured.parse(raw, structured.TOPIC_PLAN_SCHEMA)
+    return {d["date"]: [t.strip() for t in d["topics"] if t.strip()] for d in data["days"]}
+
 # --- Image search term suggestion (for banner ideas) ---
 def suggest_image_search_term(body_md: str, item_type: str, topic: str) -> str:
     """
@@ -196,42 +445,44 @@ def suggest_image_search_term(body_md: str, item_type: str, topic: str) -> str:
         "From the draft (markdown) below, produce ONE search phrase (3 words) "
         "that a designer would use to find banner/hero images. "
         "Avoid quotes. No punctuation. No hashtags.\n\n"
-        f"{(body_md or '')[:4000]}"
+        f"{token_budget.fit(body_md, 'image_term_body')}"
     )
     q = _chat_with_backoff(
         [{"role": "system", "content": sys}, {"role": "user", "content": user}],
+        cache=True,
+        feature="image_term",
     )
     # sanitize a bit
     return (q or "").strip().strip('"').replace("#", "")
 
-def generate_style_fun_facts(style_summary: dict, corpus_text: str) -> list[str]:
+def generate_style_fun_facts(style_summary: dict, corpus_text: str, count: int = 10) -> list[str]:
     """
-    Returns up to 10 short, playful, *user-specific* fun facts about the user's writing.
+    Returns up to `count` short, playful, *user-specific* qualitative fun facts about the
+    user's writing (cadence, tone, comparisons). Stats-based facts are computed locally
+    (stylometry.fun_facts), so this is only called to top those up.
     Each fact must be <= 120 chars and standalone (no numbering).
     Keep it light; do not reveal sensitive info beyond writing analysis.
     If input is too small/empty, return [].
     """
     # Require some signal to avoid hallucinations
-    if not (corpus_text and corpus_text.strip()):
+    if count <= 0 or not (corpus_text and corpus_text.strip()):
         return []
 
     # Trim LARGE corpora to keep tokens sane
-    sample = corpus_text[:12000]
+    sample = token_budget.fit(corpus_text, "fun_facts_corpus")
 
     sys = (
         "You are an assistant that analyzes a user's writing style and returns playful, factual observations. "
-        "Focus on text stats (common words, avg sentence length), tone, pacing, themes, rhetorical habits, "
+        "Focus on tone, pacing, themes, rhetorical habits, "
         "and *light* comparisons (e.g., 'similar to [public figure]' only if stylistically plausible). "
         "It is okay to include a humorous zodiac guess as a **guess**, clearly marked as playful."
     )
     user = (
-        "Given the user's writing sample and a prior style summary JSON, output EXACTLY 10 bullet lines, "
-        "each <= 120 characters, with no numbering. Use concise statements. Examples:\n"
-        "- Your most used noun is “growth”.\n"
-        "- Avg sentence length: 17 words.\n"
-        "- You ask 1.3 questions per 100 words.\n"
-        "- You love em dashes — a lot.\n"
+        f"Given the user's writing sample and a prior style summary JSON, output EXACTLY {count} lines, "
+        "each <= 120 characters, with no numbering. Use concise statements. Word counts, sentence "
+        "lengths and punctuation statistics are already covered: do NOT give numbers. Examples:\n"
         "- Your cadence is closest to [Famous Person].\n"
+        "- You open with a bold claim, then earn it.\n"
         "- Playful guess: Your zodiac vibe: Virgo.\n\n"
         f"STYLE SUMMARY:\n{style_summary}\n\n"
         "WRITING SAMPLE (markdown/plain):\n"
@@ -241,13 +492,14 @@ def generate_style_fun_facts(style_summary: dict, corpus_text: str) -> list[str]
 
     raw = _chat_with_backoff(
         [{"role": "system", "content": sys}, {"role": "user", "content": user}],
-        max_completion_tokens=500,
-        temperature=0.7,
+        max_completion_tokens=50 * count + 50,
+        cache=False,  # playful output; a fresh take each time is the point
+        feature="fun_facts",
     )
     if not raw:
         return []
     lines = [ln.strip(" -•\t") for ln in raw.splitlines() if ln.strip()]
-    # keep first 10, trim overly long lines defensively
-    facts = [ln[:120] for ln in lines][:10]
+    # keep the first `count`, trim overly long lines defensively
+    facts = [ln[:120] for ln in lines][:count]
     # return whatever we have, even if only 1–2 lines
     return facts
\ No newline at end of file
@@ -0,0 +1,163 @@
+import importlib.util
+import threading
+
+import httpx
+import requests
+from django.conf import settings
+from openai import OpenAI
+from requests.adapters import HTTPAdapter
+
+# One pooled, keep-alive client per upstream per process, built on first use (after gunicorn
+# forks). Every call site goes through here instead of constructing its own client, so
+# TCP+TLS setup is paid once per connection rather than once per request.
+# Pools are sized by HTTP_POOL_SIZE: roughly the number of threads in a worker that can be
+# waiting on the same upstream at once (gunicorn threads + fan-out/batch pools).
+
+_lock = threading.Lock()
+_openai = None
+_sessions = {}
+_counters = {}  # service -> {"requests": n, "in_flight": n, "errors": n}
+
+# h2 ships with httpx[http2] (requirements.txt); installs without it fall back to HTTP/1.1
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+def _bump(service: str, name: str, delta: int = 1):
+    with _lock:
+        c = _counters.setdefault(service, {"requests": 0, "in_flight": 0, "errors": 0})
+        c[name] += delta
+
+
+def timeout(service: str):
+    """(connect, read) seconds for requests-based services."""
+    t = settings.HTTP_TIMEOUTS.get(service) or settings.HTTP_TIMEOUTS["default"]
+    return t["connect"], t["read"]
+
+
+# --- OpenAI (httpx) ---
+
+class _CountingTransport(httpx.HTTPTransport):
+    def __init__(self, service: str, **kwargs):
+        super().__init__(**kwargs)
+        self.service = service
+
+    def handle_request(self, request):
+        _bump(self.service, "requests")
+        _bump(self.service, "in_flight")
+        try:
+            resp = super().handle_request(request)
+        except httpx.TransportError:
+            _bump(self.service, "errors")
+            raise
+        finally:
+            _bump(self.service, "in_flight", -1)
+        if resp.status_code >= 500 or resp.status_code == 429:
+            _bump(self.service, "errors")
+        return resp
+
+
+def get_openai() -> OpenAI:
+    global _openai
+    if _openai is not None:
+        return _openai
+    with _lock:
+        if _openai is None:
+            connect, read = timeout("openai")
+            http_client = httpx.Client(
+                timeout=httpx.Timeout(read, connect=connect),
+                transport=_CountingTransport(
+                    "openai",
+                    http2=HTTP2_AVAILABLE,
+                    limits=httpx.Limits(
+                        max_connections=settings.HTTP_POOL_SIZE,
+                        max_keepalive_connections=settings.HTTP_POOL_SIZE,
+                        keepalive_expiry=settings.HTTP_KEEPALIVE_SECONDS,
+                    ),
+                ),
+            )
+            _openai = OpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                base_url=settings.OPENAI_BASE_URL or None,
+                http_client=http_client,
+                max_retries=0,  # retries are resilience.call's job
+            )
+    return _openai
+
+
+# --- Pexels / Unsplash (requests) ---
+
+class _CountingSession(requests.Session):
+    def __init__(self, service: str):
+        super().__init__()
+        self.service = service
+
+    def request(self, *args, **kwargs):
+        kwargs.setdefault("timeout", timeout(self.service))
+        _bump(self.service, "requests")
+        _bump(self.service, "in_flight")
+        try:
+            resp = super().request(*args, **kwargs)
+        except requests.RequestException:
+            _bump(self.service, "errors")
+            raise
+        finally:
+            _bump(self.service, "in_flight", -1)
+        if resp.status_code >= 500 or resp.status_code == 429:
+            _bump(self.service, "errors")
+        return resp
+
+
+def get_session(service: str) -> requests.Session:
+    session = _sessions.get(service)
+    if session is not None:
+        return session
+    with _lock:
+        if service not in _sessions:
+            s = _CountingSession(service)
+            # pool_block=False: a burst beyond the pool opens an extra (discarded) connection
+            # instead of stalling a request thread
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=settings.HTTP_POOL_SIZE, max_retries=0)
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            _sessions[service] = s
+        return _sessions[service]
+
+
+# --- Metrics ---
+
+def _httpx_pool_stats(client: OpenAI) -> dict:
+    # httpx has no public pool API; read httpcore's connection list defensively
+    try:
+        conns = list(client._client._transport._pool.connections)
+    except AttributeError:
+        return {}
+    return {
+        "connections": len(conns),
+        "idle": sum(1 for c in conns if c.is_idle()),
+        "http2": HTTP2_AVAILABLE,
+    }
+
+
+def _requests_pool_stats(session: requests.Session) -> dict:
+    out = {"connections": 0, "idle": 0, "hosts": 0}
+    for adapter in {id(a): a for a in session.adapters.values()}.values():
+        for pool in list(adapter.poolmanager.pools._container.values()):
+            out["hosts"] += 1
+            out["connections"] += pool.num_connections
+            out["idle"] += sum(1 for c in list(pool.pool.queue) if c is not None)
+    return out
+
+
+def pool_stats() -> dict:
+    """Per-process request counters and pool occupancy for every client built so far."""
+    with _lock:
+        counters = {name: dict(c) for name, c in _counters.items()}
+        sessions = dict(_sessions)
+        oa = _openai
+    out = {}
+    if oa is not None:
+        out["openai"] = {**counters.get("openai", {}), **_httpx_pool_stats(oa)}
+    for name, s in sessions.items():
+        out[name] = {**counters.get(name, {}), **_requests_pool_stats(s)}
+    out["pool_size"] = settings.HTTP_POOL_SIZE
+    return out
@@ -0,0 +1,107 @@
+import hashlib
+from collections import Counter
+
+from django.db import transaction
+
+from .models import Upload, UserCorpus
+from . import stylometry
+
+# Maintains UserCorpus, the materialized concatenation of a user's normalized uploads.
+# add()/remove() are called as uploads finish normalizing or get deleted; each rewrites the
+# one row under a row lock, re-using the stored slices and stylometry counts of every other
+# upload, so no other upload's text is read again. for_user() builds the row from scratch the
+# first time (or after a schema change), which is the only full scan.
+
+SEPARATOR = "\n\n"
+_VOCAB_PER_UPLOAD = 300  # top words kept per upload for the combined top-words list
+_READY = (Upload.STATUS_NORMALIZED, Upload.STATUS_ANALYZED, Upload.STATUS_PUBLISHED)
+
+
+def _sha(text: str) -> str:
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+
+def _segment(upload: Upload) -> tuple:
+    text = (upload.text_extract or "").strip()
+    counts = stylometry.count(text)
+    counts["vocab"] = dict(counts["vocab"].most_common(_VOCAB_PER_UPLOAD))
+    meta = {
+        "upload_id": upload.id,
+        "sha": _sha(text),
+        "source": upload.file_type,
+        "created": upload.created_at.isoformat(),
+        "counts": counts,
+    }
+    return meta, text
+
+
+def _write(corpus: UserCorpus, pieces: list):
+    """Re-lays out `pieces` ([(segment_meta, text), ...]) into corpus.text/segments/stats/hash and saves."""
+    pieces = [p for p in pieces if p[1]]
+    pieces.sort(key=lambda p: (p[0]["created"], p[0]["upload_id"]))
+    parts, segments, offset = [], [], 0
+    for meta, text in pieces:
+        if parts:
+            parts.append(SEPARATOR)
+            offset += len(SEPARATOR)
+        parts.append(text)
+        segments.append({**meta, "start": offset, "end": offset + len(text)})
+        offset += len(text)
+    corpus.text = "".join(parts)
+    corpus.length = len(corpus.text)
+    corpus.segments = segments
+    totals = stylometry.combine(s["counts"] for s in segments)
+    totals["vocab"] = dict(Counter(totals.get("vocab", {})).most_common(_VOCAB_PER_UPLOAD))
+    corpus.stats = totals if segments else {}
+    h = hashlib.sha256()
+    for s in segments:
+        h.update(s["sha"].encode())
+    corpus.content_hash = h.hexdigest() if segments else ""
+    corpus.save()
+
+
+def _pieces(corpus: UserCorpus, exclude_id: int = None) -> list:
+    return [(s, corpus.segment_text(s)) for s in corpus.segments if s["upload_id"] != exclude_id]
+
+
+def _locked(user) -> UserCorpus:
+    corpus, _ = UserCorpus.objects.get_or_create(user=user)
+    return UserCorpus.objects.select_for_update().get(pk=corpus.pk)
+
+
+def rebuild(user) -> UserCorpus:
+    """Recomputes the corpus from every ingested upload (first use, repairs)."""
+    uploads = Upload.objects.filter(user=user, status__in=_READY).order_by("created_at", "id")
+    with transaction.atomic():
+        corpus = _locked(user)
+        _write(corpus, [_segment(up) for up in uploads.iterator()])
+    return corpus
+
+
+def for_user(user) -> UserCorpus:
+    corpus = UserCorpus.objects.filter(user=user).first()
+    if corpus is None:
+        corpus = rebuild(user)
+    return corpus
+
+
+def add(upload: Upload) -> UserCorpus:
+    """Adds (or replaces) `upload`'s normalized text."""
+    if not UserCorpus.objects.filter(user_id=upload.user_id).exists():
+        return rebuild(upload.user)  # first use: the upload is already in a ready status
+    piece = _segment(upload)
+    with transaction.atomic():
+        corpus = _locked(upload.user)
+        _write(corpus, _pieces(corpus, exclude_id=upload.id) + [piece])
+    return corpus
+
+
+def remove(user, upload_id: int) -> UserCorpus:
+    """Drops `upload_id`'s text. Call before deleting the upload: a first use builds from it."""
+    if not UserCorpus.objects.filter(user=user).exists():
+        rebuild(user)  # never an empty row: for_user() would take it as built and drop the rest
+    with transaction.atomic():
+        corpus = _locked(user)
+        if any(s["upload_id"] == upload_id for s in corpus.segments):
+            _write(corpus, _pieces(corpus, exclude_id=upload_id))
+    return corpus
@@ -0,0 +1,37 @@
+import difflib
+import json
+import zlib
+
+# Line-based edit scripts between two versions of a draft, zlib-compressed. A script is a list
+# of [start, end] (copy those lines of the base) and strings (insert this text), so applying it
+# needs only the base text. Improve/Change Topic rewrite a few paragraphs of a draft at a time,
+# which leaves most lines shared and the script a small fraction of the full body.
+
+
+def _lines(text: str) -> list:
+    return (text or "").splitlines(keepends=True)
+
+
+def encode(base: str, new: str) -> bytes:
+    a, b = _lines(base), _lines(new)
+    script = []
+    matcher = difflib.SequenceMatcher(None, a, b, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            script.append([i1, i2])
+        elif j2 > j1:  # replace/insert; deletes simply aren't copied
+            script.append("".join(b[j1:j2]))
+    return zlib.compress(json.dumps(script, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 9)
+
+
+def apply(base: str, delta: bytes) -> str:
+    a = _lines(base)
+    out = []
+    for op in json.loads(zlib.decompress(bytes(delta)).decode("utf-8")):
+        out.append("".join(a[op[0]:op[1]]) if isinstance(op, list) else op)
+    return "".join(out)
+
+
+def compressed_size(text: str) -> int:
+    """Bytes the text would take as a compressed keyframe; the bar a delta has to beat."""
+    return len(zlib.compress((text or "").encode("utf-8"), 9))
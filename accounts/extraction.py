@@ -0,0 +1,299 @@
+import io
+import multiprocessing
+import os
+import re
+import shutil
+import signal
+import tempfile
+import threading
+import time
+import unicodedata
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterator, Optional, Tuple
+
+from django.conf import settings
+from PyPDF2 import PdfReader
+
+# Text extraction for uploads. PDFs are read page-range by page-range on a small process pool
+# (PyPDF2 is pure Python and holds the GIL, so threads wouldn't help), results stream back in
+# page order, and reading stops as soon as UPLOAD_TEXT_BUDGET_CHARS of text is in hand: a 400-page
+# book costs the first few dozen pages, not all of them. Each page gets its own time limit and
+# every worker a memory ceiling, so one pathological page can't hang or bloat the web process.
+
+_lock = threading.Lock()
+_pool = None
+
+
+# --- Worker side (runs in the pool's processes) ---
+
+class _PageTimeout(Exception):
+    pass
+
+
+def _on_alarm(signum, frame):
+    raise _PageTimeout()
+
+
+def _init_worker(memory_mb: int):
+    if memory_mb:
+        try:
+            import resource
+            limit = memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError):
+            pass  # not supported here; the text caps still bound what comes back
+    if hasattr(signal, "setitimer"):
+        signal.signal(signal.SIGALRM, _on_alarm)
+
+
+_reader_cache = None  # (file identity, PdfReader): the last file this process opened
+
+
+def _reader(path: str) -> PdfReader:
+    """
+    A PdfReader for `path`, reused while the file is unchanged: a worker usually gets several
+    ranges of the same upload in a row, and parsing the document is the costly part.
+    """
+    global _reader_cache
+    st = os.stat(path)
+    key = (path, st.st_ino, st.st_size, st.st_mtime_ns)
+    if _reader_cache is None or _reader_cache[0] != key:
+        _reader_cache = None  # drop the old document before parsing the next
+        _reader_cache = (key, PdfReader(path))
+    return _reader_cache[1]
+
+
+def _read_pages(path: str, start: int, stop: int, page_timeout: float, page_max_chars: int) -> tuple:
+    """(page_count, [(page_no, text, ms, error), ...]) for pages start..stop-1 (none past the end)."""
+    reader = _reader(path)
+    out = []
+    timed = page_timeout and hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+    for n in range(start, min(stop, len(reader.pages))):
+        t0 = time.monotonic()
+        text, error = "", ""
+        try:
+            if timed:
+                signal.setitimer(signal.ITIMER_REAL, page_timeout)
+            text = (reader.pages[n].extract_text() or "")[:page_max_chars]
+        except _PageTimeout:
+            error = "timeout"
+        except MemoryError:
+            error = "memory"
+        except Exception as e:  # malformed page: skip it, keep the rest
+            error = e.__class__.__name__
+        finally:
+            if timed:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+        out.append((n, text, round((time.monotonic() - t0) * 1000, 1), error))
+    return len(reader.pages), out
+
+
+# --- Pool ---
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if settings.PDF_EXTRACT_WORKERS <= 0:
+        return None
+    if _pool is not None:
+        return _pool
+    with _lock:
+        if _pool is None:
+            # spawn, not fork: gunicorn workers run threads, and forking a threaded process is unsafe
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.PDF_EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(settings.PDF_WORKER_MEMORY_MB,),
+                max_tasks_per_child=settings.PDF_WORKER_MAX_TASKS,
+            )
+    return _pool
+
+
+def _reset_pool():
+    """Drops a broken pool (e.g. a worker killed by its memory limit); the next call builds a new one."""
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+# --- Extraction ---
+
+def iter_pdf_pages(path: str, stats: dict) -> Iterator[Tuple[int, str]]:
+    """
+    Yields (page_no, text) in page order. Stops early if the caller stops iterating; pages
+    not yet started are cancelled. Per-page timings and errors are recorded in `stats`.
+    The document is only ever parsed by _read_pages (in a pool worker unless
+    PDF_EXTRACT_WORKERS=0); the page count comes back with the first range read.
+    """
+    stats.update(pages=0, pages_read=0, page_ms=[], page_errors={})
+    step = max(1, settings.PDF_PAGES_PER_TASK)
+    args = (settings.PDF_PAGE_TIMEOUT_SECONDS, settings.PDF_PAGE_MAX_CHARS)
+    deadline = time.monotonic() + settings.PDF_EXTRACT_DEADLINE_SECONDS
+    total = None  # pages in the document, once a range has been read
+
+    def span(idx):
+        return idx * step, (idx + 1) * step
+
+    def record(result):
+        nonlocal total
+        total, pages = result
+        stats["pages"] = total
+        for n, text, ms, error in pages:
+            stats["pages_read"] += 1
+            stats["page_ms"].append(ms)
+            if error:
+                stats["page_errors"][str(n + 1)] = error
+        return pages
+
+    def ranges_left(idx):
+        return total is None or idx * step < total
+
+    pool = _get_pool()
+    if pool is None:  # PDF_EXTRACT_WORKERS=0: same thread (dev/tests)
+        idx = 0
+        while ranges_left(idx):
+            if time.monotonic() > deadline:
+                stats["deadline_hit"] = True
+                return
+            try:
+                pages = record(_read_pages(path, *span(idx), 0, args[1]))
+            except Exception as e:  # not a readable PDF
+                stats["page_errors"]["file"] = e.__class__.__name__
+                return
+            for n, text, _, _ in pages:
+                yield n, text
+            idx += 1
+        return
+
+    # Keep a bounded window of ranges in flight; yield them in order as they complete. Until
+    # the page count is known, only one range per worker is started (ranges past the end
+    # come back empty).
+    pending, done, submitted, emitted = {}, {}, 0, 0
+    try:
+        while ranges_left(emitted):
+            window = settings.PDF_EXTRACT_WORKERS * (1 if total is None else 2)
+            while ranges_left(submitted) and len(pending) < window:
+                pending[pool.submit(_read_pages, path, *span(submitted), *args)] = submitted
+                submitted += 1
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                stats["deadline_hit"] = True
+                return
+            finished, _ = wait(list(pending), timeout=remaining, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                idx = pending.pop(fut)
+                start, stop = span(idx)
+                try:
+                    done[idx] = record(fut.result())
+                except BrokenProcessPool:  # a worker died, e.g. at its memory limit
+                    stats["page_errors"][f"{start + 1}-{stop}"] = "worker died"
+                    _reset_pool()
+                    return
+                except Exception as e:
+                    if total is None:  # not a readable PDF: every range would fail the same way
+                        stats["page_errors"]["file"] = e.__class__.__name__
+                        return
+                    stats["page_errors"][f"{start + 1}-{stop}"] = e.__class__.__name__
+                    done[idx] = []
+            while emitted in done:
+                for n, text, _, _ in done.pop(emitted):
+                    yield n, text
+                emitted += 1
+    finally:
+        for fut in pending:
+            fut.cancel()
+
+
+def _extract_pdf(path: str, stats: dict) -> str:
+    budget = settings.UPLOAD_TEXT_BUDGET_CHARS
+    parts, size = [], 0
+    pages = iter_pdf_pages(path, stats)
+    try:
+        for _, text in pages:
+            if text:
+                parts.append(text)
+                size += len(text) + 1
+            if size >= budget:
+                stats["stopped_early"] = True
+                break
+    finally:
+        pages.close()
+    return "\n".join(parts)[:budget]
+
+
+def _decode(data: bytes) -> str:
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError as e:
+        if e.start >= len(data) - 3:  # only the read limit split a multi-byte character
+            return data[: e.start].decode("utf-8")
+        return data.decode("latin-1", errors="ignore")
+
+
+def extract(f, file_type: str, path: str = None) -> Tuple[str, dict]:
+    """
+    (text, stats) for an open upload file. `path` is the file on disk if it has one; PDFs
+    without one are spooled to a temp file so pool workers can open them by name.
+    """
+    t0 = time.monotonic()
+    stats = {"file_type": file_type}
+    text = ""
+    if file_type == "TXT":
+        data = f.read(4 * settings.UPLOAD_TEXT_BUDGET_CHARS)  # utf-8 is at most 4 bytes a char
+        text = _decode(data if isinstance(data, bytes) else str(data).encode("utf-8"))
+        text = text[: settings.UPLOAD_TEXT_BUDGET_CHARS]
+    elif file_type == "PDF":
+        if path and os.path.exists(path):
+            text = _extract_pdf(path, stats)
+        else:
+            with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+                shutil.copyfileobj(f, tmp)
+                tmp.flush()
+                text = _extract_pdf(tmp.name, stats)
+    stats["chars"] = len(text)
+    stats["elapsed_ms"] = round((time.monotonic() - t0) * 1000, 1)
+    return text, stats
+
+
+_CONTROL = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\x7f\u200b\ufeff]")
+_WRAP_HYPHEN = re.compile(r"(?<=[a-z])-\n(?=[a-z])")
+_TRAILING_SPACE = re.compile(r"[ \t\xa0]+\n")
+_BLANK_RUN = re.compile(r"\n{3,}")
+
+
+def normalize_text(text: str, file_type: str = "") -> str:
+    """
+    Canonical form of extracted text: one newline style, no control/zero-width characters,
+    no trailing spaces or runs of blank lines. PDFs also get ligatures unfolded (NFKC) and
+    words hyphenated across line wraps rejoined.
+    """
+    text = (text or "").replace("\r\n", "\n").replace("\r", "\n")
+    text = unicodedata.normalize("NFKC" if file_type == "PDF" else "NFC", text)
+    text = _CONTROL.sub("", text).replace("\xa0", " ")
+    if file_type == "PDF":
+        text = _WRAP_HYPHEN.sub("", text)
+    text = _TRAILING_SPACE.sub("\n", text)
+    return _BLANK_RUN.sub("\n\n", text).strip()
+
+
+def extract_upload(upload) -> str:
+    """
+    Extracts `upload`'s file into text_extract/extract_stats and saves them. Returns the text.
+    Reads the file from disk where this process has it, otherwise from upload.file_data.
+    """
+    try:
+        path = upload.file.path
+    except (NotImplementedError, ValueError):
+        path = None  # remote storage
+    if path and os.path.exists(path):
+        with upload.file.open("rb") as f:
+            text, stats = extract(f, upload.file_type, path=path)
+    else:
+        text, stats = extract(io.BytesIO(bytes(upload.file_data or b"")), upload.file_type)
+    upload.text_extract = text
+    upload.extract_stats = stats
+    upload.save(update_fields=["text_extract", "extract_stats"])
+    return text
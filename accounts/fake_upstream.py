@@ -0,0 +1,309 @@
+"""
+Local stand-in for the upstream APIs the app calls, for offline dev, benchmarks and load tests.
+
+Implements:
+  POST /v1/chat/completions     (OpenAI; plain and stream=True SSE, with usage)
+  POST /v1/images/generations   (OpenAI; returns b64_json)
+  GET  /v1/search               (Pexels)
+  GET  /search/photos           (Unsplash)
+
+Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:8765/v1,
+PEXELS_BASE_URL=http://127.0.0.1:8765 and UNSPLASH_BASE_URL=http://127.0.0.1:8765.
+Run it with `python manage.py fake_upstream` (see --help for latency/error knobs).
+
+Modes: "synthetic" (default) fabricates responses; "record" proxies to the real APIs and
+appends every response to a JSONL tape; "replay" serves from that tape (synthetic on a miss).
+"""
+import base64
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+REAL_UPSTREAMS = {
+    "openai": "https://api.openai.com",
+    "pexels": "https://api.pexels.com",
+    "unsplash": "https://api.unsplash.com",
+}
+
+# 1x1 PNG so images.generate callers have real bytes to decode and save
+_PNG_1x1 = base64.b64encode(
+    bytes.fromhex(
+        "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+        "1f15c4890000000d49444154789c6360f8cfc0f01f0005000201e2f1a5"
+        "a50000000049454e44ae426082"
+    )
+).decode()
+
+_WORDS = (
+    "growth customers product teams launch data insight story habit market signal practice "
+    "simple clear fast build measure learn content audience trust brand craft focus"
+).split()
+
+
+class FakeConfig:
+    def __init__(self, latency_ms=150, jitter_ms=100, error_rate=0.0, rate_limit_rate=0.0,
+                 retry_after_ms=500, words=900, token_delay_ms=15, mode="synthetic", tape=""):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after_ms = retry_after_ms
+        self.words = words
+        self.token_delay_ms = token_delay_ms
+        self.mode = mode
+        self.tape = tape
+
+
+class Tape:
+    """Append-only JSONL of recorded responses keyed by request fingerprint."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        try:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        e = json.loads(line)
+                        self.entries[e["key"]] = e
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def key(method: str, path: str, body: bytes) -> str:
+        return hashlib.sha256(method.encode() + b" " + path.encode() + b"\n" + body).hexdigest()
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def put(self, key, status, content_type, body: bytes):
+        entry = {"key": key, "status": status, "content_type": content_type,
+                 "body": base64.b64encode(body).decode()}
+        with self._lock:
+            self.entries[key] = entry
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+
+# --- Synthetic payloads ---
+
+def _lorem(n: int, seed: str) -> str:
+    rnd = random.Random(seed)
+    return " ".join(rnd.choice(_WORDS) for _ in range(n))
+
+
+def _fake_completion_text(payload: dict, words: int) -> str:
+    messages = payload.get("messages") or []
+    prompt = " ".join(str(m.get("content", "")) for m in messages)
+    seed = hashlib.md5(prompt.encode("utf-8")).hexdigest()
+    rf = payload.get("response_format") or {}
+    if "JSON" in prompt or rf.get("type") in ("json_object", "json_schema"):
+        return json.dumps({
+            "meta_title": _lorem(6, seed).title(),
+            "meta_description": _lorem(22, seed + "d").capitalize() + ".",
+            "keywords": _lorem(5, seed + "k").split(),
+            "body_md": f"# {_lorem(5, seed).title()}\n\n{_lorem(words, seed)}",
+            "tone_adjectives": ["clear", "direct", "warm"],
+            "formality": "neutral",
+            "voice_summary": _lorem(18, seed + "v").capitalize() + ".",
+        })
+    if "search phrase" in prompt:
+        return " ".join(_lorem(3, seed).split()[:3])
+    if "LinkedIn" in prompt:
+        return f"{_lorem(10, seed).capitalize()}.\n\n{_lorem(60, seed + 'b')}\n\nWhat do you think?\n#growth #content #product"
+    paras = []
+    rnd = random.Random(seed)
+    remaining = words
+    paras.append(f"# {_lorem(6, seed).title()}")
+    i = 0
+    while remaining > 0:
+        n = min(remaining, rnd.randint(40, 90))
+        if i % 3 == 0:
+            paras.append(f"## {_lorem(4, seed + str(i)).title()}")
+        paras.append(_lorem(n, seed + str(i)).capitalize() + ".")
+        remaining -= n
+        i += 1
+    return "\n\n".join(paras)
+
+
+def _usage(payload: dict, text: str) -> dict:
+    prompt_chars = sum(len(str(m.get("content", ""))) for m in payload.get("messages") or [])
+    p, c = max(1, prompt_chars // 4), max(1, len(text) // 4)
+    return {"prompt_tokens": p, "completion_tokens": c, "total_tokens": p + c}
+
+
+def _placeholder(digest: str, label: str) -> str:
+    """A renderable placeholder image; the colour in the path keeps each photo's URL distinct."""
+    return f"https://placehold.co/1200x628/{digest[:6]}/white?text={label.replace(' ', '+')}"
+
+
+def _pexels_photos(query: str, n: int) -> dict:
+    photos = []
+    for i in range(n):
+        digest = hashlib.md5(f"{query}{i}".encode()).hexdigest()
+        pid = int(digest[:8], 16)
+        src = _placeholder(digest, f"{query} {i + 1}")
+        photos.append({
+            "id": pid, "url": f"https://www.pexels.com/photo/{pid}/", "alt": f"{query} #{i + 1}",
+            "photographer": "Fake Photographer", "photographer_url": "https://www.pexels.com/@fake",
+            "src": {"medium": src, "small": src, "large": src, "large2x": src, "original": src},
+        })
+    return {"photos": photos, "total_results": n, "page": 1, "per_page": n}
+
+
+def _unsplash_results(query: str, n: int) -> dict:
+    results = []
+    for i in range(n):
+        digest = hashlib.md5(f"u{query}{i}".encode()).hexdigest()
+        src = _placeholder(digest, f"{query} u{i + 1}")
+        results.append({
+            "id": digest[:11],
+            "alt_description": f"{query} #{i + 1}",
+            "urls": {"small": src, "thumb": src, "full": src, "regular": src},
+            "links": {"html": "https://unsplash.com/photos/fake"},
+            "user": {"name": "Fake Photographer", "username": "fake"},
+        })
+    return {"results": results, "total": n, "total_pages": 1}
+
+
+# --- HTTP handler ---
+
+class FakeUpstreamHandler(BaseHTTPRequestHandler):
+    config: FakeConfig = FakeConfig()
+    tape: Tape = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):  # quiet by default; load tests make a lot of noise
+        pass
+
+    # routing
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def _dispatch(self, method):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        url = urlparse(self.path)
+        service = "pexels" if url.path.startswith("/v1/search") else "unsplash" if url.path.startswith("/search/") else "openai"
+
+        key = Tape.key(method, self.path, body)
+        if self.config.mode == "replay" and self.tape:
+            hit = self.tape.get(key)
+            if hit:
+                return self._send_raw(hit["status"], hit["content_type"], base64.b64decode(hit["body"]))
+        if self.config.mode == "record" and self.tape:
+            return self._proxy(method, service, body, key)
+
+        if self._inject_faults():
+            return
+        try:
+            if method == "POST" and url.path.endswith("/chat/completions"):
+                return self._chat(json.loads(body or b"{}"))
+            if method == "POST" and url.path.endswith("/images/generations"):
+                return self._json(200, {"created": int(time.time()), "data": [{"b64_json": _PNG_1x1}],
+                                        "usage": {"input_tokens": 60, "output_tokens": 4160}})
+            qs = parse_qs(url.query)
+            query = (qs.get("query") or ["stock photo"])[0]
+            per_page = int((qs.get("per_page") or ["10"])[0])
+            if service == "pexels":
+                return self._json(200, _pexels_photos(query, per_page))
+            if service == "unsplash":
+                return self._json(200, _unsplash_results(query, per_page))
+        except (ValueError, KeyError) as e:
+            return self._json(400, {"error": {"message": f"bad request: {e}", "type": "invalid_request_error"}})
+        self._json(404, {"error": {"message": f"no fake for {method} {url.path}"}})
+
+    # behaviour knobs
+    def _inject_faults(self) -> bool:
+        cfg = self.config
+        delay = max(0.0, cfg.latency_ms + random.uniform(-cfg.jitter_ms, cfg.jitter_ms)) / 1000
+        time.sleep(delay)
+        roll = random.random()
+        if roll < cfg.rate_limit_rate:
+            self._json(429, {"error": {"message": "Rate limit reached (fake)", "type": "requests", "code": "rate_limit_exceeded"}},
+                       headers={"retry-after-ms": str(cfg.retry_after_ms)})
+            return True
+        if roll < cfg.rate_limit_rate + cfg.error_rate:
+            self._json(500, {"error": {"message": "Upstream exploded (fake)", "type": "server_error"}})
+            return True
+        return False
+
+    def _chat(self, payload: dict):
+        text = _fake_completion_text(payload, self.config.words)
+        model = payload.get("model", "fake-model")
+        cid = "chatcmpl-fake-" + hashlib.md5(text.encode()).hexdigest()[:12]
+        usage = _usage(payload, text)
+        if not payload.get("stream"):
+            return self._json(200, {
+                "id": cid, "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": text}}],
+                "usage": usage,
+            })
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        def emit(obj):
+            self.wfile.write(f"data: {json.dumps(obj)}\n\n".encode())
+            self.wfile.flush()
+
+        base = {"id": cid, "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+        tokens = text.split(" ")
+        for i, tok in enumerate(tokens):
+            delta = tok if i == 0 else " " + tok
+            emit({**base, "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}]})
+            if self.config.token_delay_ms:
+                time.sleep(self.config.token_delay_ms / 1000)
+        emit({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if (payload.get("stream_options") or {}).get("include_usage"):
+            emit({**base, "choices": [], "usage": usage})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+    # record mode
+    def _proxy(self, method, service, body, key):
+        headers = {k: v for k, v in self.headers.items() if k.lower() in ("authorization", "content-type", "accept")}
+        r = requests.request(method, REAL_UPSTREAMS[service] + self.path, data=body or None,
+                             headers=headers, timeout=300)
+        content_type = r.headers.get("Content-Type", "application/json")
+        if r.status_code < 500:
+            self.tape.put(key, r.status_code, content_type, r.content)
+        self._send_raw(r.status_code, content_type, r.content)
+
+    # output helpers
+    def _json(self, status, obj, headers=None):
+        self._send_raw(status, "application/json", json.dumps(obj).encode(), headers)
+
+    def _send_raw(self, status, content_type, data: bytes, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def make_server(host: str, port: int, config: FakeConfig) -> ThreadingHTTPServer:
+    handler = type("ConfiguredFakeUpstreamHandler", (FakeUpstreamHandler,), {
+        "config": config,
+        "tape": Tape(config.tape) if config.tape else None,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
@@ -0,0 +1,55 @@
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict
+
+from django.conf import settings
+from django.db import connection
+
+# One shared pool per process; request threads hand independent upstream calls to it
+_pool = ThreadPoolExecutor(max_workers=settings.FANOUT_MAX_WORKERS, thread_name_prefix="fanout")
+
+
+class FanOutTimeout(TimeoutError):
+    pass
+
+
+def in_worker(fn: Callable, *args, **kwargs):
+    """
+    Runs fn on a pool thread, then closes the DB connection it may have opened (usage flush,
+    DB cache tier, ORM reads). Pool threads never see request_finished, and
+    close_old_connections() would keep the connection for CONN_MAX_AGE, so without this each
+    idle thread holds one open.
+    """
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        connection.close()
+
+
+def fan_out(calls: Dict[str, Callable[[], object]], deadline: float) -> Dict[str, object]:
+    """
+    Runs independent zero-arg callables concurrently under ONE shared deadline (seconds).
+    Returns {name: result}; a call that raised maps to its exception, a call that
+    missed the deadline maps to FanOutTimeout. Never raises itself.
+    """
+    futures = {
+        # copy_context so per-request contextvars follow the work into the pool
+        name: _pool.submit(contextvars.copy_context().run, in_worker, fn)
+        for name, fn in calls.items()
+    }
+    done, _ = wait(futures.values(), timeout=deadline)
+
+    out = {}
+    for name, fut in futures.items():
+        if fut in done:
+            exc = fut.exception()
+            out[name] = exc if exc is not None else fut.result()
+        else:
+            fut.cancel()  # best effort; a running call finishes in the background
+            out[name] = FanOutTimeout(f"{name} missed the {deadline:.0f}s deadline")
+    return out
+
+
+def submit(fn: Callable, *args, **kwargs) -> Future:
+    """Starts one call on the shared pool (with the caller's contextvars) and returns its Future."""
+    return _pool.submit(contextvars.copy_context().run, in_worker, fn, *args, **kwargs)
@@ -58,6 +58,12 @@ class ImproveForm(forms.Form):
     add_example = forms.BooleanField(required=False, initial=False, label="Add an example")
     add_data = forms.BooleanField(required=False, initial=False, label="Add a data point")
     custom_note = forms.CharField(required=False, max_length=300, widget=forms.TextInput(attrs={"placeholder":"Optional nudge (max 300 chars)"}))
+    # H2 sections of the draft to rewrite (accounts/sections.py); none = the whole draft
+    sections = forms.TypedMultipleChoiceField(coerce=int, required=False, choices=[])
+
+    def __init__(self, *args, sections=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["sections"].choices = list(sections)
 
 class ChangeTopicForm(forms.Form):
     new_topic = forms.CharField(max_length=200, widget=forms.TextInput(attrs={"placeholder":"New topic/title"}))
@@ -67,7 +73,7 @@ class AutoPopulateForm(forms.Form):
     TYPE_CHOICES = [("BLOG","Blog"), ("LINKEDIN","LinkedIn")]
     content_type = forms.ChoiceField(choices=TYPE_CHOICES)
     dates = forms.CharField(widget=forms.Textarea(attrs={
-        "rows":3, "placeholder":"Enter up to 7 dates (YYYY-MM-DD), one per line"
+        "rows":3, "placeholder":"Enter dates (YYYY-MM-DD), one per line"
     }))
 
 class TypedPostForm(forms.Form):
@@ -1,5 +1,17 @@
-import requests
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Dict, List, Tuple
+
 from django.conf import settings
+from django.core.cache import caches
+
+from . import clients, resilience
+from .fanout import in_worker
+
+log = logging.getLogger(__name__)
 
 # Unified result shape:
 # { "thumb": str, "url": str, "page": str, "title": str, "source": str, "credit_html": str }
@@ -8,9 +20,9 @@ def _unsplash_search(query: str, count: int):
     key = settings.UNSPLASH_ACCESS_KEY
     if not key:
         return []
-    try:
-        r = requests.get(
-            "https://api.unsplash.com/search/photos",
+    def _get():
+        r = clients.get_session("unsplash").get(
+            f"{settings.UNSPLASH_BASE_URL}/search/photos",
             params={
                 "query": query,
                 "per_page": min(count, 10),
@@ -18,61 +30,219 @@ def _unsplash_search(query: str, count: int):
                 "content_filter": "high",
             },
             headers={"Authorization": f"Client-ID {key}"},
-            timeout=12,
         )
         r.raise_for_status()
-        data = r.json()
-        out = []
-        for p in (data.get("results") or []):
-            user = p.get("user") or {}
-            name = user.get("name") or "Photographer"
-            username = user.get("username") or ""
-            page = p.get("links", {}).get("html") or p.get("links", {}).get("download_location") or ""
-            credit = f'Photo by <a href="https://unsplash.com/@{username}" target="_blank" rel="noopener">{name}</a> on <a href="https://unsplash.com" target="_blank" rel="noopener">Unsplash</a>'
-            out.append({
-                "thumb": (p.get("urls") or {}).get("small") or (p.get("urls") or {}).get("thumb"),
-                "url": (p.get("urls") or {}).get("full") or (p.get("urls") or {}).get("regular"),
-                "page": page,
-                "title": p.get("alt_description") or "",
-                "source": "Unsplash",
-                "credit_html": credit,
-            })
-        return out
-    except Exception:
-        return []
+        return r.json()
+
+    data = resilience.call("unsplash", _get)
+    out = []
+    for p in (data.get("results") or []):
+        user = p.get("user") or {}
+        name = user.get("name") or "Photographer"
+        username = user.get("username") or ""
+        page = p.get("links", {}).get("html") or p.get("links", {}).get("download_location") or ""
+        credit = f'Photo by <a href="https://unsplash.com/@{username}" target="_blank" rel="noopener">{name}</a> on <a href="https://unsplash.com" target="_blank" rel="noopener">Unsplash</a>'
+        out.append({
+            "thumb": (p.get("urls") or {}).get("small") or (p.get("urls") or {}).get("thumb"),
+            "url": (p.get("urls") or {}).get("full") or (p.get("urls") or {}).get("regular"),
+            "page": page,
+            "title": p.get("alt_description") or "",
+            "source": "Unsplash",
+            "credit_html": credit,
+        })
+    return out
 
 def _pexels_search(query: str, count: int):
     key = settings.PEXELS_API_KEY
     if not key:
         return []
-    try:
-        r = requests.get(
-            "https://api.pexels.com/v1/search",
+    def _get():
+        r = clients.get_session("pexels").get(
+            f"{settings.PEXELS_BASE_URL}/v1/search",
             params={"query": query, "per_page": min(count, 10), "orientation": "landscape"},
             headers={"Authorization": key},
-            timeout=12,
         )
         r.raise_for_status()
-        data = r.json()
-        out = []
-        for p in (data.get("photos") or []):
-            user = p.get("photographer") or "Photographer"
-            user_url = p.get("photographer_url") or "https://www.pexels.com"
-            page = p.get("url") or user_url
-            credit = f'Photo by <a href="{user_url}" target="_blank" rel="noopener">{user}</a> on <a href="https://www.pexels.com" target="_blank" rel="noopener">Pexels</a>'
-            src = p.get("src") or {}
-            out.append({
-                "thumb": src.get("medium") or src.get("small"),
-                "url": src.get("large2x") or src.get("large") or src.get("original"),
-                "page": page,
-                "title": p.get("alt") or "",
-                "source": "Pexels",
-                "credit_html": credit,
-            })
-        return out
+        return r.json()
+
+    data = resilience.call("pexels", _get)
+    out = []
+    for p in (data.get("photos") or []):
+        user = p.get("photographer") or "Photographer"
+        user_url = p.get("photographer_url") or "https://www.pexels.com"
+        page = p.get("url") or user_url
+        credit = f'Photo by <a href="{user_url}" target="_blank" rel="noopener">{user}</a> on <a href="https://www.pexels.com" target="_blank" rel="noopener">Pexels</a>'
+        src = p.get("src") or {}
+        out.append({
+            "thumb": src.get("medium") or src.get("small"),
+            "url": src.get("large2x") or src.get("large") or src.get("original"),
+            "page": page,
+            "title": p.get("alt") or "",
+            "source": "Pexels",
+            "credit_html": credit,
+        })
+    return out
+
+PROVIDERS = {"pexels": _pexels_search, "unsplash": _unsplash_search}
+
+
+# --- Result cache ---
+# Entries are per (provider, query, count). A fresh entry is served as is; after IMAGE_SEARCH_TTL
+# it is still served, but the first reader starts a background refresh (stale-while-revalidate)
+# until IMAGE_SEARCH_STALE_TTL more has passed and the cache drops it. Empty results and provider
+# errors are cached for IMAGE_SEARCH_NEGATIVE_TTL so a dead query or an outage isn't retried on
+# every page view; an error never replaces results we already have. Refreshes are single-flight
+# per process and run on a small pool of their own (IMAGE_SEARCH_WORKERS): a slow provider can
+# hold a thread for retries and backoff, and must not starve the LLM fan-out pool.
+
+_lock = threading.Lock()
+_refreshing: Dict[str, Future] = {}
+_pool = ThreadPoolExecutor(max_workers=settings.IMAGE_SEARCH_WORKERS, thread_name_prefix="images")
+
+
+def _key(provider: str, query: str, count: int) -> str:
+    norm = " ".join((query or "").lower().split())
+    return "img:" + hashlib.sha256(f"{provider}|{norm}|{count}".encode("utf-8")).hexdigest()
+
+
+def _cache():
+    return caches[settings.IMAGE_SEARCH_CACHE_ALIAS]
+
+
+def _get_entry(key: str):
+    try:
+        return _cache().get(key)
     except Exception:
-        return []
+        return None  # a broken cache tier must not break the page
+
+
+def _is_fresh(entry: dict) -> bool:
+    ttl = settings.IMAGE_SEARCH_TTL if entry["results"] else settings.IMAGE_SEARCH_NEGATIVE_TTL
+    return time.time() - entry["at"] < ttl
+
+
+def _store(key: str, results: list, at: float = None):
+    ttl = settings.IMAGE_SEARCH_TTL if results else settings.IMAGE_SEARCH_NEGATIVE_TTL
+    try:
+        _cache().set(key, {"results": results, "at": at or time.time()}, ttl + settings.IMAGE_SEARCH_STALE_TTL)
+    except Exception:
+        pass
+
+
+def _fetch(provider: str, query: str, count: int, key: str) -> list:
+    try:
+        results = PROVIDERS[provider](query, count)
+    except Exception as e:
+        log.warning("Image search %s failed for %r: %s", provider, query, e)
+        previous = _get_entry(key)
+        if previous and previous["results"]:
+            # Keep serving what we have; try again after the negative TTL, not on every view
+            _store(key, previous["results"], at=time.time() - settings.IMAGE_SEARCH_TTL + settings.IMAGE_SEARCH_NEGATIVE_TTL)
+            return previous["results"]
+        results = []
+    _store(key, results)
+    return results
+
+
+def _refresh(provider: str, query: str, count: int) -> Future:
+    """The in-flight refresh for this entry, starting one if needed."""
+    key = _key(provider, query, count)
+    with _lock:
+        flight = _refreshing.get(key)
+        if flight is None:
+            flight = _pool.submit(in_worker, _fetch, provider, query, count, key)
+            _refreshing[key] = flight
+            flight.add_done_callback(lambda _: _forget(key))
+    return flight
+
+
+def _forget(key: str):
+    with _lock:
+        _refreshing.pop(key, None)
+
+
+def _providers() -> List[str]:
+    """Providers with credentials, in interleave order."""
+    keys = {"pexels": settings.PEXELS_API_KEY, "unsplash": settings.UNSPLASH_ACCESS_KEY}
+    return [name for name in PROVIDERS if keys.get(name, True)]
+
+
+# --- Merging ---
+
+def _identity(result: dict) -> str:
+    """The image itself, whatever size/crop parameters its URL carries."""
+    return (result.get("url") or result.get("thumb") or result.get("page") or "").split("?", 1)[0]
+
+
+def merge(per_provider: List[List[dict]], count: int) -> List[dict]:
+    """
+    Round-robin across providers (each list keeps its provider's relevance order), so the
+    first rows show every source; duplicates of an image already taken are skipped.
+    """
+    out, seen = [], set()
+    queues = [list(results) for results in per_provider if results]
+    while queues and len(out) < count:
+        for queue in list(queues):
+            while queue:
+                result = queue.pop(0)
+                ident = _identity(result)
+                if ident and ident not in seen:
+                    seen.add(ident)
+                    out.append(result)
+                    break
+            if not queue:
+                queues.remove(queue)
+            if len(out) >= count:
+                break
+    return out
+
+
+def sources(results: List[dict]) -> List[str]:
+    """Distinct providers in `results`, for the attribution line."""
+    return list(dict.fromkeys(r.get("source") for r in results if r.get("source")))
+
+
+# --- Search ---
+
+def lookup(query: str, count: int = 10) -> Tuple[List[dict], bool]:
+    """
+    (results, pending) from the cache across every configured provider, without waiting on any
+    of them. Stale results come back as is while a refresh runs; pending=True means some
+    provider had nothing cached and a fetch is under way (the page can ask search_images() later).
+    """
+    per_provider, pending = [], False
+    for provider in _providers():
+        entry = _get_entry(_key(provider, query, count))
+        if entry is None or not _is_fresh(entry):
+            _refresh(provider, query, count)
+        if entry is None:
+            pending = True
+        else:
+            per_provider.append(entry["results"])
+    return merge(per_provider, count), pending
+
+
+def search_images(query: str, count: int = 10, timeout: float = None) -> List[dict]:
+    """
+    Merged results from every configured provider. Providers without a fresh cache entry are
+    searched concurrently (joining refreshes already in flight) under one shared deadline of
+    `timeout` seconds (default IMAGE_SEARCH_WAIT): whatever has arrived by then is merged, a
+    late provider contributes its stale results, or none, and its fetch still fills the cache.
+    """
+    entries, flights = {}, {}
+    for provider in _providers():
+        entry = _get_entry(_key(provider, query, count))
+        entries[provider] = entry
+        if entry is None or not _is_fresh(entry):
+            flights[provider] = _refresh(provider, query, count)
+    if flights:
+        wait(flights.values(), timeout=settings.IMAGE_SEARCH_WAIT if timeout is None else timeout)
 
-def search_images(query: str, count: int = 10):
-    return _pexels_search(query, count)
-    
\ No newline at end of file
+    per_provider = []
+    for provider, entry in entries.items():
+        flight = flights.get(provider)
+        if flight is not None and flight.done() and flight.exception() is None:
+            per_provider.append(flight.result())
+        elif entry is not None:
+            per_provider.append(entry["results"])
+    return merge(per_provider, count)
@@ -0,0 +1,86 @@
+from typing import Callable, Optional
+
+from django.db import transaction
+
+from .extraction import extract_upload, normalize_text
+from .models import Upload
+from .style import analyze_upload
+from . import corpus
+
+# Upload ingestion as persisted stages, run by the INGEST job (accounts/jobs.py) rather than
+# the request thread:
+#   STORED -> EXTRACTED -> NORMALIZED (text joins the UserCorpus) -> ANALYZED -> PUBLISHED
+# Each stage saves the upload's status when it completes, so a retry (or a worker restart)
+# resumes where the last attempt stopped instead of re-reading the file or re-paying for the
+# analysis. Publishing (rebuilding the StyleProfile) is per user, not per upload: see
+# style.rebuild_profile, which marks every ANALYZED upload it merged as PUBLISHED.
+
+
+class IngestError(Exception):
+    """A stage failed; the upload keeps its last completed status and can be retried."""
+
+
+def _set_status(upload: Upload, status: str):
+    upload.status = status
+    upload.status_error = ""
+    upload.save(update_fields=["status", "status_error"])
+
+
+def _extract(upload: Upload):
+    if upload.file:
+        text = extract_upload(upload)
+    else:
+        text = upload.text_extract  # typed post: the text is the upload
+    if not (text or "").strip():
+        upload.status = Upload.STATUS_FAILED
+        upload.status_error = "No text could be extracted from this file."
+        upload.save(update_fields=["status", "status_error"])
+        return
+    _set_status(upload, Upload.STATUS_EXTRACTED)
+
+
+def _normalize(upload: Upload):
+    upload.text_extract = normalize_text(upload.text_extract, upload.file_type)
+    upload.file_data = b""  # the text is what later stages (and retries) use from here on
+    upload.status = Upload.STATUS_NORMALIZED
+    upload.status_error = ""
+    with transaction.atomic():  # NORMALIZED <=> in the corpus
+        upload.save(update_fields=["text_extract", "file_data", "status", "status_error"])
+        corpus.add(upload)
+
+
+def _analyze(upload: Upload):
+    if not analyze_upload(upload):  # sets ANALYZED on success
+        raise IngestError("Couldn't analyse this text right now.")
+
+
+STAGES = {  # status -> (note shown while it runs, stage that moves past it)
+    Upload.STATUS_STORED: ("Reading your file…", _extract),
+    Upload.STATUS_EXTRACTED: ("Cleaning up the text…", _normalize),
+    Upload.STATUS_NORMALIZED: ("Analysing your writing…", _analyze),
+}
+
+
+def process(upload: Upload, on_stage: Callable[[str], None] = None) -> Upload:
+    """
+    Runs the upload through every remaining stage up to ANALYZED. Records the failure on the
+    upload (status_error) and re-raises if a stage fails.
+    """
+    while upload.status in STAGES:
+        note, stage = STAGES[upload.status]
+        if on_stage:
+            on_stage(note)
+        try:
+            stage(upload)
+        except Exception as e:
+            upload.status_error = (str(e) if isinstance(e, IngestError) else f"{note.rstrip('…')} failed.")[:300]
+            upload.save(update_fields=["status_error"])
+            raise
+    return upload
+
+
+def restart(upload: Upload, from_status: Optional[str] = None):
+    """Rewinds an upload so the next process() re-runs its stages from `from_status` (default: the start)."""
+    upload.status = from_status or Upload.STATUS_STORED
+    upload.status_error = ""
+    upload.save(update_fields=["status", "status_error"])
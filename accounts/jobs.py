@@ -0,0 +1,446 @@
+import logging
+import socket
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from contextvars import copy_context
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from .ai_client import generate_blog, generate_linkedin, improve_content as gpt_improve, change_topic as gpt_change
+from .models import Job, BatchItem, User, ContentItem, ContentVersion, StyleProfile, Upload
+from .style import rebuild_profile
+from .utils import record_credit_change
+from . import fanout, ingest, topics, usage, versions
+
+log = logging.getLogger(__name__)
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# kind -> handler(job) -> result dict
+HANDLERS = {}
+
+
+class JobError(Exception):
+    """Expected failure; the message is shown to the user as-is."""
+
+
+def handler(kind):
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+# --- Queue mechanics ---
+
+def enqueue(user, kind: str, payload: dict, content=None) -> Job:
+    job = Job.objects.create(user=user, kind=kind, payload=payload, content=content)
+    if settings.JOBS_RUN_INLINE:
+        # Dev/no-worker mode: same code path, just on the request thread
+        _start(job)
+        run(job)
+    return job
+
+
+def _start(job: Job):
+    job.status = Job.STATUS_RUNNING
+    job.started_at = job.heartbeat_at = timezone.now()
+    job.attempts += 1
+    job.locked_by = WORKER_ID
+    job.save(update_fields=["status", "started_at", "heartbeat_at", "attempts", "locked_by"])
+
+
+def claim_next():
+    """Atomically takes the oldest queued job; concurrent workers skip rows another worker holds."""
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.STATUS_QUEUED)
+            .order_by("created_at")
+            .first()
+        )
+        if job is None:
+            return None
+        _start(job)
+    return job
+
+
+def requeue_stale() -> int:
+    """Puts RUNNING jobs whose worker died back in the queue (or fails them after max attempts)."""
+    cutoff = timezone.now() - timedelta(seconds=settings.JOBS_STALE_AFTER)
+    stale = Job.objects.filter(status=Job.STATUS_RUNNING, heartbeat_at__lt=cutoff)
+    failed = stale.filter(attempts__gte=settings.JOBS_MAX_ATTEMPTS).update(
+        status=Job.STATUS_FAILED, error="Worker stopped responding.", finished_at=timezone.now()
+    )
+    return failed + stale.update(status=Job.STATUS_QUEUED, locked_by="")
+
+
+def set_progress(job: Job, progress: int, note: str = ""):
+    job.progress = max(0, min(100, progress))
+    job.progress_note = note[:200]
+    job.heartbeat_at = timezone.now()
+    job.save(update_fields=["progress", "progress_note", "heartbeat_at"])
+
+
+@contextmanager
+def heartbeat(job: Job):
+    """
+    Keeps job.heartbeat_at fresh while one long call runs: with retries and backoff a single
+    LLM call can outlast JOBS_STALE_AFTER, and requeue_stale() must not hand the job to a
+    second worker meanwhile.
+    """
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(settings.JOBS_STALE_AFTER / 3):
+                Job.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now())
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f"job-{job.pk}-heartbeat", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run(job: Job):
+    fn = HANDLERS.get(job.kind)
+    try:
+        if fn is None:
+            raise JobError(f"No handler for job kind {job.kind}.")
+        with usage.attribute(job.user_id):
+            result = fn(job) or {}
+    except JobError as e:
+        _finish(job, Job.STATUS_FAILED, error=str(e))
+    except Exception as e:
+        log.exception("Job %s failed", job.id)
+        _finish(job, Job.STATUS_FAILED, error=f"{e.__class__.__name__}: {e}")
+    else:
+        _finish(job, Job.STATUS_DONE, result=result)
+    return job
+
+
+def _finish(job: Job, status: str, result=None, error: str = ""):
+    job.status = status
+    job.result = result or {}
+    job.error = error
+    job.finished_at = timezone.now()
+    if status == Job.STATUS_DONE:
+        job.progress = 100
+    job.save(update_fields=["status", "result", "error", "finished_at", "progress"])
+
+
+# --- Shared helpers for handlers ---
+
+def _active_profile(job: Job) -> StyleProfile:
+    profile = StyleProfile.objects.filter(user=job.user, active=True).first()
+    if not profile:
+        raise JobError("No active Style Profile found.")
+    return profile.ensure_compiled()  # before any fan-out threads need the prompts
+
+
+def _save_committed(job: Job, result: dict) -> dict:
+    """
+    Call inside the transaction that writes the version: the job then records what it committed,
+    so a re-run (stale requeue, or a crash before _finish) returns it instead of writing again.
+    """
+    job.result = result
+    job.save(update_fields=["result"])
+    return result
+
+
+def locked_user_with_credits(user_id: int, cost: int) -> User:
+    """
+    Call inside transaction.atomic(): row-locks the user so parallel jobs and streams can't
+    overspend, and returns a fresh row to debit (never a User loaded before the slow call).
+    """
+    user = User.objects.select_for_update().get(pk=user_id)
+    if user.credits < cost:
+        raise JobError(f"Not enough credits. This action requires {cost} credits.")
+    return user
+
+
+# --- Handlers ---
+# Each one makes the slow LLM calls first, then writes the version and debits credits
+# in one short transaction, so credits move only when the job succeeds.
+
+@handler(Job.KIND_GENERATE)
+def _run_generate(job: Job) -> dict:
+    """
+    Creates the ContentItem together with its first version and the debit, so a failed draft
+    leaves nothing in History. A re-run of a job that already committed (stale requeue) returns
+    the existing item. Jobs queued with an item already attached (payload without "type") draft
+    into that item.
+    """
+    item = job.content
+    if item is not None and item.versions.exists():
+        return {"url": reverse("content_detail", args=[item.id]), "version_no": 1}
+    cost = job.payload["cost"]
+    ctype = item.type if item else job.payload["type"]
+    topic = item.topic if item else job.payload["topic"]
+    style = _active_profile(job)
+
+    set_progress(job, 10, "Writing your draft…")
+    with heartbeat(job):
+        if ctype == "BLOG":
+            body_md, meta_json = generate_blog(topic, style)
+        else:
+            body_md, meta_json = generate_linkedin(topic, style)
+
+    with transaction.atomic():
+        user = locked_user_with_credits(job.user_id, cost)
+        if item is None:
+            item = ContentItem.objects.create(
+                user=user,
+                type=ctype,
+                topic=topic,
+                status=ContentItem.STATUS_DRAFT,
+                scheduled_for=datetime.fromisoformat(job.payload["scheduled_for"]),
+            )
+            job.content = item
+            job.save(update_fields=["content"])
+        ContentVersion.objects.create(content=item, version_no=1, body_md=body_md, meta_json=meta_json)
+        record_credit_change(user, -cost, "GEN", f"Generated {ctype} for {job.payload['target_date']} – '{topic}'")
+    return {"url": reverse("content_detail", args=[item.id]), "version_no": 1}
+
+
+@handler(Job.KIND_IMPROVE)
+def _run_improve(job: Job) -> dict:
+    if job.result.get("version_id"):
+        return job.result
+    item = job.content
+    cost = job.payload["cost"]
+    opts = job.payload["opts"]
+    latest = item.versions.first()
+    if not latest:
+        raise JobError("No version to improve.")
+    style = _active_profile(job)
+
+    set_progress(job, 10, "Improving your draft…")
+    with heartbeat(job):
+        new_body, new_meta = gpt_improve(item.type, latest.body_md, style, opts)
+    # Section-level improves return no meta: the title and most of the body are unchanged
+    meta_for_new_version = new_meta if item.type == "BLOG" and new_meta else (latest.meta_json or {})
+
+    with transaction.atomic():
+        user = locked_user_with_credits(job.user_id, cost)
+        version = versions.create(item, new_body, meta_for_new_version)
+        record_credit_change(user, -cost, "IMPROVE", f"Improve content v{version.version_no} for '{item.topic}'")
+        return _save_committed(job, {
+            "url": reverse("content_detail", args=[item.id]), "version_no": version.version_no, "version_id": version.id,
+        })
+
+
+@handler(Job.KIND_CHANGE_TOPIC)
+def _run_change_topic(job: Job) -> dict:
+    if job.result.get("version_id"):
+        return job.result
+    item = job.content
+    cost = job.payload["cost"]
+    new_topic = job.payload["new_topic"]
+    style = _active_profile(job)
+
+    set_progress(job, 10, f"Rewriting for “{new_topic[:80]}”…")
+    with heartbeat(job):
+        body_md, meta_json = gpt_change(item.type, new_topic, style)
+
+    with transaction.atomic():
+        user = locked_user_with_credits(job.user_id, cost)
+        version = versions.create(item, body_md, meta_json)
+        item.topic = new_topic
+        item.status = ContentItem.STATUS_DRAFT
+        item.save(update_fields=["topic", "status"])
+        record_credit_change(user, -cost, "GEN", f"Change Topic → '{new_topic}'")
+        return _save_committed(job, {
+            "url": reverse("content_detail", args=[item.id]), "version_no": version.version_no, "version_id": version.id,
+        })
+
+
+def _draft(ctype: str, topic: str, style: StyleProfile):
+    if ctype == "BLOG":
+        return generate_blog(topic, style)
+    return generate_linkedin(topic, style)
+
+
+def _commit_drafts(job: Job, ready: list, ctype: str, unit_cost: int, user_tz, ideas: dict = None) -> int:
+    """
+    Inserts finished drafts in one short transaction: bulk_create the items and versions,
+    mark their BatchItems DONE and debit credits per draft. Drafts the user can no longer
+    afford are marked FAILED instead. Returns how many were saved.
+    """
+    if not ready:
+        return 0
+    now = timezone.now()
+    with transaction.atomic():
+        user = User.objects.select_for_update().get(pk=job.user_id)
+        affordable = len(ready) if unit_cost <= 0 else min(len(ready), user.credits // unit_cost)
+        take, short = ready[:affordable], ready[affordable:]
+
+        items = ContentItem.objects.bulk_create([
+            ContentItem(
+                user=user,
+                type=ctype,
+                topic=(meta_json.get("meta_title") or (ideas or {}).get(bi.target_date)
+                       or f"{ctype.title()} for {bi.target_date.isoformat()}")[:200],
+                status=ContentItem.STATUS_DRAFT,
+                scheduled_for=timezone.make_aware(datetime.combine(bi.target_date, datetime.min.time()), user_tz),
+            )
+            for bi, (_, meta_json) in take
+        ])
+        ContentVersion.objects.bulk_create([
+            ContentVersion(content=item, version_no=1, body_md=body_md, meta_json=meta_json)
+            for item, (_, (body_md, meta_json)) in zip(items, take)
+        ])
+        for item, (bi, _) in zip(items, take):
+            bi.status, bi.content, bi.error, bi.updated_at = BatchItem.STATUS_DONE, item, "", now
+            record_credit_change(user, -unit_cost, "GEN", f"Auto-generate {ctype} for {bi.target_date.isoformat()}")
+        for bi, _ in short:
+            bi.status, bi.error, bi.updated_at = BatchItem.STATUS_FAILED, "Not enough credits.", now
+        BatchItem.objects.bulk_update([bi for bi, _ in ready], ["status", "content", "error", "updated_at"])
+    ready.clear()
+    return len(take)
+
+
+@handler(Job.KIND_AUTO_POPULATE)
+def _run_auto_populate(job: Job) -> dict:
+    """
+    Drafts every date with at most AUTO_POPULATE_CONCURRENCY LLM calls in flight, saving
+    finished drafts every AUTO_POPULATE_COMMIT_EVERY. Re-running the job (worker crash, stale
+    requeue) only drafts dates that aren't DONE yet; a failed date doesn't fail the batch.
+    """
+    ctype = job.payload["content_type"]
+    unit_cost = job.payload["unit_cost"]
+    dates = [date.fromisoformat(d) for d in job.payload["dates"]]
+    style = _active_profile(job)
+    user_tz = ZoneInfo(getattr(job.user, "timezone", "Asia/Kolkata") or "Asia/Kolkata")
+
+    BatchItem.objects.bulk_create([BatchItem(job=job, target_date=d) for d in dates], ignore_conflicts=True)
+    todo = list(job.batch_items.exclude(status=BatchItem.STATUS_DONE))
+    if todo:
+        set_progress(job, 2, "Planning topics…")
+    ideas = topics.take(job.user, [bi.target_date for bi in todo])
+    total = len(dates)
+    done = total - len(todo)
+    failed = 0
+    ready = []
+
+    def note():
+        return f"{done}/{total} drafted" + (f", {failed} failed" if failed else "") + "…"
+
+    set_progress(job, int(100 * done / total), note())
+    # Own pool (not fanout's): each draft fans out body+meta onto the shared pool, and
+    # blocking on that pool from inside it could starve it.
+    with ThreadPoolExecutor(max_workers=settings.AUTO_POPULATE_CONCURRENCY, thread_name_prefix="batch") as pool:
+        futures = {
+            pool.submit(copy_context().run, fanout.in_worker, _draft, ctype, ideas[bi.target_date] or f"Idea for {bi.target_date.isoformat()}", style): bi
+            for bi in todo
+        }
+        for fut in as_completed(futures):
+            bi = futures[fut]
+            try:
+                ready.append((bi, fut.result()))
+            except Exception as e:
+                log.warning("Auto-populate %s for job %s failed: %s", bi.target_date, job.id, e)
+                bi.status, bi.error, bi.updated_at = BatchItem.STATUS_FAILED, f"{e.__class__.__name__}: {e}"[:255], timezone.now()
+                bi.save(update_fields=["status", "error", "updated_at"])
+                failed += 1
+            if len(ready) >= settings.AUTO_POPULATE_COMMIT_EVERY:
+                pending = len(ready)
+                saved = _commit_drafts(job, ready, ctype, unit_cost, user_tz, ideas)
+                done, failed = done + saved, failed + pending - saved
+            set_progress(job, int(100 * (done + failed) / total), note())
+
+    pending = len(ready)
+    saved = _commit_drafts(job, ready, ctype, unit_cost, user_tz, ideas)
+    done, failed = done + saved, failed + pending - saved
+    set_progress(job, 100, note().rstrip("…"))
+
+    if done == 0:
+        first_error = job.batch_items.exclude(error="").values_list("error", flat=True).first()
+        raise JobError(f"No drafts could be generated. {first_error or ''}".strip())
+    return {
+        "created": done,
+        "failed": failed,
+        "url": f"{reverse('calendar')}?month={dates[0].strftime('%Y-%m')}&mode=list",
+    }
+
+
+def _ingest_upload(job: Job) -> str:
+    """Moves payload["upload_id"] (optional) through the ingest stages. Returns why it was skipped, or ""."""
+    upload_id = job.payload.get("upload_id")
+    if not upload_id:
+        return ""
+    upload = Upload.objects.filter(id=upload_id, user=job.user).first()
+    if upload is None:
+        return "upload deleted"
+    stages = len(ingest.STAGES)
+    step = iter(range(stages))
+    try:
+        ingest.process(upload, on_stage=lambda note: set_progress(job, 10 + 70 * next(step) // stages, note))
+    except ingest.IngestError as e:
+        raise JobError(str(e))
+    if upload.status == Upload.STATUS_FAILED:
+        raise JobError(upload.status_error)
+    return ""
+
+
+def _publish_profile(job: Job) -> dict:
+    """Rebuilds the user's StyleProfile, unless a later ingest job is still queued to do it."""
+    later = Job.objects.filter(user=job.user, kind=Job.KIND_INGEST, status=Job.STATUS_QUEUED).exclude(id=job.id)
+    if later.exists():
+        return {"deferred": True, "url": reverse("my_style")}
+
+    set_progress(job, 85, "Updating your Style Profile…")
+    profile, created = rebuild_profile(job.user, fun_facts_min_chars=job.payload.get("fun_facts_min_chars"))
+    return {
+        "version": profile.version if profile else None,
+        "created": created,
+        "url": reverse("my_style"),
+    }
+
+
+@handler(Job.KIND_INGEST)
+def _run_ingest(job: Job) -> dict:
+    """
+    Moves one upload (payload["upload_id"], optional) through the ingest stages, then publishes
+    the user's StyleProfile. When more ingest jobs for the user are still queued, publishing is
+    left to the last of them, so a burst of uploads yields one new version, not one per file.
+    The publish step runs even when this job's upload fails: earlier jobs may have deferred to it.
+    """
+    try:
+        skipped = _ingest_upload(job)
+    except Exception:
+        try:
+            _publish_profile(job)
+        except Exception:
+            log.exception("Publishing the Style Profile after ingest job %s failed", job.id)
+        raise
+    result = _publish_profile(job)
+    if skipped:
+        result["skipped"] = skipped
+    return result
+
+
+@handler(Job.KIND_PLAN_TOPICS)
+def _run_plan_topics(job: Job) -> dict:
+    """
+    Plans topic suggestions for payload["dates"] that still have none, in one model call. Days
+    the model leaves short (or a failed call) are filled from keywords, so a planned day
+    doesn't stay missing and get re-planned on every page load.
+    """
+    dates = topics.missing(job.user, [date.fromisoformat(d) for d in job.payload["dates"]])
+    if dates:
+        set_progress(job, 20, "Planning topics…")
+        topics.plan(job.user, dates, allow_fallback=True)
+    return {"planned": len(dates)}
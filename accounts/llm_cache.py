@@ -0,0 +1,178 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+
+# Response cache for LLM calls whose answer we want stable for the same input (meta, image
+# terms, style analysis); callers opt in. Backends are swappable; LLMCache adds TTL,
+# single-flight and hit/miss counters on top. A caller's `cacheable` check decides which
+# replies are worth keeping, so a malformed reply is retried instead of replayed for a day.
+
+_MISS = object()
+
+
+def make_key(model: str, messages: List[Dict], params: dict) -> str:
+    payload = json.dumps({"m": model, "msg": messages, "p": params}, sort_keys=True, ensure_ascii=False, default=str)
+    return "llm:" + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LocalLRUBackend:
+    """In-process LRU with per-entry expiry. Thread-safe."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is None:
+                return _MISS
+            expires_at, value = hit
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return _MISS
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: int):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DjangoCacheBackend:
+    """Shared tier via a Django cache alias (DB/Redis/etc.), visible to every worker."""
+
+    def __init__(self, alias: str):
+        self.alias = alias
+
+    def get(self, key):
+        return caches[self.alias].get(key, _MISS)
+
+    def set(self, key, value, ttl: int):
+        caches[self.alias].set(key, value, ttl)
+
+
+class TieredBackend:
+    """Local LRU in front of a shared tier; shared hits are copied into the local tier."""
+
+    def __init__(self, local: LocalLRUBackend, shared: DjangoCacheBackend):
+        self.local = local
+        self.shared = shared
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is not _MISS:
+            return value
+        value = self.shared.get(key)
+        if value is not _MISS:
+            self.local.set(key, value, settings.LLM_CACHE_TTL)
+        return value
+
+    def set(self, key, value, ttl: int):
+        self.local.set(key, value, ttl)
+        self.shared.set(key, value, ttl)
+
+
+class LLMCache:
+    def __init__(self, backend, ttl: int):
+        self.backend = backend
+        self.ttl = ttl
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "coalesced": 0, "backend_errors": 0}
+
+    def _bump(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _get(self, key):
+        try:
+            return self.backend.get(key)
+        except Exception:
+            # A broken shared tier must never break generation
+            self._bump("backend_errors")
+            return _MISS
+
+    def _set(self, key, value):
+        try:
+            self.backend.set(key, value, self.ttl)
+        except Exception:
+            self._bump("backend_errors")
+
+    def get_or_call(self, key: str, fn: Callable[[], str], cacheable: Optional[Callable[[str], bool]] = None) -> str:
+        """
+        The cached reply for `key`, or fn()'s. Only non-empty replies that pass `cacheable`
+        are stored (and served: an entry failing it counts as a miss).
+        """
+        value = self._get(key)
+        if value is not _MISS and (cacheable is None or cacheable(value)):
+            self._bump("hits")
+            return value
+
+        # Single-flight: concurrent identical requests wait on the first caller's result
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = Future()
+                self._inflight[key] = flight
+                self.counters["misses"] += 1
+            else:
+                self.counters["coalesced"] += 1
+
+        if not leader:
+            return flight.result()
+
+        try:
+            value = fn()
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        else:
+            if value and (cacheable is None or cacheable(value)):  # never cache empty or unusable completions
+                self._set(key, value)
+            flight.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self.counters)
+            out["inflight"] = len(self._inflight)
+        lookups = out["hits"] + out["misses"] + out["coalesced"]
+        out["hit_rate"] = round((out["hits"] + out["coalesced"]) / lookups, 3) if lookups else 0.0
+        out["backend"] = settings.LLM_CACHE_BACKEND
+        return out
+
+
+def _build_backend():
+    kind = settings.LLM_CACHE_BACKEND
+    if kind == "django":
+        return DjangoCacheBackend(settings.LLM_CACHE_ALIAS)
+    local = LocalLRUBackend(settings.LLM_CACHE_MAX_ENTRIES)
+    if kind == "tiered":
+        return TieredBackend(local, DjangoCacheBackend(settings.LLM_CACHE_ALIAS))
+    return local
+
+
+cache = LLMCache(_build_backend(), ttl=settings.LLM_CACHE_TTL)
+
+
+def enabled() -> bool:
+    return settings.LLM_CACHE_BACKEND != "off"
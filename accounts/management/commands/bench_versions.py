@@ -0,0 +1,86 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts import versions
+from accounts.models import ContentItem, ContentVersion, User
+
+
+def _draft(rng: random.Random, paragraphs: int) -> list:
+    words = "draft section growth pricing team customers launch process data example story lesson".split()
+    return [" ".join(rng.choice(words) for _ in range(rng.randint(40, 90))) + "." for _ in range(paragraphs)]
+
+
+def _improve(rng: random.Random, paras: list) -> list:
+    """A typical Improve: a couple of paragraphs rewritten, sometimes one added."""
+    paras = list(paras)
+    for i in rng.sample(range(len(paras)), k=min(2, len(paras))):
+        paras[i] = " ".join(reversed(paras[i].split())).capitalize()
+    if rng.random() < 0.3:
+        paras.insert(rng.randrange(len(paras)), _draft(rng, 1)[0])
+    return paras
+
+
+def _ms(fn, repeat: int) -> tuple:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    times.sort()
+    return statistics.median(times), times[int(0.95 * (len(times) - 1))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark ContentVersion delta storage on synthetic histories: bytes stored vs. full "
+        "copies, and read latency of the latest and older versions. Writes nothing (rolled back)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, default=20)
+        parser.add_argument("--versions", type=int, default=30, help="Versions per item.")
+        parser.add_argument("--paragraphs", type=int, default=14, help="~8 KB drafts at the default.")
+        parser.add_argument("--repeat", type=int, default=50, help="Reads per measurement.")
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **opts):
+        rng = random.Random(opts["seed"])
+        with transaction.atomic():
+            user = User.objects.create(username=f"bench-versions-{time.time_ns()}")
+            full_bytes, items = 0, []
+            for n in range(opts["items"]):
+                item = ContentItem.objects.create(user=user, type=ContentItem.TYPE_BLOG, topic=f"Bench {n}")
+                paras = _draft(rng, opts["paragraphs"])
+                for v in range(opts["versions"]):
+                    body = "# Bench\n\n" + "\n\n".join(paras)
+                    full_bytes += len(body.encode("utf-8"))
+                    versions.create(item, body, {"meta_title": f"Bench {n}"})
+                    paras = _improve(rng, paras)
+                items.append(item)
+
+            stored = sum(map(versions.stored_bytes, ContentVersion.objects.filter(content__user=user)))
+            self.stdout.write(
+                f"{opts['items']} items x {opts['versions']} versions: full copies {full_bytes / 1024:.0f} KB, "
+                f"stored {stored / 1024:.0f} KB ({100.0 * (1 - stored / full_bytes):.0f}% saved)"
+            )
+
+            item = items[0]
+            # The version with the longest chain of deltas behind it: the slowest read
+            deepest, depth, chain = 1, 0, 0
+            for v, has_body in item.versions.order_by("version_no").values_list("version_no", "body_md"):
+                chain = 0 if has_body else chain + 1
+                if chain > depth:
+                    deepest, depth = v, chain
+            cases = [
+                ("latest  item.versions.first().body_md", lambda: item.versions.first().body_md),
+                ("keyframe v1 .body", lambda: item.versions.get(version_no=1).body),
+                (f"deepest delta v{deepest} ({depth} deltas) .body", lambda: item.versions.get(version_no=deepest).body),
+            ]
+            for label, fn in cases:
+                p50, p95 = _ms(fn, opts["repeat"])
+                self.stdout.write(f"  {label:<40} p50 {p50:6.2f} ms  p95 {p95:6.2f} ms")
+            transaction.set_rollback(True)
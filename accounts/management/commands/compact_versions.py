@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from accounts import versions
+from accounts.models import ContentItem
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-store existing ContentVersion histories as keyframes + compressed deltas "
+        "(or, with --expand, back in full). Safe to re-run; items are done one transaction each."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--expand", action="store_true", help="Store every version in full again.")
+        parser.add_argument("--user", type=int, help="Only this user's items.")
+
+    def handle(self, *args, **opts):
+        items = ContentItem.objects.annotate(n=Count("versions")).filter(n__gt=1).order_by("id")
+        if opts["user"]:
+            items = items.filter(user_id=opts["user"])
+        rewrite = versions.expand if opts["expand"] else versions.compact
+        total_before = total_after = done = 0
+        for item in items.iterator():
+            before, after = rewrite(item)
+            total_before += before
+            total_after += after
+            done += 1
+        saved = total_before - total_after
+        pct = 100.0 * saved / total_before if total_before else 0.0
+        self.stdout.write(
+            f"{done} item(s): {total_before / 1024:.1f} KB -> {total_after / 1024:.1f} KB "
+            f"({'saved' if saved >= 0 else 'added'} {abs(saved) / 1024:.1f} KB, {abs(pct):.0f}%)."
+        )
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.fake_upstream import FakeConfig, make_server
+
+
+class Command(BaseCommand):
+    help = "Serve fake OpenAI/Pexels/Unsplash endpoints for offline development and load tests."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--latency-ms", type=float, default=150, help="Mean delay before each response.")
+        parser.add_argument("--jitter-ms", type=float, default=100, help="Uniform +/- spread around the mean.")
+        parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 500.")
+        parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction answered with a 429.")
+        parser.add_argument("--retry-after-ms", type=int, default=500, help="retry-after-ms sent with 429s.")
+        parser.add_argument("--words", type=int, default=900, help="Approximate length of generated drafts.")
+        parser.add_argument("--token-delay-ms", type=float, default=15, help="Gap between streamed chunks.")
+        parser.add_argument("--record", metavar="TAPE", help="Proxy to the real APIs and append responses to TAPE.")
+        parser.add_argument("--replay", metavar="TAPE", help="Serve recorded responses from TAPE (synthetic on a miss).")
+
+    def handle(self, *args, **opts):
+        if opts["record"] and opts["replay"]:
+            raise CommandError("Use either --record or --replay, not both.")
+        mode = "record" if opts["record"] else "replay" if opts["replay"] else "synthetic"
+        config = FakeConfig(
+            latency_ms=opts["latency_ms"],
+            jitter_ms=opts["jitter_ms"],
+            error_rate=opts["error_rate"],
+            rate_limit_rate=opts["rate_limit_rate"],
+            retry_after_ms=opts["retry_after_ms"],
+            words=opts["words"],
+            token_delay_ms=opts["token_delay_ms"],
+            mode=mode,
+            tape=opts["record"] or opts["replay"] or "",
+        )
+        server = make_server(opts["host"], opts["port"], config)
+        base = f"http://{opts['host']}:{opts['port']}"
+        self.stdout.write(f"Fake upstream ({mode}) on {base}")
+        self.stdout.write(f"  OPENAI_BASE_URL={base}/v1 PEXELS_BASE_URL={base} UNSPLASH_BASE_URL={base}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from accounts import jobs
+
+
+class Command(BaseCommand):
+    help = "Process queued generation jobs. Run as many of these as you like, separately from web workers."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Drain the queue once and exit.")
+        parser.add_argument("--sleep", type=float, default=settings.JOBS_POLL_INTERVAL,
+                            help="Seconds to wait when the queue is empty.")
+
+    def handle(self, *args, **opts):
+        self.stdout.write(f"Job worker {jobs.WORKER_ID} started.")
+        last_sweep = 0.0
+        while True:
+            close_old_connections()
+            if time.monotonic() - last_sweep > 60:
+                requeued = jobs.requeue_stale()
+                if requeued:
+                    self.stdout.write(f"Recovered {requeued} stale job(s).")
+                last_sweep = time.monotonic()
+
+            job = jobs.claim_next()
+            if job is None:
+                if opts["once"]:
+                    return
+                time.sleep(opts["sleep"])
+                continue
+
+            jobs.run(job)
+            self.stdout.write(f"{job} in {(job.finished_at - job.started_at).total_seconds():.1f}s")
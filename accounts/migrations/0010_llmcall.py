@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:17
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_contentversion_hero_image_prompt_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMCall',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('feature', models.CharField(choices=[('blog', 'Blog'), ('linkedin', 'LinkedIn'), ('improve', 'Improve'), ('meta', 'SEO meta'), ('style', 'Style analysis'), ('fun_facts', 'Fun facts'), ('image_term', 'Image search term'), ('hero_prompt', 'Hero image prompt'), ('hero_image', 'Hero image'), ('other', 'Other')], max_length=20)),
+                ('model', models.CharField(max_length=64)),
+                ('prompt_tokens', models.PositiveIntegerField(default=0)),
+                ('completion_tokens', models.PositiveIntegerField(default=0)),
+                ('latency_ms', models.PositiveIntegerField(default=0)),
+                ('retries', models.PositiveSmallIntegerField(default=0)),
+                ('outcome', models.CharField(choices=[('ok', 'OK'), ('error', 'Error'), ('cached', 'Cache hit')], default='ok', max_length=10)),
+                ('error', models.CharField(blank=True, max_length=200)),
+                ('cost_usd', models.DecimalField(decimal_places=6, default=0, max_digits=10)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='llm_calls', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['feature', 'created_at'], name='accounts_ll_feature_510461_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:22
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_heartbeat(apps, schema_editor):
+    Job = apps.get_model("accounts", "Job")
+    Job.objects.filter(heartbeat_at__isnull=True).update(heartbeat_at=models.F("started_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_llmcall'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_heartbeat, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='BatchItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target_date', models.DateField()),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='PENDING', max_length=10)),
+                ('error', models.CharField(blank=True, max_length=255)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('content', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='accounts.contentitem')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='batch_items', to='accounts.job')),
+            ],
+            options={
+                'ordering': ['target_date'],
+                'unique_together': {('job', 'target_date')},
+            },
+        ),
+    ]
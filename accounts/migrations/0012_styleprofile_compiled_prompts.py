@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_batchitem_job_heartbeat_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='styleprofile',
+            name='compiled_prompts',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='styleprofile',
+            name='prompt_tokens_est',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_styleprofile_compiled_prompts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='upload',
+            name='analysis_json',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='upload',
+            name='analysis_weight',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='upload',
+            name='analyzed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
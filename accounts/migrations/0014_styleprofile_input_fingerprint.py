@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0013_upload_partial_analysis'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='styleprofile',
+            name='input_fingerprint',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0014_styleprofile_input_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='upload',
+            name='extract_stats',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:38
+
+from django.db import migrations, models
+
+
+def mark_existing_published(apps, schema_editor):
+    # Uploads from before staged ingestion were processed synchronously and are already merged
+    Upload = apps.get_model("accounts", "Upload")
+    Upload.objects.exclude(text_extract="").update(status="PUBLISHED")
+    Upload.objects.filter(text_extract="").update(status="FAILED", status_error="No text could be extracted from this file.")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0015_upload_extract_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='upload',
+            name='status',
+            field=models.CharField(choices=[('STORED', 'Uploaded'), ('EXTRACTED', 'Text extracted'), ('NORMALIZED', 'Text cleaned'), ('ANALYZED', 'Analysed'), ('PUBLISHED', 'In your profile'), ('FAILED', 'Failed')], db_index=True, default='STORED', max_length=12),
+        ),
+        migrations.AddField(
+            model_name='upload',
+            name='status_error',
+            field=models.CharField(blank=True, max_length=300),
+        ),
+        migrations.AlterField(
+            model_name='job',
+            name='kind',
+            field=models.CharField(choices=[('GENERATE', 'Generate'), ('IMPROVE', 'Improve'), ('CHANGE_TOPIC', 'Change topic'), ('AUTO_POPULATE', 'Auto-populate'), ('INGEST', 'Style ingestion')], max_length=20),
+        ),
+        migrations.RunPython(mark_existing_published, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:45
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0017_usercorpus'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='job',
+            name='kind',
+            field=models.CharField(choices=[('GENERATE', 'Generate'), ('IMPROVE', 'Improve'), ('CHANGE_TOPIC', 'Change topic'), ('AUTO_POPULATE', 'Auto-populate'), ('INGEST', 'Style ingestion'), ('PLAN_TOPICS', 'Topic planning')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='llmcall',
+            name='feature',
+            field=models.CharField(choices=[('blog', 'Blog'), ('linkedin', 'LinkedIn'), ('improve', 'Improve'), ('meta', 'SEO meta'), ('style', 'Style analysis'), ('fun_facts', 'Fun facts'), ('image_term', 'Image search term'), ('topics', 'Topic planning'), ('hero_prompt', 'Hero image prompt'), ('hero_image', 'Hero image'), ('other', 'Other')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='TopicSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target_date', models.DateField()),
+                ('rank', models.PositiveSmallIntegerField(default=0)),
+                ('topic', models.CharField(max_length=200)),
+                ('used', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('pillar', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='accounts.guidelinepillar')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='topic_suggestions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['target_date', 'rank'],
+                'indexes': [models.Index(fields=['user', 'target_date'], name='accounts_to_user_id_dd170b_idx')],
+            },
+        ),
+    ]
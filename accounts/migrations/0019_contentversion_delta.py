@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0018_topicsuggestion_job_plan_topics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contentversion',
+            name='delta',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='contentversion',
+            name='is_keyframe',
+            field=models.BooleanField(default=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0019_contentversion_delta'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='llmcall',
+            name='outcome',
+            field=models.CharField(choices=[('ok', 'OK'), ('error', 'Error'), ('cached', 'Cache hit'), ('aborted', 'Aborted (client left)')], default='ok', max_length=10),
+        ),
+    ]
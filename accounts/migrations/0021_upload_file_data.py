@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0020_llmcall_outcome_aborted'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='upload',
+            name='file_data',
+            field=models.BinaryField(blank=True, default=b''),
+        ),
+    ]
@@ -4,6 +4,8 @@ from django.db import models
 from django.utils import timezone
 import os
 
+from . import deltas, prompts
+
 class User(AbstractUser):
     timezone = models.CharField(max_length=64, default="Asia/Kolkata")
     credits = models.PositiveIntegerField(default=50)  # initial grant
@@ -42,6 +44,23 @@ class Upload(models.Model):
         (FILE_TEXT, "Typed"),
     ]
 
+    # Ingestion stages, in order (accounts/ingest.py). Each is persisted, so a retry resumes
+    # from the last one completed.
+    STATUS_STORED = "STORED"
+    STATUS_EXTRACTED = "EXTRACTED"
+    STATUS_NORMALIZED = "NORMALIZED"
+    STATUS_ANALYZED = "ANALYZED"
+    STATUS_PUBLISHED = "PUBLISHED"
+    STATUS_FAILED = "FAILED"  # terminal: nothing usable in the file
+    STATUS_CHOICES = [
+        (STATUS_STORED, "Uploaded"),
+        (STATUS_EXTRACTED, "Text extracted"),
+        (STATUS_NORMALIZED, "Text cleaned"),
+        (STATUS_ANALYZED, "Analysed"),
+        (STATUS_PUBLISHED, "In your profile"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -53,8 +72,22 @@ class Upload(models.Model):
     source = models.CharField(max_length=10, choices=SOURCE_CHOICES, default="FILE")
 
     bytes = models.PositiveIntegerField(default=0)
+    # The uploaded file's bytes, kept until its text is normalized: the job worker has no access
+    # to the web service's MEDIA_ROOT disk, so extraction reads them from here (accounts/extraction.py)
+    file_data = models.BinaryField(blank=True, default=b"", editable=False)
     text_extract = models.TextField(blank=True)
+    extract_stats = models.JSONField(default=dict, blank=True)  # pages read, per-page ms, errors (accounts/extraction.py)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Partial style analysis of this upload alone (accounts/style.py merges them into a profile)
+    analysis_json = models.JSONField(default=dict, blank=True)
+    analysis_weight = models.PositiveIntegerField(default=0)  # words in text_extract
+    analyzed_at = models.DateTimeField(null=True, blank=True)
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default=STATUS_STORED, db_index=True)
+    status_error = models.CharField(max_length=300, blank=True)  # last stage failure; cleared on success
+
+    @property
+    def is_pending(self):
+        return self.status not in (self.STATUS_PUBLISHED, self.STATUS_FAILED) and not self.status_error
 
     @property
     def filename(self):
@@ -63,6 +96,28 @@ class Upload(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.filename}"
 
+class UserCorpus(models.Model):
+    """
+    The user's uploads as one materialized, normalized text (accounts/corpus.py keeps it in
+    step as uploads are ingested or deleted), so a profile rebuild reads one row instead of
+    every upload's text. `segments` maps each upload to its slice of `text`:
+    [{"upload_id", "start", "end", "sha", "source", "created", "counts"}, ...] in upload order,
+    where "counts" are the upload's stylometry counts and `stats` their sum.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="corpus")
+    text = models.TextField(blank=True)
+    length = models.PositiveIntegerField(default=0)
+    segments = models.JSONField(default=list, blank=True)
+    stats = models.JSONField(default=dict, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def segment_text(self, segment: dict) -> str:
+        return self.text[segment["start"]:segment["end"]]
+
+    def __str__(self):
+        return f"{self.user} corpus ({len(self.segments)} uploads, {self.length} chars)"
+
 class StyleProfile(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="style_profiles")
     version = models.PositiveIntegerField(default=1)
@@ -70,10 +125,48 @@ class StyleProfile(models.Model):
     active = models.BooleanField(default=True)
     created_at = models.DateTimeField(default=timezone.now)
     fun_facts = models.JSONField(default=list, blank=True)
+    # Hash of everything the analysis was built from (accounts/style.input_fingerprint)
+    input_fingerprint = models.CharField(max_length=64, blank=True, db_index=True)
+    # System prompts compiled from summary_json (accounts/prompts.py), reused by every call
+    compiled_prompts = models.JSONField(default=dict, blank=True)
+    prompt_tokens_est = models.PositiveIntegerField(default=0)
 
     class Meta:
         ordering = ["-created_at"]
 
+    def _prompts_stale(self) -> bool:
+        return self.compiled_prompts.get("src") != prompts.source_hash(self.summary_json)
+
+    def compile_prompts(self):
+        self.compiled_prompts = prompts.compile_style_prompts(self.summary_json)
+        self.prompt_tokens_est = self.compiled_prompts["tokens"]
+
+    def save(self, *args, **kwargs):
+        if self._prompts_stale():
+            self.compile_prompts()
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "compiled_prompts", "prompt_tokens_est"}
+        super().save(*args, **kwargs)
+
+    def ensure_compiled(self):
+        """Rows compiled by an older PROMPT_VERSION (or never) are recompiled and stored once."""
+        if self._prompts_stale():
+            self.compile_prompts()
+            if self.pk:
+                type(self).objects.filter(pk=self.pk).update(
+                    compiled_prompts=self.compiled_prompts, prompt_tokens_est=self.prompt_tokens_est
+                )
+        return self
+
+    def system_prompt(self, kind: str) -> str:
+        """kind is "blog" or "linkedin"."""
+        return self.ensure_compiled().compiled_prompts[kind]
+
+    @property
+    def prompt_cache_key(self) -> str:
+        # Routes this profile's requests to the same upstream prefix cache
+        return f"style-{self.pk}-{self.compiled_prompts.get('src', '')}"
+
 class CreditTransaction(models.Model):
     KIND_CHOICES = [
         ("TOPUP", "Top-up / Added manually"),
@@ -119,9 +212,16 @@ class ContentItem(models.Model):
         return f"{self.get_type_display()} - {self.topic}"
 
 class ContentVersion(models.Model):
+    """
+    With CONTENT_VERSION_STORAGE="delta" (accounts/versions.py) only keyframes and the latest
+    version keep body_md; older versions keep a compressed delta against the one before and are
+    read through `body`.
+    """
     content = models.ForeignKey(ContentItem, on_delete=models.CASCADE, related_name="versions")
     version_no = models.PositiveIntegerField()
-    body_md = models.TextField()       # markdown string
+    body_md = models.TextField()       # markdown string ("" on superseded delta versions)
+    is_keyframe = models.BooleanField(default=True)
+    delta = models.BinaryField(null=True, blank=True, editable=False)  # zlib'd edit script vs. version_no - 1
     meta_json = models.JSONField(default=dict)  # e.g., meta title/description/keywords for blogs
     created_at = models.DateTimeField(auto_now_add=True)
     hero_image_url = models.URLField(blank=True, null=True)
@@ -133,6 +233,24 @@ class ContentVersion(models.Model):
         unique_together = ("content", "version_no")
         ordering = ["-version_no", "-created_at"]
 
+    @property
+    def body(self) -> str:
+        """The full markdown, rebuilt from the nearest stored body when this row only has a delta."""
+        if self.body_md or self.is_keyframe or self.delta is None:
+            return self.body_md
+        if getattr(self, "_body", None) is None:
+            earlier = type(self).objects.filter(content_id=self.content_id, version_no__lt=self.version_no)
+            start = (
+                earlier.filter(models.Q(is_keyframe=True) | ~models.Q(body_md=""))
+                .order_by("-version_no").only("version_no", "body_md").first()
+            )
+            text = start.body_md if start else ""
+            chain = earlier.filter(version_no__gt=start.version_no if start else 0).order_by("version_no")
+            for delta in chain.values_list("delta", flat=True):
+                text = deltas.apply(text, delta)
+            self._body = deltas.apply(text, self.delta)
+        return self._body
+
 class GuidelinePillar(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="pillars")
     title = models.CharField(max_length=80)
@@ -159,6 +277,27 @@ class GuidelineSchedule(models.Model):
         return f"{self.get_day_of_week_display()} → {self.pillar or '—'}"
 
 
+class TopicSuggestion(models.Model):
+    """
+    A planned topic idea for one day (accounts/topics.py). Rows are only valid for the pillar
+    the day had when they were planned; `used` ones were turned into content and aren't offered again.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="topic_suggestions")
+    pillar = models.ForeignKey(GuidelinePillar, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+    target_date = models.DateField()
+    rank = models.PositiveSmallIntegerField(default=0)
+    topic = models.CharField(max_length=200)
+    used = models.BooleanField(default=False)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["target_date", "rank"]
+        indexes = [models.Index(fields=["user", "target_date"])]
+
+    def __str__(self):
+        return f"{self.target_date} {self.topic}"
+
+
 class ContentHeroImage(models.Model):
     content = models.ForeignKey('ContentItem', on_delete=models.CASCADE, related_name='hero_images')
     prompt = models.TextField()
@@ -169,3 +308,133 @@ class ContentHeroImage(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+
+
+class Job(models.Model):
+    """
+    A unit of slow work (LLM generation) processed by `manage.py run_jobs`, off the request path.
+    Workers claim rows with SELECT ... FOR UPDATE SKIP LOCKED, so any number can run side by side.
+    """
+    KIND_GENERATE = "GENERATE"
+    KIND_IMPROVE = "IMPROVE"
+    KIND_CHANGE_TOPIC = "CHANGE_TOPIC"
+    KIND_AUTO_POPULATE = "AUTO_POPULATE"
+    KIND_INGEST = "INGEST"
+    KIND_PLAN_TOPICS = "PLAN_TOPICS"
+    KIND_CHOICES = [
+        (KIND_GENERATE, "Generate"),
+        (KIND_IMPROVE, "Improve"),
+        (KIND_CHANGE_TOPIC, "Change topic"),
+        (KIND_AUTO_POPULATE, "Auto-populate"),
+        (KIND_INGEST, "Style ingestion"),
+        (KIND_PLAN_TOPICS, "Topic planning"),
+    ]
+
+    STATUS_QUEUED = "QUEUED"
+    STATUS_RUNNING = "RUNNING"
+    STATUS_DONE = "DONE"
+    STATUS_FAILED = "FAILED"
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="jobs")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    content = models.ForeignKey(ContentItem, on_delete=models.CASCADE, null=True, blank=True, related_name="jobs")
+    payload = models.JSONField(default=dict, blank=True)
+    result = models.JSONField(default=dict, blank=True)
+    progress = models.PositiveSmallIntegerField(default=0)  # 0..100
+    progress_note = models.CharField(max_length=200, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    locked_by = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)  # bumped on progress; long batches aren't "stale"
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["created_at"]
+        indexes = [models.Index(fields=["status", "created_at"])]
+
+    @property
+    def is_active(self):
+        return self.status in (self.STATUS_QUEUED, self.STATUS_RUNNING)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.id} ({self.status})"
+
+
+class BatchItem(models.Model):
+    """
+    One date of an auto-populate job. Rows are created up front; a DONE row is committed in the
+    same transaction as its ContentItem, so a resumed job never drafts that date again.
+    """
+    STATUS_PENDING = "PENDING"
+    STATUS_DONE = "DONE"
+    STATUS_FAILED = "FAILED"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name="batch_items")
+    target_date = models.DateField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    content = models.ForeignKey(ContentItem, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    error = models.CharField(max_length=255, blank=True)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["target_date"]
+        unique_together = ("job", "target_date")
+
+    def __str__(self):
+        return f"{self.job_id} {self.target_date} ({self.status})"
+
+
+class LLMCall(models.Model):
+    """One upstream model call. Written in batches by accounts.usage, never per request."""
+    FEATURE_CHOICES = [
+        ("blog", "Blog"),
+        ("linkedin", "LinkedIn"),
+        ("improve", "Improve"),
+        ("meta", "SEO meta"),
+        ("style", "Style analysis"),
+        ("fun_facts", "Fun facts"),
+        ("image_term", "Image search term"),
+        ("topics", "Topic planning"),
+        ("hero_prompt", "Hero image prompt"),
+        ("hero_image", "Hero image"),
+        ("other", "Other"),
+    ]
+    OUTCOME_OK = "ok"
+    OUTCOME_ERROR = "error"
+    OUTCOME_CACHED = "cached"
+    OUTCOME_ABORTED = "aborted"
+    OUTCOME_CHOICES = [(OUTCOME_OK, "OK"), (OUTCOME_ERROR, "Error"), (OUTCOME_CACHED, "Cache hit"),
+                       (OUTCOME_ABORTED, "Aborted (client left)")]
+
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="llm_calls")
+    feature = models.CharField(max_length=20, choices=FEATURE_CHOICES)
+    model = models.CharField(max_length=64)
+    prompt_tokens = models.PositiveIntegerField(default=0)
+    completion_tokens = models.PositiveIntegerField(default=0)
+    latency_ms = models.PositiveIntegerField(default=0)
+    retries = models.PositiveSmallIntegerField(default=0)
+    outcome = models.CharField(max_length=10, choices=OUTCOME_CHOICES, default=OUTCOME_OK)
+    error = models.CharField(max_length=200, blank=True)
+    cost_usd = models.DecimalField(max_digits=10, decimal_places=6, default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [models.Index(fields=["feature", "created_at"])]
+
+    def __str__(self):
+        return f"{self.feature} {self.model} {self.latency_ms}ms ({self.outcome})"
@@ -0,0 +1,65 @@
+import hashlib
+import json
+
+from .token_budget import estimate_tokens
+
+# System prompts compiled once per StyleProfile version (see StyleProfile.system_prompt).
+# Layout is fixed so every call for a profile shares one byte-identical prefix:
+#   [system: role + house rules + the user's style]  <- stable, cacheable upstream
+#   [user:   the task, topic or draft]                <- varies per call
+# Bump PROMPT_VERSION whenever the wording below changes; stored prompts recompile lazily.
+
+PROMPT_VERSION = 1
+KINDS = ("blog", "linkedin")
+
+_ROLES = {
+    "blog": (
+        "You are an SEO blog writer. Write scannable, helpful blog posts between 800 to 1200 words "
+        "with headings, bullets, and examples."
+    ),
+    "linkedin": "You write concise LinkedIn posts with a strong hook and clear CTA.",
+}
+
+
+def _join(values, limit: int) -> str:
+    if isinstance(values, str):
+        return values
+    return "; ".join(str(v) for v in (values or [])[:limit])
+
+
+def style_blurb(style_summary: dict) -> str:
+    s = style_summary or {}
+    tone = ", ".join(s.get("tone_adjectives", [])[:5]) or s.get("onboarding_style_keywords", "")
+    lines = [
+        f"Imitate the user's style: tone={tone}; formality={s.get('formality', 'neutral')}; "
+        f"cadence={s.get('cadence', '')}; vocabulary={s.get('vocabulary_level', 'moderate')}; "
+        f"avg_sentence_length≈{s.get('avg_sentence_length', 14)} words; "
+        f"avg_paragraph_length≈{s.get('avg_paragraph_length', 3)} sentences.",
+        f"Follow these DO rules: {_join(s.get('style_do'), 6)}. Avoid these DON'Ts: {_join(s.get('style_dont'), 6)}.",
+    ]
+    optional = [
+        ("Voice", s.get("voice_summary")),
+        ("Recurring sentence patterns", _join(s.get("sentence_patterns"), 6)),
+        ("Typical hooks", _join(s.get("hook_styles"), 5)),
+        ("Typical calls to action", _join(s.get("call_to_action_styles"), 4)),
+        ("Emoji usage", s.get("emoji_usage")),
+        ("Domain vocabulary", _join(s.get("jargon_domains"), 8)),
+        ("Industry", s.get("industry")),
+    ]
+    lines.extend(f"{label}: {value}." for label, value in optional if value)
+    return "\n".join(lines)
+
+
+def source_hash(style_summary: dict) -> str:
+    payload = json.dumps(style_summary or {}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(f"{PROMPT_VERSION}:{payload}".encode("utf-8")).hexdigest()[:16]
+
+
+def compile_style_prompts(style_summary: dict) -> dict:
+    """Returns {"v", "src", "blog", "linkedin", "tokens"}; tokens is the larger system prompt's estimate."""
+    blurb = style_blurb(style_summary)
+    compiled = {"v": PROMPT_VERSION, "src": source_hash(style_summary)}
+    for kind in KINDS:
+        compiled[kind] = f"{_ROLES[kind]}\n\n{blurb}"
+    compiled["tokens"] = max(estimate_tokens(compiled[k]) for k in KINDS)
+    return compiled
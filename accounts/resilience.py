@@ -0,0 +1,215 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional, Tuple
+
+import openai
+import requests
+from django.conf import settings
+
+log = logging.getLogger(__name__)
+
+# One retry/circuit-breaker policy for every upstream (OpenAI, Pexels, Unsplash).
+# - honours Retry-After / retry-after-ms from the server
+# - full jitter: sleep = uniform(0, min(max_delay, base * 2**attempt))
+# - only transient errors are retried; 4xx client errors fail immediately
+# - a per-service breaker fails fast once the recent error rate crosses a threshold,
+#   so request threads are freed instead of sleeping on a struggling upstream.
+# Breakers are per process (shared by all threads of a gunicorn worker).
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(RuntimeError):
+    def __init__(self, service: str, retry_in: float):
+        super().__init__(f"{service} is temporarily unavailable (circuit open, retry in {retry_in:.0f}s)")
+        self.service = service
+        self.retry_in = retry_in
+
+
+# --- Error classification ---
+
+def _status_and_headers(exc) -> Tuple[Optional[int], dict]:
+    resp = getattr(exc, "response", None)
+    if resp is None:
+        return None, {}
+    return getattr(resp, "status_code", None), getattr(resp, "headers", None) or {}
+
+
+def _retry_after(headers) -> Optional[float]:
+    if not headers:
+        return None
+    ms = headers.get("retry-after-ms")
+    if ms:
+        try:
+            return float(ms) / 1000
+        except ValueError:
+            pass
+    ra = headers.get("retry-after")
+    if not ra:
+        return None
+    try:
+        return float(ra)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(ra).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+def classify(exc: BaseException) -> Tuple[bool, Optional[float]]:
+    """Returns (retryable, server_requested_delay_seconds)."""
+    status, headers = _status_and_headers(exc)
+    retry_after = _retry_after(headers)
+
+    if isinstance(exc, openai.RateLimitError):
+        # Out of quota is a 429 too, but waiting won't fix it
+        code = (getattr(exc, "code", None) or "")
+        return code != "insufficient_quota", retry_after
+    if isinstance(exc, openai.APIConnectionError):  # includes APITimeoutError
+        return True, None
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code in RETRYABLE_STATUS, retry_after
+    if isinstance(exc, openai.APIError):
+        return True, None  # errors without a status (e.g. a broken stream) are transient
+
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+        return True, None
+    if isinstance(exc, requests.HTTPError):
+        return status in RETRYABLE_STATUS, retry_after
+    return False, None
+
+
+# --- Circuit breaker ---
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, failure_rate: float, min_calls: int, window: float, cooldown: float):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self._events = deque()  # (monotonic ts, ok)
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def _trim(self, now):
+        while self._events and self._events[0][0] < now - self.window:
+            self._events.popleft()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            now = time.monotonic()
+            remaining = self._opened_at + self.cooldown - now
+            if self.state == self.OPEN and remaining <= 0:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True  # exactly one trial call goes through
+                return
+            raise CircuitOpenError(self.name, max(remaining, 1.0))
+
+    def record(self, ok: bool):
+        with self._lock:
+            now = time.monotonic()
+            if self.state == self.HALF_OPEN:
+                self._probe_in_flight = False
+                if ok:
+                    self.state = self.CLOSED
+                    self._events.clear()
+                else:
+                    self._open(now)
+                return
+            self._events.append((now, ok))
+            self._trim(now)
+            total = len(self._events)
+            failures = sum(1 for _, good in self._events if not good)
+            if total >= self.min_calls and failures / total >= self.failure_rate:
+                self._open(now)
+
+    def _open(self, now):
+        if self.state != self.OPEN:
+            log.warning("Circuit for %s opened for %.0fs", self.name, self.cooldown)
+        self.state = self.OPEN
+        self._opened_at = now
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            self._trim(time.monotonic())
+            total = len(self._events)
+            failures = sum(1 for _, good in self._events if not good)
+            return {"state": self.state, "calls": total, "failures": failures}
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker(service: str) -> CircuitBreaker:
+    with _breakers_lock:
+        if service not in _breakers:
+            b = settings.CIRCUIT_BREAKER
+            _breakers[service] = CircuitBreaker(
+                service, b["failure_rate"], b["min_calls"], b["window_seconds"], b["cooldown_seconds"]
+            )
+        return _breakers[service]
+
+
+def breaker_stats() -> dict:
+    with _breakers_lock:
+        names = list(_breakers)
+    return {name: breaker(name).snapshot() for name in names}
+
+
+# --- Retry loop ---
+
+def backoff_delay(attempt: int, base: float, max_delay: float, retry_after: Optional[float] = None) -> float:
+    jittered = random.uniform(0, min(max_delay, base * (2 ** attempt)))
+    if retry_after is not None:
+        return max(retry_after, jittered)
+    return jittered
+
+
+def call(service: str, fn: Callable, stats=None):
+    """
+    Runs fn() under the service's retry policy and circuit breaker.
+    `stats` (usage.CallStats) gets .retries set to the number of retries taken.
+    Raises the last upstream error, or CircuitOpenError when failing fast.
+    """
+    policy = settings.UPSTREAM_POLICIES.get(service) or settings.UPSTREAM_POLICIES["default"]
+    circuit = breaker(service)
+    attempts = policy["max_attempts"]
+
+    for attempt in range(attempts):
+        if stats is not None:
+            stats.retries = attempt
+        circuit.allow()
+        try:
+            result = fn()
+        except Exception as e:
+            retryable, retry_after = classify(e)
+            if not retryable:
+                # Our request was wrong (400/401/404...); the upstream itself is healthy
+                circuit.record(True)
+                raise
+            circuit.record(False)
+            if attempt == attempts - 1:
+                raise
+            delay = backoff_delay(attempt, policy["base_delay"], policy["max_delay"], retry_after)
+            if delay > policy["max_delay"]:
+                # Server wants us to wait longer than a request thread should sleep
+                raise
+            log.info("%s transient error (%s); retry %d in %.2fs", service, e.__class__.__name__, attempt + 1, delay)
+            time.sleep(delay)
+        else:
+            circuit.record(True)
+            return result
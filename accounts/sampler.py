@@ -0,0 +1,154 @@
+import hashlib
+import math
+import re
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import token_budget
+
+# Representative samples of a user's writing for prompts that can only take a few thousand
+# tokens. Instead of the corpus prefix (where the oldest or longest upload crowds out the
+# rest), passages are drawn from every upload by smooth weighted round-robin: an upload's
+# weight grows with recency (STYLE_SAMPLE_HALF_LIFE_DAYS) and source type
+# (STYLE_SAMPLE_SOURCE_WEIGHTS), and within an upload passages are taken spread across the
+# text rather than from its start. Near-duplicate passages (reposts, boilerplate) are skipped.
+# Deterministic: recency is measured from the start of the current week (_sampling_now), so
+# the same corpus gives the same sample all week and upstream caches keep hitting.
+
+_PARAGRAPHS = re.compile(r"\n[ \t]*\n")
+_SHINGLE_WORDS = 3
+_MIN_PASSAGE_TOKENS = 60
+_MAX_PASSAGE_TOKENS = 300
+
+
+def passages(text: str) -> List[str]:
+    """Paragraph-aligned passages of roughly _MIN.._MAX_PASSAGE_TOKENS tokens."""
+    out, current, used = [], [], 0
+    for para in _PARAGRAPHS.split(text or ""):
+        para = para.strip()
+        if not para:
+            continue
+        cost = token_budget.estimate_tokens(para)
+        if cost > _MAX_PASSAGE_TOKENS:
+            if current:
+                out.append("\n\n".join(current))
+                current, used = [], 0
+            out.extend(token_budget.chunks(para, _MAX_PASSAGE_TOKENS))
+            continue
+        current.append(para)
+        used += cost
+        if used >= _MIN_PASSAGE_TOKENS:
+            out.append("\n\n".join(current))
+            current, used = [], 0
+    if current:
+        out.append("\n\n".join(current))
+    return out
+
+
+def spread(items: list, n: int) -> list:
+    """Up to n items evenly spaced across `items`, first and last included, in order."""
+    if n <= 0:
+        return []
+    if len(items) <= n:
+        return list(items)
+    if n == 1:
+        return [items[0]]
+    step = (len(items) - 1) / (n - 1)
+    return [items[round(i * step)] for i in range(n)]
+
+
+def _spread_order(count: int) -> List[int]:
+    """Indices 0..count-1 ordered so any prefix covers the text evenly: 0, last, middle, quarters, ..."""
+    if count <= 0:
+        return []
+    order, seen = [], set()
+    parts = 1
+    while len(order) < count:
+        for k in range(parts + 1):
+            i = round(k * (count - 1) / parts)
+            if i not in seen:
+                seen.add(i)
+                order.append(i)
+        parts *= 2
+    return order
+
+
+def _shingles(text: str) -> set:
+    words = re.findall(r"\w+", text.lower())
+    grams = [" ".join(words[i:i + _SHINGLE_WORDS]) for i in range(max(1, len(words) - _SHINGLE_WORDS + 1))]
+    return {hashlib.blake2b(g.encode(), digest_size=8).digest() for g in grams}
+
+
+def _near_duplicate(shingles: set, kept: list) -> bool:
+    threshold = settings.STYLE_SAMPLE_NEAR_DUPLICATE
+    for other in kept:
+        overlap = len(shingles & other)
+        if overlap and overlap / len(shingles | other) >= threshold:
+            return True
+    return False
+
+
+def _weight(source: str, created: Optional[str], now: datetime) -> float:
+    w = settings.STYLE_SAMPLE_SOURCE_WEIGHTS.get(source, 1.0)
+    if created:
+        try:
+            age_days = max(0.0, (now - datetime.fromisoformat(created)).total_seconds() / 86400)
+        except (TypeError, ValueError):
+            age_days = 0.0
+        w *= math.pow(0.5, age_days / settings.STYLE_SAMPLE_HALF_LIFE_DAYS)
+    return max(w, 1e-6)
+
+
+def _sampling_now() -> datetime:
+    """Now, floored to Monday 00:00 UTC: recency weights change once a week, not every second."""
+    now = timezone.now()
+    return (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def sample_documents(documents: List[dict], max_tokens: int, now: datetime = None) -> str:
+    """
+    documents: [{"text", "source", "created" (ISO datetime)}, ...]. Returns passages from all
+    of them within max_tokens, each document's kept in text order, documents in input order.
+    """
+    now = now or _sampling_now()
+    texts = [passages(doc.get("text", "")) for doc in documents]
+    queues = [_spread_order(len(ps)) for ps in texts]  # passage indices, in pick order
+    weights = [_weight(doc.get("source", ""), doc.get("created"), now) for doc in documents]
+
+    chosen = [[] for _ in documents]
+    kept_shingles, used = [], 0
+    current = [0.0] * len(documents)
+    while any(queues):
+        # Smooth weighted round-robin over documents that still have passages
+        live = [i for i, q in enumerate(queues) if q]
+        for i in live:
+            current[i] += weights[i]
+        pick = max(live, key=lambda i: (current[i], -i))
+        current[pick] -= sum(weights[i] for i in live)
+        idx = queues[pick].pop(0)
+        passage = texts[pick][idx]
+        cost = token_budget.estimate_tokens(passage) + 2
+        if used + cost > max_tokens:
+            if used >= max_tokens - _MIN_PASSAGE_TOKENS:
+                break
+            continue  # too big for what's left; a shorter one may still fit
+        shingles = _shingles(passage)
+        if _near_duplicate(shingles, kept_shingles):
+            continue
+        kept_shingles.append(shingles)
+        chosen[pick].append(idx)
+        used += cost
+
+    return "\n\n".join(texts[i][idx] for i, picked in enumerate(chosen) for idx in sorted(picked))
+
+
+def sample_corpus(corpus, max_tokens: int) -> str:
+    """sample_documents() over a UserCorpus's segments."""
+    documents = [
+        {"text": corpus.segment_text(s), "source": s.get("source", ""), "created": s.get("created")}
+        for s in corpus.segments
+    ]
+    return sample_documents(documents, max_tokens)
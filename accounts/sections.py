@@ -0,0 +1,120 @@
+import re
+from typing import Dict, List, Optional
+
+# Markdown drafts as H2 sections, for improving part of a draft: only the chosen sections go
+# to the model (with an outline of the rest for context) and the new body is put back together
+# here. Section texts are exact slices of the body, so join(split(body)) == body and untouched
+# sections come back byte for byte.
+
+_H2 = re.compile(r"^##[ \t]+(.+?)[ \t#]*$")
+_FENCE = re.compile(r"^[ \t]*(```|~~~)")
+_WORD = re.compile(r"\w+")
+_SENTENCE = re.compile(r"(?<=[.!?])\s")
+
+INTRO = "Introduction"
+
+
+def split(body: str) -> List[dict]:
+    """
+    [{"index", "heading", "text"}, ...]: what precedes the first H2 (title, intro) is section 0
+    with heading "", then one section per H2. `text` includes the heading line.
+    """
+    body = body or ""
+    starts, in_fence = [], False
+    offset = 0
+    for line in body.splitlines(keepends=True):
+        if _FENCE.match(line):
+            in_fence = not in_fence
+        elif not in_fence:
+            m = _H2.match(line.rstrip("\r\n"))
+            if m:
+                starts.append((offset, m.group(1).strip()))
+        offset += len(line)
+
+    out = []
+    if not starts or starts[0][0] > 0:
+        out.append({"index": 0, "heading": "", "text": body[: starts[0][0] if starts else len(body)]})
+    for i, (start, heading) in enumerate(starts):
+        end = starts[i + 1][0] if i + 1 < len(starts) else len(body)
+        out.append({"index": len(out), "heading": heading, "text": body[start:end]})
+    return out
+
+
+def join(sections: List[dict]) -> str:
+    return "".join(s["text"] for s in sections)
+
+
+def label(section: dict) -> str:
+    return section["heading"] or INTRO
+
+
+def choices(body: str) -> list:
+    """(index, label) pairs for a form; empty when the draft has no H2 sections to pick from."""
+    parts = split(body)
+    if not any(s["heading"] for s in parts) or len(parts) < 2:
+        return []
+    return [(s["index"], label(s)) for s in parts if s["text"].strip()]
+
+
+def outline(sections: List[dict]) -> str:
+    """One line per section: index, heading, size and opening sentence."""
+    lines = []
+    for s in sections:
+        body = s["text"].split("\n", 1)[1] if s["heading"] and "\n" in s["text"] else s["text"]
+        body = " ".join(body.split())
+        first = _SENTENCE.split(body, 1)[0][:140] if body else ""
+        lines.append(f"[{s['index']}] {label(s)} ({len(_WORD.findall(body))} words): {first}")
+    return "\n".join(lines)
+
+
+def pick(sections: List[dict], opts: dict) -> List[int]:
+    """
+    Sections an Improve should rewrite: the ones chosen in the form; otherwise, when the
+    knobs aim at one part (a note naming a heading, or only "add an example/data point"),
+    that part; otherwise [] (the whole draft).
+    """
+    indexes = {s["index"] for s in sections}
+    chosen = sorted({int(i) for i in opts.get("sections") or []} & indexes)
+    if chosen:
+        return chosen
+    headed = [s for s in sections if s["heading"]]
+    if not headed:
+        return []
+    note = set(_WORD.findall((opts.get("custom_note") or "").lower()))
+    if note:
+        named = []
+        for s in headed:
+            words = {w for w in _WORD.findall(s["heading"].lower()) if len(w) > 3}
+            if words and words <= note:
+                named.append(s["index"])
+        if named:
+            return named
+    whole_draft_knobs = opts.get("length", "medium") != "medium" or opts.get("tone", "as_is") != "as_is"
+    if not whole_draft_knobs and (opts.get("add_example") or opts.get("add_data")):
+        largest = max(headed, key=lambda s: len(_WORD.findall(s["text"])))
+        return [largest["index"]]
+    return []
+
+
+def _heading_line(section: dict) -> str:
+    return section["text"].split("\n", 1)[0].rstrip("\r")
+
+
+def replace(sections: List[dict], rewritten: Dict[int, str]) -> str:
+    """
+    The body with `rewritten` ({index: markdown}) swapped in. A rewritten H2 section keeps its
+    original heading line if the model dropped it, and keeps the blank line that separated it
+    from the next section.
+    """
+    out = []
+    for s in sections:
+        new: Optional[str] = rewritten.get(s["index"])
+        if new is None or not new.strip():
+            out.append(s["text"])
+            continue
+        new = new.strip("\n")
+        if s["heading"] and not _H2.match(new.split("\n", 1)[0]):
+            new = _heading_line(s) + "\n\n" + new
+        trailing = s["text"][len(s["text"].rstrip("\n")):] or ("\n\n" if s is not sections[-1] else "")
+        out.append(new + trailing)
+    return "".join(out)
@@ -0,0 +1,231 @@
+import json
+import re
+from typing import List
+
+# Structured (JSON schema) model output: the schemas we request, a small local validator for
+# the subset of JSON Schema they use, and a cheap repair pass for almost-valid JSON, so a
+# stray code fence or trailing comma costs a regex instead of another round-trip.
+
+DRAFT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "body_md": {"type": "string", "minLength": 1},
+        "meta_title": {"type": "string"},
+        "meta_description": {"type": "string"},
+        "keywords": {"type": "array", "items": {"type": "string"}, "maxItems": 8},
+    },
+    "required": ["body_md", "meta_title", "meta_description", "keywords"],
+    "additionalProperties": False,
+}
+
+SECTIONS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "sections": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "index": {"type": "integer"},
+                    "markdown": {"type": "string"},  # blank: keep that section as it was
+                },
+                "required": ["index", "markdown"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["sections"],
+    "additionalProperties": False,
+}
+
+TOPIC_PLAN_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "days": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "date": {"type": "string"},
+                    "topics": {"type": "array", "items": {"type": "string"}},
+                },
+                "required": ["date", "topics"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["days"],
+    "additionalProperties": False,
+}
+
+
+class StructuredOutputError(ValueError):
+    def __init__(self, message: str, raw: str = ""):
+        super().__init__(message)
+        self.raw = raw
+
+
+# Keywords strict structured outputs reject; only the local validate() enforces them
+_LOCAL_ONLY = frozenset({"minLength", "maxLength"})
+
+
+def strict_schema(schema: dict) -> dict:
+    """A copy of `schema` the API accepts in strict mode: local-only keywords removed."""
+    out = {}
+    for key, value in schema.items():
+        if key in _LOCAL_ONLY:
+            continue
+        if key == "properties":
+            value = {name: strict_schema(sub) for name, sub in value.items()}
+        elif key == "items":
+            value = strict_schema(value)
+        out[key] = value
+    return out
+
+
+def response_format(name: str, schema: dict) -> dict:
+    """OpenAI `response_format` for strict schema-constrained output."""
+    return {"type": "json_schema", "json_schema": {"name": name, "strict": True, "schema": strict_schema(schema)}}
+
+
+# --- Validation ---
+
+_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool,
+}
+
+
+def validate(value, schema: dict, path: str = "$") -> List[str]:
+    """Returns a list of problems (empty when valid). Supports the keywords our schemas use."""
+    expected = schema.get("type")
+    wrong_type = expected and not isinstance(value, _TYPES[expected])
+    if wrong_type or (expected in ("integer", "number") and isinstance(value, bool)):
+        return [f"{path}: expected {expected}, got {type(value).__name__}"]
+
+    errors = []
+    if expected == "object":
+        for key in schema.get("required", []):
+            if key not in value:
+                errors.append(f"{path}.{key}: missing")
+        props = schema.get("properties", {})
+        for key, sub in props.items():
+            if key in value:
+                errors.extend(validate(value[key], sub, f"{path}.{key}"))
+        if schema.get("additionalProperties") is False:
+            errors.extend(f"{path}.{key}: unexpected" for key in value if key not in props)
+    elif expected == "array":
+        if "minItems" in schema and len(value) < schema["minItems"]:
+            errors.append(f"{path}: fewer than {schema['minItems']} items")
+        if "maxItems" in schema and len(value) > schema["maxItems"]:
+            errors.append(f"{path}: more than {schema['maxItems']} items")
+        if "items" in schema:
+            for i, item in enumerate(value):
+                errors.extend(validate(item, schema["items"], f"{path}[{i}]"))
+    elif expected == "string":
+        if "minLength" in schema and len(value.strip()) < schema["minLength"]:
+            errors.append(f"{path}: empty")
+        if "enum" in schema and value not in schema["enum"]:
+            errors.append(f"{path}: not one of {schema['enum']}")
+    return errors
+
+
+def _coerce(value: dict, schema: dict) -> dict:
+    """Fixes harmless shape drift before validating: comma-joined keyword strings, extra keys, long lists."""
+    props = schema.get("properties", {})
+    out = {}
+    for key, sub in props.items():
+        if key not in value:
+            continue
+        v = value[key]
+        if sub.get("type") == "array" and isinstance(v, str):
+            v = [s.strip() for s in v.split(",") if s.strip()]
+        if sub.get("type") == "array" and isinstance(v, list) and "maxItems" in sub:
+            v = v[: sub["maxItems"]]
+        out[key] = v
+    if schema.get("additionalProperties") is not False:
+        out.update({k: v for k, v in value.items() if k not in props})
+    return out
+
+
+# --- Repair ---
+
+_FENCE = re.compile(r"^\s*```(?:json|JSON)?\s*\n?(.*?)\n?```\s*$", re.S)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_SMART_OPEN = re.compile(r"([{\[,:]\s*)[“”]")
+_SMART_CLOSE = re.compile(r"[“”](\s*[:,}\]])")
+
+
+def _close_truncated(text: str) -> str:
+    """Closes an unterminated string and any open brackets (output cut off by max tokens)."""
+    stack, in_str, escaped = [], False, False
+    for ch in text:
+        if in_str:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_str = False
+        elif ch == '"':
+            in_str = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]" and stack:
+            stack.pop()
+    if in_str:
+        text += '"'
+    return text.rstrip().rstrip(",") + "".join(reversed(stack))
+
+
+def _loads(text: str):
+    return json.loads(text, strict=False)  # strict=False: tolerate raw newlines inside strings
+
+
+def repair_json(raw: str):
+    """
+    Parses model output that is JSON or nearly so. Each repair is tried only if the
+    previous form failed to parse. Raises StructuredOutputError when nothing works.
+    """
+    text = (raw or "").strip()
+    candidates = [text]
+
+    fenced = _FENCE.match(text)
+    if fenced:
+        text = fenced.group(1).strip()
+        candidates.append(text)
+    start = text.find("{")
+    if start != -1:
+        text = text[start:]
+    end = text.rfind("}")
+    sliced = text[:end + 1] if end != -1 else text  # drop prose after the object
+    candidates.append(sliced)
+
+    def fix(t):
+        t = _SMART_CLOSE.sub(r'"\1', _SMART_OPEN.sub(r'\1"', t))
+        return _TRAILING_COMMA.sub(r"\1", t)
+
+    candidates.append(fix(sliced))
+    candidates.append(_close_truncated(fix(text)))
+
+    for candidate in candidates:
+        try:
+            return _loads(candidate)
+        except ValueError:
+            continue
+    raise StructuredOutputError("Model output is not valid JSON.", raw=raw or "")
+
+
+def parse(raw: str, schema: dict) -> dict:
+    value = repair_json(raw)
+    if not isinstance(value, dict):
+        raise StructuredOutputError("Model output is not a JSON object.", raw=raw)
+    value = _coerce(value, schema)
+    errors = validate(value, schema)
+    if errors:
+        raise StructuredOutputError("Model output does not match schema: " + "; ".join(errors[:5]), raw=raw)
+    return value
@@ -0,0 +1,253 @@
+import hashlib
+import re
+from collections import defaultdict
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .ai_client import analyze_style_profile, generate_style_fun_facts
+from .models import StyleProfile, Upload, UserCorpus
+from .utils import merge_user_inputs_into_profile_json
+from . import corpus as user_corpus, sampler, stylometry, token_budget
+
+# Incremental style profiles. Each upload is analysed once, on arrival, into a partial
+# profile stored on the Upload; a profile version is a deterministic merge of those partials
+# weighted by word count, plus the onboarding inputs. Adding a post costs one small
+# analysis, deleting one costs a local re-merge, and every upload counts however large.
+# The numeric fields (everything stylometry.metrics() returns) are measured locally over the
+# whole corpus on every rebuild; the model only describes the qualitative ones.
+
+# Bump when the analysis prompt or the merge rules change: every user's next rebuild re-runs
+ANALYSIS_VERSION = 2
+_ONBOARDING_FIELDS = ("industry", "topical_keywords", "writing_style_keywords", "bio", "style_self_desc", "goals")
+
+# Fields the analyser returns, grouped by how they merge
+_CATEGORICAL = {  # allowed values, in tie-break order
+    "formality": ("neutral", "casual", "formal"),
+    "vocabulary_level": ("moderate", "simple", "advanced"),
+}
+_LISTS = {  # max items kept after merging
+    "tone_adjectives": 7,
+    "sentence_patterns": 6,
+    "jargon_domains": 10,
+    "thematic_pillars": 8,
+    "hook_styles": 5,
+    "call_to_action_styles": 4,
+    "style_do": 10,
+    "style_dont": 10,
+}
+_TEXT = ("cadence", "voice_summary")
+
+_WORDS = re.compile(r"\S+")
+
+
+def word_count(text: str) -> int:
+    return len(_WORDS.findall(text or ""))
+
+
+def _as_list(value) -> list:
+    if isinstance(value, str):
+        value = [v for v in re.split(r"[,;\n]", value)]
+    return [str(v).strip() for v in (value or []) if str(v).strip()]
+
+
+def merge_partials(partials: List[Tuple[int, dict]]) -> dict:
+    """
+    Reduces [(weight, partial_summary), ...] to one summary. Order-stable and free of
+    randomness, so the same partials always give the same profile:
+      categoricals -> weighted vote (ties go to the earlier value in _CATEGORICAL)
+      lists        -> items ranked by total weight (ties by first appearance), capped
+      free text    -> taken from the heaviest partial (ties: earliest)
+    """
+    partials = [(max(1, int(w or 0)), p) for w, p in partials if p]
+    if not partials:
+        return {}
+    out = {}
+
+    for field, allowed in _CATEGORICAL.items():
+        votes = defaultdict(int)
+        for w, p in partials:
+            v = str(p.get(field) or "").strip().lower()
+            if v in allowed:
+                votes[v] += w
+        if votes:
+            out[field] = max(allowed, key=lambda v: (votes.get(v, 0), -allowed.index(v)))
+
+    for field, cap in _LISTS.items():
+        score, first_seen, label = defaultdict(int), {}, {}
+        for w, p in partials:
+            for item in _as_list(p.get(field)):
+                key = item.lower()
+                score[key] += w
+                first_seen.setdefault(key, len(first_seen))
+                label.setdefault(key, item)
+        ranked = sorted(score, key=lambda k: (-score[k], first_seen[k]))
+        out[field] = [label[k] for k in ranked[:cap]]
+
+    heaviest = max(range(len(partials)), key=lambda i: (partials[i][0], -i))
+    for field in _TEXT:
+        value = partials[heaviest][1].get(field)
+        if not value:
+            value = next((p.get(field) for _, p in partials if p.get(field)), "")
+        out[field] = value
+
+    out["source_words"] = sum(w for w, _ in partials)
+    out["partials_merged"] = len(partials)
+    return out
+
+
+def _analysis_ok(summary: dict) -> bool:
+    # analyze_style_profile returns {"voice_summary": ..., "raw": ...} when it couldn't parse
+    return bool(summary) and "raw" not in summary
+
+
+def analyze_text(text: str) -> Tuple[int, dict]:
+    """Partial analysis of one text: (word_count, summary). Long texts are analysed in chunks and merged."""
+    # Long texts: chunks spread over the whole text, not just its opening
+    pieces = sampler.spread(
+        token_budget.chunks(text, token_budget.budget("style_partial")), settings.STYLE_MAX_CHUNKS_PER_TEXT
+    )
+    results = []
+    for piece in pieces:
+        # No onboarding keywords here: partials describe the text alone and stay valid when
+        # preferences change; onboarding inputs are merged in at profile level.
+        summary = analyze_style_profile(piece, onboarding_keywords="")
+        if _analysis_ok(summary):
+            results.append((word_count(piece), summary))
+    if not results:
+        return word_count(text), {}
+    merged = results[0][1] if len(results) == 1 else merge_partials(results)
+    return word_count(text), merged
+
+
+def analyze_upload(upload: Upload) -> bool:
+    """Computes and stores the upload's partial analysis. Returns False if nothing usable came back."""
+    weight, summary = analyze_text(upload.text_extract or "")
+    upload.analysis_weight = weight
+    upload.analysis_json = summary
+    upload.analyzed_at = timezone.now() if summary else None  # failed -> retried on the next rebuild
+    fields = ["analysis_json", "analysis_weight", "analyzed_at"]
+    if summary:
+        upload.status, upload.status_error = Upload.STATUS_ANALYZED, ""
+        fields += ["status", "status_error"]
+    upload.save(update_fields=fields)
+    return bool(summary)
+
+
+def input_fingerprint(corpus_hash: str, onboarding) -> str:
+    """UserCorpus.content_hash + onboarding answers + ANALYSIS_VERSION."""
+    h = hashlib.sha256(f"analysis-v{ANALYSIS_VERSION}\n{corpus_hash}".encode())
+    for field in _ONBOARDING_FIELDS:
+        h.update(f"\n{field}={getattr(onboarding, field, '') or ''}".encode("utf-8"))
+    return h.hexdigest()
+
+
+def _fun_facts(summary: dict, corpus: UserCorpus, seed: str, min_chars: Optional[int]) -> list:
+    """Exact stat facts computed locally; the model is asked only to top them up to FUN_FACTS_COUNT."""
+    if min_chars is None or corpus.length + len(seed) < min_chars:
+        return []
+    totals = stylometry.combine([corpus.stats]) if corpus.stats else stylometry.count(seed)
+    facts = stylometry.fun_facts(totals, limit=settings.FUN_FACTS_COUNT)
+    missing = settings.FUN_FACTS_COUNT - len(facts)
+    if missing > 0:
+        # A spread of passages from every upload, not the opening of the oldest one
+        sample = sampler.sample_corpus(corpus, token_budget.budget("fun_facts_corpus"))
+        try:
+            facts += generate_style_fun_facts(summary, (sample + "\n\n" + seed).strip(), count=missing)
+        except Exception:
+            pass
+    return facts
+
+
+def onboarding_seed(onboarding) -> str:
+    if onboarding is None:
+        return ""
+    return " ".join(filter(None, [onboarding.bio, onboarding.style_self_desc, onboarding.topical_keywords])).strip()
+
+
+def rebuild_profile(user, *, analyze_missing: bool = True, fun_facts_min_chars: int = None) -> Tuple[Optional[StyleProfile], bool]:
+    """
+    Returns (profile, created). Creates the next active StyleProfile version from the user's
+    upload partials, unless the inputs' fingerprint matches the active profile's: then that
+    profile is reused (created=False), or copied into a new version row when
+    STYLE_REUSE_AS_NEW_VERSION is set (created=True), and no model is called, except to fill in
+    fun facts it never had.
+    analyze_missing=False merges only what is already analysed (no LLM calls).
+    Fun facts are generated when fun_facts_min_chars is given and the corpus is at least that long;
+    without it the active profile's fun facts are carried over.
+    Returns (None, False) when there is nothing to build from.
+    """
+    onboarding = getattr(user, "onboarding", None)
+    # Texts come from the materialized corpus; upload rows are read for their partials only
+    materialized = user_corpus.for_user(user)
+    in_corpus = {s["upload_id"] for s in materialized.segments}
+    uploads = list(
+        Upload.objects.filter(user=user).defer("text_extract", "file_data").order_by("created_at", "id")
+    )
+    seed = onboarding_seed(onboarding)
+    use_seed = bool(seed) and materialized.length < 500 and analyze_missing
+    facts_seed = seed if use_seed else ""
+
+    fingerprint = input_fingerprint(materialized.content_hash, onboarding)
+    active = StyleProfile.objects.filter(user=user, active=True).first()
+    if active and active.input_fingerprint == fingerprint:
+        if not active.fun_facts:
+            active.fun_facts = _fun_facts(active.summary_json, materialized, facts_seed, fun_facts_min_chars)
+            if active.fun_facts:
+                active.save(update_fields=["fun_facts"])
+        if not settings.STYLE_REUSE_AS_NEW_VERSION:
+            _mark_published(uploads)
+            return active, False
+        return _create_version(user, active.summary_json, active.fun_facts, fingerprint, uploads), True
+
+    if analyze_missing:
+        for up in uploads:
+            # Uploads still before their NORMALIZED stage aren't in the corpus yet; their ingest job has them
+            if up.analyzed_at is None and up.id in in_corpus:
+                analyze_upload(up)
+
+    partials = [(up.analysis_weight, up.analysis_json) for up in uploads if up.analysis_json]
+    # Very little writing: let the onboarding answers speak too (LLM-cached while unchanged)
+    if use_seed:
+        seed_weight, seed_summary = analyze_text(seed)
+        if seed_summary:
+            partials.append((seed_weight, seed_summary))
+
+    if not partials:
+        return None, False
+
+    summary = merge_partials(partials)
+    measured = stylometry.metrics(stylometry.combine([materialized.stats])) if materialized.stats else {}
+    summary.update(measured or stylometry.measure([seed]))
+    summary = merge_user_inputs_into_profile_json(summary, onboarding)
+    facts = _fun_facts(summary, materialized, facts_seed, fun_facts_min_chars)
+    if fun_facts_min_chars is None and active:
+        facts = active.fun_facts  # not asked to regenerate them (e.g. an upload deleted): keep the current ones
+    # Some upload still lacks its analysis: leave the fingerprint empty so the next rebuild retries it
+    if any(up.analyzed_at is None and up.id in in_corpus for up in uploads):
+        fingerprint = ""
+    return _create_version(user, summary, facts, fingerprint, uploads), True
+
+
+def _mark_published(uploads: List[Upload]):
+    merged = [up.pk for up in uploads if up.analysis_json]
+    Upload.objects.filter(pk__in=merged, status=Upload.STATUS_ANALYZED).update(status=Upload.STATUS_PUBLISHED)
+
+
+def _create_version(user, summary: dict, facts: list, fingerprint: str, uploads: List[Upload]) -> StyleProfile:
+    with transaction.atomic():
+        # Serialises concurrent rebuilds (parallel ingest jobs) so version numbers stay unique
+        user._meta.model.objects.select_for_update().only("pk").get(pk=user.pk)  # request.user is a lazy proxy
+        _mark_published(uploads)
+        StyleProfile.objects.filter(user=user, active=True).update(active=False)
+        latest = StyleProfile.objects.filter(user=user).order_by("-version").first()
+        return StyleProfile.objects.create(
+            user=user,
+            version=1 + (latest.version if latest else 0),
+            summary_json=summary,
+            fun_facts=facts,
+            input_fingerprint=fingerprint,
+            active=True,
+        )
@@ -0,0 +1,210 @@
+import re
+from collections import Counter
+from typing import Iterable
+
+# Local, exact style metrics. Everything here is a count over the whole corpus (regex findall /
+# Counter passes, no per-character Python loops), so the numbers are measured rather than
+# guessed by the model, cost nothing upstream, and don't depend on how much text the model saw.
+# Counts from several texts simply add up; metrics() turns the totals into profile fields.
+
+_WORD = re.compile(r"[^\W\d_]+(?:['’][^\W\d_]+)*")
+_PARAGRAPH = re.compile(r"\n[ \t]*\n")
+_CLOSERS = "\"'”’)\\]"
+# A terminator run followed by optional closing quotes/brackets and then whitespace or the end
+_SENTENCE_END = re.compile(rf"[.!?…]+[{_CLOSERS}]*(?=\s|$)")
+_QUESTION_END = re.compile(rf"\?[.!?…]*[{_CLOSERS}]*(?=\s|$)")
+_EXCLAIM_END = re.compile(rf"![.!?…]*[{_CLOSERS}]*(?=\s|$)")
+# Paragraphs whose last character isn't a terminator still hold one sentence (headings, bullets)
+_UNTERMINATED = re.compile(rf"[^.!?…{_CLOSERS}\s][ \t]*(?=\n[ \t]*\n|\s*\Z)")
+_LINE_END = re.compile(rf"[.!?…][{_CLOSERS}]*[ \t]*\n")
+_LINK = re.compile(r"https?://\S+|www\.\S+")
+_EMOJI = re.compile("[\U0001F300-\U0001FAFF\U0001F1E6-\U0001F1FF\u2600-\u27BF\u2B50\u2B55]")
+_PUNCT = {
+    "em_dash": re.compile(r"—|–|\s-\s|--"),
+    "ellipsis": re.compile(r"…|\.\.\."),
+    "semicolon": re.compile(r";"),
+    "colon": re.compile(r":(?!//)"),
+    "parenthesis": re.compile(r"\("),
+    "exclamation": re.compile(r"!"),
+}
+_BULLET = re.compile(r"^[ \t]*(?:[-*•]|\d+[.)])[ \t]+", re.M)
+
+# Standardized type-token ratio over fixed windows, so long and short corpora compare fairly
+_TTR_WINDOW = 500
+_TOP_WORDS = 15
+
+_STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from further had
+has have having he her here hers herself him himself his how i if in into is it its itself just
+me more most my myself no nor not now of off on once only or other our ours ourselves out over
+own same she should so some such than that the their theirs them themselves then there these
+they this those through to too under until up very was we were what when where which while who
+whom why will with would you your yours yourself yourselves it's i'm don't that's you're we're
+can't isn't there's i've let's get got one like really much many make made even still way
+""".split())
+
+
+def count(text: str) -> dict:
+    """Raw counts for one text. Counts of several texts combine with combine()."""
+    text = text or ""
+    words = [w.lower() for w in _WORD.findall(_LINK.sub(" ", text))]  # URLs aren't vocabulary
+    paragraphs = sum(1 for p in _PARAGRAPH.split(text) if _WORD.search(p))
+    if paragraphs <= 1:
+        # No blank lines (typical of PDF extracts): a line ending a sentence ends a paragraph
+        paragraphs = 1 + len(_LINE_END.findall(text.strip()))
+    counts = {
+        "words": len(words),
+        "letters": sum(map(len, words)),
+        "sentences": len(_SENTENCE_END.findall(text)) + len(_UNTERMINATED.findall(text)),
+        "paragraphs": paragraphs,
+        "questions": len(_QUESTION_END.findall(text)),
+        "exclamations": len(_EXCLAIM_END.findall(text)),
+        "emojis": len(_EMOJI.findall(text)),
+        "links": len(_LINK.findall(text)),
+        "bullets": len(_BULLET.findall(text)),
+        "ttr_windows": 0,
+        "ttr_sum": 0.0,
+        "vocab": Counter(w for w in words if len(w) > 3 and w not in _STOPWORDS),
+    }
+    for name, pattern in _PUNCT.items():
+        counts[name] = len(pattern.findall(text))
+    for start in range(0, len(words) - _TTR_WINDOW + 1, _TTR_WINDOW):
+        counts["ttr_windows"] += 1
+        counts["ttr_sum"] += len(set(words[start:start + _TTR_WINDOW])) / _TTR_WINDOW
+    if not counts["ttr_windows"] and words:  # shorter than one window: plain TTR, weighted as one
+        counts["ttr_windows"], counts["ttr_sum"] = 1, len(set(words)) / len(words)
+    return counts
+
+
+def combine(all_counts: Iterable[dict]) -> dict:
+    total = {"vocab": Counter()}
+    for c in all_counts:
+        for key, value in c.items():
+            if key == "vocab":
+                total["vocab"].update(value)
+            else:
+                total[key] = total.get(key, 0) + value
+    return total
+
+
+def _level(value: float, thresholds) -> str:
+    for limit, label in thresholds:
+        if value <= limit:
+            return label
+    return thresholds[-1][1]
+
+
+_HABITS = (  # (count key, notable rate per 100 sentences, note)
+    ("em_dash", 8, "uses dashes for asides"),
+    ("ellipsis", 4, "trails off with ellipses"),
+    ("semicolon", 4, "links clauses with semicolons"),
+    ("colon", 10, "sets up points with colons"),
+    ("parenthesis", 6, "adds parenthetical remarks"),
+    ("exclamation", 10, "uses exclamation marks for emphasis"),
+)
+
+
+def _habits(totals: dict, sentences: int) -> list:
+    """Up to 4 notes, most pronounced first."""
+    found = []
+    for key, threshold, note in _HABITS:
+        rate = 100.0 * totals.get(key, 0) / sentences
+        if rate >= threshold:
+            found.append((rate / threshold, f"{note} (~{rate:.0f} per 100 sentences)"))
+    notes = [note for _, note in sorted(found, key=lambda f: -f[0])]
+    if not totals.get("exclamation") and sentences >= 20:
+        notes.append("never uses exclamation marks")
+    bullets = totals.get("bullets", 0)
+    if bullets >= 3 and bullets * 10 >= sentences:
+        notes.append("breaks ideas into bullet lists")
+    return notes[:4]
+
+
+def metrics(totals: dict) -> dict:
+    """Profile fields from combined counts. Empty dict when there is no text to measure."""
+    words, sentences = totals.get("words", 0), totals.get("sentences", 0)
+    if not words or not sentences:
+        return {}
+    paragraphs = max(1, totals.get("paragraphs", 0))
+    per100w = lambda n: 100.0 * n / words  # noqa: E731
+    return {
+        "avg_sentence_length": round(words / sentences, 1),
+        "avg_paragraph_length": round(sentences / paragraphs, 1),
+        "avg_word_length": round(totals.get("letters", 0) / words, 2),
+        "question_rate": round(totals.get("questions", 0) / sentences, 3),
+        "exclamation_rate": round(totals.get("exclamations", 0) / sentences, 3),
+        "type_token_ratio": round(totals["ttr_sum"] / totals["ttr_windows"], 3) if totals.get("ttr_windows") else 0.0,
+        "emoji_per_100_words": round(per100w(totals.get("emojis", 0)), 2),
+        "links_per_1000_words": round(10 * per100w(totals.get("links", 0)), 2),
+        "emoji_usage": _level(per100w(totals.get("emojis", 0)), [(0, "none"), (0.5, "light"), (2, "moderate"), (1e9, "heavy")]),
+        "link_usage": _level(10 * per100w(totals.get("links", 0)), [(0.5, "rare"), (3, "sometimes"), (1e9, "frequent")]),
+        "punctuation_habits": _habits(totals, sentences),
+        "top_words": [w for w, _ in totals["vocab"].most_common(_TOP_WORDS)],
+        "measured_words": words,
+    }
+
+
+def measure(texts: Iterable[str]) -> dict:
+    """metrics() over all of `texts`."""
+    return metrics(combine(count(t) for t in texts if (t or "").strip()))
+
+
+# --- Fun facts ---
+
+def _every(n: int, per: int, unit: str) -> str:
+    """'every 12 sentences' for n occurrences in `per` units."""
+    gap = per / n
+    return f"every {gap:.0f} {unit}" if gap >= 1.5 else f"about {n / per:.1f} times per {unit.rstrip('s')}"
+
+
+def fun_facts(totals: dict, limit: int = 10) -> list:
+    """
+    Deterministic, exact facts about the writing, phrased for the My Style ticker (<= 120 chars).
+    Fewer than `limit` when the corpus doesn't have enough going on.
+    """
+    words, sentences = totals.get("words", 0), totals.get("sentences", 0)
+    if not words or not sentences:
+        return []
+    m = metrics(totals)
+    top = m["top_words"]
+    facts = []
+
+    if top:
+        facts.append(f"Your most-used word is “{top[0]}”.")
+    if len(top) >= 4:
+        facts.append(f"Runners-up in your vocabulary: {', '.join(top[1:4])}.")
+    facts.append(f"Your sentences average {m['avg_sentence_length']:g} words.")
+    if totals.get("paragraphs", 0) > 1:
+        facts.append(f"Your paragraphs run about {m['avg_paragraph_length']:g} sentences.")
+    questions = totals.get("questions", 0)
+    if questions:
+        facts.append(f"You ask {100 * questions / words:.1f} questions per 100 words.")
+    else:
+        facts.append("You state rather than ask: not a single question mark.")
+    dashes = totals.get("em_dash", 0)
+    if dashes:
+        facts.append(f"You reach for a dash {_every(dashes, sentences, 'sentences')} — on purpose.")
+    exclaims = totals.get("exclamation", 0)
+    if exclaims:
+        facts.append(f"An exclamation mark shows up {_every(exclaims, sentences, 'sentences')}!")
+    elif sentences >= 20:
+        facts.append("Zero exclamation marks. Calm, cool, collected.")
+    emojis = totals.get("emojis", 0)
+    if emojis:
+        facts.append(f"You use {m['emoji_per_100_words']:g} emojis per 100 words.")
+    if totals.get("ellipsis", 0):
+        facts.append(f"You trail off with an ellipsis {_every(totals['ellipsis'], sentences, 'sentences')}…")
+    if totals.get("semicolon", 0):
+        facts.append(f"Semicolon fan: one {_every(totals['semicolon'], sentences, 'sentences')}.")
+    if totals.get("parenthesis", 0):
+        facts.append(f"You add a (parenthetical) aside {_every(totals['parenthesis'], sentences, 'sentences')}.")
+    if totals.get("links", 0):
+        facts.append(f"You drop a link {_every(totals['links'], words, 'words')}.")
+    if totals.get("bullets", 0) >= 3:
+        facts.append(f"You’ve written {totals['bullets']:,} bullet points so far.")
+    if m["type_token_ratio"]:
+        facts.append(f"{m['type_token_ratio'] * 100:.0f}% of the words in a typical stretch are different ones.")
+    facts.append(f"Your average word is {m['avg_word_length']:g} letters long.")
+    facts.append(f"You’ve shared {words:,} words of your writing so far.")
+    return [f[:120] for f in facts[:limit]]
@@ -1,3 +1,585 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import ai_client, clients, corpus, deltas, fanout, images, jobs, llm_cache, resilience, sections, structured, stylometry, token_budget, versions
+from .fake_upstream import FakeConfig, make_server
+from .models import ContentItem, ContentVersion, Job, Onboarding, StyleProfile, TopicSuggestion, Upload, User
+from .style import merge_partials, rebuild_profile
+
+
+def _start_fake(config: FakeConfig):
+    server = make_server("127.0.0.1", 0, config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+class FakeUpstreamTestCase(TransactionTestCase):
+    """
+    Runs the real clients against a fake_upstream server on a free port: OpenAI, Pexels and
+    Unsplash all point at it, jobs run inline and uploads go to a temporary MEDIA_ROOT.
+    """
+
+    fake_config = FakeConfig(latency_ms=0, jitter_ms=0, token_delay_ms=0, words=200)
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server, cls.base_url = _start_fake(cls.fake_config)
+        cls.media = tempfile.mkdtemp()
+        cls.settings_override = override_settings(
+            OPENAI_BASE_URL=f"{cls.base_url}/v1",
+            PEXELS_BASE_URL=cls.base_url,
+            UNSPLASH_BASE_URL=cls.base_url,
+            LLM_CACHE_BACKEND="off",
+            LLM_USAGE_ENABLED=False,  # rows buffered past a test's table flush would hit missing users
+            JOBS_RUN_INLINE=True,
+            PDF_EXTRACT_WORKERS=0,
+            MEDIA_ROOT=cls.media,
+        )
+        cls.settings_override.enable()
+        clients._openai = None  # rebuilt on first use, against the fake
+
+    @classmethod
+    def tearDownClass(cls):
+        clients._openai = None
+        cls.settings_override.disable()
+        cls.server.shutdown()
+        cls.server.server_close()
+        shutil.rmtree(cls.media, ignore_errors=True)
+        super().tearDownClass()
+
+
+class FakeUpstreamTests(FakeUpstreamTestCase):
+    def test_chat_completion(self):
+        reply = clients.get_openai().chat.completions.create(
+            model=settings.OPENAI_MODEL, messages=[{"role": "user", "content": "Write about pricing."}],
+        )
+        self.assertTrue(reply.choices[0].message.content.startswith("# "))
+        self.assertGreater(reply.usage.completion_tokens, 0)
+
+    def test_streamed_completion_ends_with_usage(self):
+        stream = clients.get_openai().chat.completions.create(
+            model=settings.OPENAI_MODEL, messages=[{"role": "user", "content": "Write about pricing."}],
+            stream=True, stream_options={"include_usage": True},
+        )
+        chunks = list(stream)
+        text = "".join(c.choices[0].delta.content or "" for c in chunks if c.choices)
+        self.assertGreater(len(text.split()), 100)
+        self.assertGreater(chunks[-1].usage.total_tokens, 0)
+
+    def test_stock_photo_search(self):
+        pexels = requests.get(f"{self.base_url}/v1/search", params={"query": "desk", "per_page": 3}, timeout=5).json()
+        unsplash = requests.get(f"{self.base_url}/search/photos", params={"query": "desk", "per_page": 2}, timeout=5).json()
+        self.assertEqual(len(pexels["photos"]), 3)
+        self.assertEqual(len(unsplash["results"]), 2)
+
+    def test_injected_rate_limit_carries_retry_after(self):
+        server, base_url = _start_fake(FakeConfig(latency_ms=0, jitter_ms=0, rate_limit_rate=1.0, retry_after_ms=250))
+        try:
+            r = requests.post(f"{base_url}/v1/chat/completions", json={"messages": []}, timeout=5)
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(r.status_code, 429)
+        self.assertEqual(r.headers["retry-after-ms"], "250")
+
+
+class LLMCacheTests(SimpleTestCase):
+    def _cache(self):
+        return llm_cache.LLMCache(llm_cache.LocalLRUBackend(8), ttl=60)
+
+    def test_single_flight(self):
+        cache, calls, release = self._cache(), [], threading.Event()
+
+        def slow():
+            calls.append(1)
+            release.wait(5)
+            return "reply"
+
+        with ThreadPoolExecutor(4) as pool:
+            futures = [pool.submit(cache.get_or_call, "k", slow) for _ in range(4)]
+            while cache.stats()["coalesced"] < 3:
+                time.sleep(0.01)
+            release.set()
+            self.assertEqual([f.result() for f in futures], ["reply"] * 4)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.get_or_call("k", lambda: "other"), "reply")
+
+    def test_only_cacheable_replies_are_kept(self):
+        cache = self._cache()
+        is_json = lambda raw: raw.startswith("{")  # noqa: E731
+        self.assertEqual(cache.get_or_call("k", lambda: "oops", is_json), "oops")
+        self.assertEqual(cache.get_or_call("k", lambda: "", is_json), "")
+        self.assertEqual(cache.get_or_call("k", lambda: "{}", is_json), "{}")
+        self.assertEqual(cache.get_or_call("k", lambda: "{1}", is_json), "{}")
+        self.assertEqual(cache.stats()["hits"], 1)
+
+
+class ContentJobTests(FakeUpstreamTestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="writer", credits=10)
+        StyleProfile.objects.create(user=self.user, summary_json={"tone_adjectives": ["clear"]}, active=True)
+
+    def _generate(self, ctype="BLOG"):
+        day = date.today() + timedelta(days=3)
+        payload = {"cost": 2, "type": ctype, "topic": "Pricing pages", "target_date": day.isoformat(),
+                   "scheduled_for": f"{day.isoformat()}T09:00:00+00:00"}
+        return jobs.enqueue(self.user, Job.KIND_GENERATE, payload)
+
+    def test_generate_creates_item_version_and_debit(self):
+        for ctype in ("BLOG", "LINKEDIN"):
+            job = self._generate(ctype)
+            self.assertEqual(job.status, Job.STATUS_DONE, job.error)
+            self.assertTrue(job.content.versions.get().body_md.strip())
+        self.assertEqual(User.objects.get(pk=self.user.pk).credits, 6)
+
+        # A stale requeue of a committed job changes nothing
+        self._rerun(job)
+        self.assertEqual(job.status, Job.STATUS_DONE)
+        self.assertEqual(job.content.versions.count(), 1)
+        self.assertEqual(User.objects.get(pk=self.user.pk).credits, 6)
+
+    def test_generate_without_credits_leaves_nothing(self):
+        User.objects.filter(pk=self.user.pk).update(credits=1)
+        job = self._generate()
+        self.assertEqual(job.status, Job.STATUS_FAILED)
+        self.assertIn("Not enough credits", job.error)
+        self.assertFalse(ContentItem.objects.filter(user=self.user).exists())
+
+    def _rerun(self, job):
+        job.status = Job.STATUS_QUEUED  # as requeue_stale() leaves a job whose worker went quiet
+        job.save()
+        jobs._start(job)
+        return jobs.run(job)
+
+    def test_improve_and_change_topic_commit_once(self):
+        item = self._generate().content
+        for kind, payload in (
+            (Job.KIND_IMPROVE, {"cost": 1, "opts": {"length": "short"}}),
+            (Job.KIND_CHANGE_TOPIC, {"cost": 2, "new_topic": "Annual plans"}),
+        ):
+            job = jobs.enqueue(self.user, kind, payload, content=item)
+            self.assertEqual(job.status, Job.STATUS_DONE, job.error)
+            first = dict(job.result)
+            credits = User.objects.get(pk=self.user.pk).credits
+            self.assertEqual(self._rerun(job).result, first)
+            self.assertEqual(User.objects.get(pk=self.user.pk).credits, credits)
+        self.assertEqual(list(item.versions.values_list("version_no", flat=True)), [3, 2, 1])
+        self.assertEqual(User.objects.get(pk=self.user.pk).credits, 5)
+
+    @override_settings(JOBS_STALE_AFTER=0.15)
+    def test_heartbeat_keeps_a_long_call_from_going_stale(self):
+        job = Job.objects.create(user=self.user, kind=Job.KIND_IMPROVE)
+        jobs._start(job)
+        started = job.heartbeat_at
+        with jobs.heartbeat(job):
+            time.sleep(0.3)
+        job.refresh_from_db()
+        self.assertGreater(job.heartbeat_at, started)
+
+
+class ResilienceTests(SimpleTestCase):
+    @staticmethod
+    def _http_error(status, headers=None):
+        resp = requests.Response()
+        resp.status_code = status
+        resp.headers.update(headers or {})
+        return requests.HTTPError(response=resp)
+
+    def test_classify(self):
+        self.assertEqual(resilience.classify(self._http_error(503)), (True, None))
+        self.assertEqual(resilience.classify(self._http_error(429, {"retry-after-ms": "1500"})), (True, 1.5))
+        self.assertEqual(resilience.classify(self._http_error(404)), (False, None))
+        self.assertEqual(resilience.classify(requests.ConnectionError()), (True, None))
+        self.assertEqual(resilience.classify(ValueError()), (False, None))
+
+    def test_breaker_opens_then_lets_one_probe_through(self):
+        b = resilience.CircuitBreaker("test", failure_rate=0.5, min_calls=4, window=60, cooldown=0)
+        for ok in (True, False, True, False):
+            b.allow()
+            b.record(ok)
+        self.assertEqual(b.state, b.OPEN)
+        b.allow()  # cooldown over: the probe
+        self.assertEqual(b.state, b.HALF_OPEN)
+        with self.assertRaises(resilience.CircuitOpenError):
+            b.allow()
+        b.record(True)
+        self.assertEqual(b.state, b.CLOSED)
+
+
+class FanOutTests(SimpleTestCase):
+    def test_worker_closes_its_db_connection_even_when_the_call_fails(self):
+        with mock.patch.object(fanout, "connection") as conn:
+            self.assertEqual(fanout.in_worker(lambda x: x + 1, 1), 2)
+            with self.assertRaises(ZeroDivisionError):
+                fanout.in_worker(lambda: 1 / 0)
+        self.assertEqual(conn.close.call_count, 2)
+
+    def test_fan_out_maps_errors_and_missed_deadlines(self):
+        out = fanout.fan_out({"ok": lambda: 1, "bad": lambda: 1 / 0, "slow": lambda: time.sleep(0.5)}, deadline=0.2)
+        self.assertEqual(out["ok"], 1)
+        self.assertIsInstance(out["bad"], ZeroDivisionError)
+        self.assertIsInstance(out["slow"], fanout.FanOutTimeout)
+
+
+class StructuredTests(SimpleTestCase):
+    def test_validate_reports_each_problem(self):
+        errors = structured.validate({"body_md": " ", "keywords": "x", "extra": 1}, structured.DRAFT_SCHEMA)
+        self.assertIn("$.body_md: empty", errors)
+        self.assertIn("$.meta_title: missing", errors)
+        self.assertIn("$.keywords: expected array, got str", errors)
+        self.assertIn("$.extra: unexpected", errors)
+
+    def test_validate_rejects_bool_as_integer(self):
+        schema = structured.SECTIONS_SCHEMA["properties"]["sections"]["items"]
+        self.assertEqual(structured.validate({"index": 0, "markdown": ""}, schema), [])
+        self.assertTrue(structured.validate({"index": True, "markdown": ""}, schema))
+
+    def test_repair_json(self):
+        self.assertEqual(structured.repair_json('```json\n{"a": 1,}\n```'), {"a": 1})
+        self.assertEqual(structured.repair_json('Sure! {"a": “b”} Hope that helps.'), {"a": "b"})
+        self.assertEqual(structured.repair_json('{"a": [1, 2'), {"a": [1, 2]})
+        self.assertEqual(structured.repair_json('{"a": "cut off'), {"a": "cut off"})
+        with self.assertRaises(structured.StructuredOutputError):
+            structured.repair_json("no json here")
+
+    def test_parse_coerces_harmless_drift(self):
+        raw = '{"body_md": "# Hi", "meta_title": "T", "meta_description": "D", "keywords": "a, b", "x": 1}'
+        self.assertEqual(structured.parse(raw, structured.DRAFT_SCHEMA)["keywords"], ["a", "b"])
+
+    def test_strict_schema_drops_local_only_keywords(self):
+        sent = structured.response_format("draft", structured.DRAFT_SCHEMA)["json_schema"]["schema"]
+        self.assertNotIn("minLength", sent["properties"]["body_md"])
+        self.assertEqual(sent["properties"]["keywords"]["maxItems"], 8)
+        self.assertIn("minLength", structured.DRAFT_SCHEMA["properties"]["body_md"])
+
+
+class TokenBudgetTests(SimpleTestCase):
+    TEXT = "\n\n".join(
+        " ".join(f"Sentence {p}.{s} has several ordinary words in it." for s in range(12)) for p in range(6)
+    )
+
+    def test_truncate_keeps_whole_sentences(self):
+        out = token_budget.truncate(self.TEXT, 100)
+        self.assertLessEqual(token_budget.estimate_tokens(out), 100)
+        self.assertTrue(self.TEXT.startswith(out))
+        self.assertTrue(out.endswith("."))
+        self.assertEqual(token_budget.truncate("Short.", 100), "Short.")
+
+    def test_truncate_cuts_a_giant_sentence_at_words(self):
+        out = token_budget.truncate("word " * 500, 50)
+        self.assertLessEqual(token_budget.estimate_tokens(out), 50)
+        self.assertTrue(out)
+
+
+    def test_chunks_cover_the_text_within_budget(self):
+        parts = token_budget.chunks(self.TEXT, 80)
+        self.assertGreater(len(parts), 1)
+        for part in parts:
+            self.assertLessEqual(token_budget.estimate_tokens(part), 80)
+        self.assertEqual("".join(" ".join(parts).split()), "".join(self.TEXT.split()))
+
+    def test_chunks_split_oversized_sentences_instead_of_dropping_them(self):
+        text = " ".join(f"word{i}" for i in range(2000)) + "."
+        parts = token_budget.chunks(text, 300)
+        for part in parts:
+            self.assertLessEqual(token_budget.estimate_tokens(part), 300)
+        self.assertEqual(" ".join(parts).split(), text.split())
+        self.assertEqual(len(token_budget.chunks(text, 300, max_chunks=2)), 2)
+
+
+class MergePartialsTests(SimpleTestCase):
+    def test_weighted_and_order_stable(self):
+        light = {"formality": "formal", "tone_adjectives": ["dry", "clear"], "voice_summary": "light"}
+        heavy = {"formality": "casual", "tone_adjectives": "warm, clear", "voice_summary": "heavy"}
+        merged = merge_partials([(10, light), (30, heavy)])
+        self.assertEqual(merged["formality"], "casual")
+        self.assertEqual(merged["tone_adjectives"][0], "clear")
+        self.assertEqual(merged["voice_summary"], "heavy")
+        self.assertEqual(merged, merge_partials([(10, light), (30, heavy)]))
+
+    def test_ties_and_empties(self):
+        merged = merge_partials([(5, {"formality": "formal"}), (5, {"formality": "casual"})])
+        self.assertEqual(merged["formality"], "casual")  # earlier in _CATEGORICAL wins a tie
+        self.assertEqual(merge_partials([(3, {}), (0, None)]), {})
+
+
+class DeleteUploadTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="writer")
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.uploads = [
+            Upload.objects.create(
+                user=self.user, file_type=Upload.FILE_TEXT, source="TEXT", text_extract=f"Post number {i}.",
+                analysis_json={"formality": "casual", "voice_summary": f"post {i}"}, analysis_weight=3,
+                analyzed_at=timezone.now(), status=Upload.STATUS_PUBLISHED,
+            )
+            for i in range(2)
+        ]
+        for up in self.uploads:
+            corpus.add(up)
+        profile, _ = rebuild_profile(self.user, analyze_missing=False)
+        profile.fun_facts = ["You end every post with a question."]
+        profile.save(update_fields=["fun_facts"])
+
+    def _delete(self, upload):
+        self.client.post(reverse("delete_upload", args=[upload.id]))
+
+    def test_rebuild_keeps_the_fun_facts(self):
+        self._delete(self.uploads[0])
+        active = StyleProfile.objects.get(user=self.user, active=True)
+        self.assertEqual((active.version, active.summary_json["voice_summary"]), (2, "post 1"))
+        self.assertEqual(active.fun_facts, ["You end every post with a question."])
+
+    def test_deleting_the_last_upload_clears_the_profile(self):
+        for up in self.uploads:
+            self._delete(up)
+        self.assertFalse(StyleProfile.objects.filter(user=self.user, active=True).exists())
+
+
+class StylometryTests(SimpleTestCase):
+    def test_counts_add_up(self):
+        a = stylometry.count("Is this fast? Yes! It is fast.\n\nSee https://example.com now.")
+        self.assertEqual(a["sentences"], 4)
+        self.assertEqual(a["questions"], 1)
+        self.assertEqual(a["exclamations"], 1)
+        self.assertEqual(a["links"], 1)
+        self.assertEqual(a["paragraphs"], 2)
+        total = stylometry.combine([a, a])
+        self.assertEqual(total["words"], 2 * a["words"])
+        self.assertEqual(total["vocab"]["fast"], 4)
+
+    def test_metrics(self):
+        m = stylometry.metrics(stylometry.count("One two three. Four five six."))
+        self.assertEqual(m["avg_sentence_length"], 3.0)
+        self.assertEqual(m["measured_words"], 6)
+        self.assertEqual(stylometry.metrics(stylometry.count("")), {})
+
+
+class SectionsTests(SimpleTestCase):
+    BODY = (
+        "# Title\n\nIntro text.\n\n"
+        "## Why it matters\n\nFirst part.\n\n"
+        "```\n## not a heading\n```\n\n"
+        "## How to start\n\nSecond part.\n"
+    )
+
+    def test_split_join_round_trip(self):
+        parts = sections.split(self.BODY)
+        self.assertEqual([s["heading"] for s in parts], ["", "Why it matters", "How to start"])
+        self.assertEqual(sections.join(parts), self.BODY)
+
+    def test_replace_keeps_headings_and_untouched_sections(self):
+        parts = sections.split(self.BODY)
+        body = sections.replace(parts, {1: "Rewritten part.", 2: "  "})
+        self.assertIn("## Why it matters\n\nRewritten part.\n\n## How to start", body)
+        self.assertTrue(body.startswith(parts[0]["text"]))
+        self.assertTrue(body.endswith(parts[2]["text"]))
+
+    def test_pick(self):
+        parts = sections.split(self.BODY)
+        self.assertEqual(sections.pick(parts, {"sections": ["2", "9"]}), [2])
+        self.assertEqual(sections.pick(parts, {"custom_note": "tighten how to start"}), [2])
+        self.assertEqual(sections.pick(parts, {"tone": "formal"}), [])
+
+
+class VersionsTests(TestCase):
+    def test_deltas_round_trip(self):
+        base = "".join(f"Line {i}\n" for i in range(50))
+        new = base.replace("Line 10\n", "Changed\n") + "Tail"
+        self.assertEqual(deltas.apply(base, deltas.encode(base, new)), new)
+        self.assertEqual(deltas.apply(new, deltas.encode(new, "")), "")
+
+    @override_settings(CONTENT_VERSION_STORAGE="delta", CONTENT_KEYFRAME_EVERY=3)
+    def test_versions_read_back_through_compact_and_expand(self):
+        user = User.objects.create(username="writer")
+        item = ContentItem.objects.create(user=user, type=ContentItem.TYPE_BLOG, topic="T")
+        bodies = ["".join(f"Paragraph {i} of version {v if i == v else 0}.\n" for i in range(40)) for v in range(6)]
+        for body in bodies:
+            versions.create(item, body, {})
+
+        def read_back():
+            return [v.body for v in ContentVersion.objects.filter(content=item).order_by("version_no")]
+
+        self.assertEqual(read_back(), bodies)
+        self.assertEqual(item.versions.first().body_md, bodies[-1])
+        self.assertTrue(ContentVersion.objects.filter(content=item, is_keyframe=False).exists())
+        versions.expand(item)
+        self.assertEqual(read_back(), bodies)
+        self.assertFalse(ContentVersion.objects.filter(content=item, is_keyframe=False).exists())
+        versions.compact(item)
+        self.assertEqual(read_back(), bodies)
+
+
+class IngestJobTests(FakeUpstreamTestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="writer", credits=10)
+
+    def test_ingest_publishes_a_profile(self):
+        upload = Upload.objects.create(
+            user=self.user, file_type=Upload.FILE_TEXT, source="TEXT",
+            text_extract="Pricing is a product decision. Test it like one!\n\nShip, measure, repeat.",
+        )
+        job = jobs.enqueue(self.user, Job.KIND_INGEST, {"upload_id": upload.id})
+        self.assertEqual(job.status, Job.STATUS_DONE, job.error)
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, Upload.STATUS_PUBLISHED)
+        profile = StyleProfile.objects.get(user=self.user, active=True)
+        self.assertEqual(job.result["version"], profile.version)
+        self.assertIn("avg_sentence_length", profile.summary_json)
+
+    def test_ingest_of_an_empty_upload_fails_without_a_profile(self):
+        upload = Upload.objects.create(user=self.user, file_type=Upload.FILE_TEXT, source="TEXT", text_extract=" ")
+        job = jobs.enqueue(self.user, Job.KIND_INGEST, {"upload_id": upload.id})
+        self.assertEqual(job.status, Job.STATUS_FAILED)
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, Upload.STATUS_FAILED)
+
+    @override_settings(JOBS_RUN_INLINE=False)
+    def test_worker_ingests_a_file_it_cannot_see_on_disk(self):
+        client = Client()
+        client.force_login(self.user)
+        text = b"Pricing is a product decision. Test it like one!\n\nShip, measure, repeat."
+        client.post(reverse("upload_file"), {"file": SimpleUploadedFile("post.txt", text)}, secure=True)
+        upload = Upload.objects.get(user=self.user)
+        os.remove(upload.file.path)  # the worker service has no MEDIA_ROOT disk
+
+        job = jobs.claim_next()
+        jobs.run(job)
+        self.assertEqual(job.status, Job.STATUS_DONE, job.error)
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, Upload.STATUS_PUBLISHED)
+        self.assertEqual(upload.text_extract, text.decode())
+        self.assertEqual(bytes(upload.file_data), b"")
+
+    @override_settings(JOBS_RUN_INLINE=False)
+    def test_regenerate_queues_stuck_uploads_instead_of_processing_them(self):
+        upload = Upload.objects.create(
+            user=self.user, file_type=Upload.FILE_TXT, file="uploads/post.txt", text_extract="Ship, measure, repeat.",
+            status=Upload.STATUS_NORMALIZED, status_error="Couldn't analyse this text right now.",
+        )
+        client = Client()
+        client.force_login(self.user)
+        client.post(reverse("regenerate_style"), secure=True)
+        job = Job.objects.get(kind=Job.KIND_INGEST, status=Job.STATUS_QUEUED)
+        self.assertEqual(job.payload, {"fun_facts_min_chars": 400, "upload_id": upload.id})
+        self.assertFalse(StyleProfile.objects.exists())
+
+        jobs.run(jobs.claim_next())
+        upload.refresh_from_db()
+        self.assertEqual((upload.status, upload.status_error), (Upload.STATUS_PUBLISHED, ""))
+        self.assertTrue(StyleProfile.objects.filter(user=self.user, active=True).exists())
+
+
+class CorpusTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="writer")
+
+    def _upload(self, text):
+        return Upload.objects.create(
+            user=self.user, file_type=Upload.FILE_TEXT, source="TEXT", text_extract=text, status=Upload.STATUS_PUBLISHED,
+        )
+
+    def test_incremental_updates_match_a_rebuild(self):
+        first, second = self._upload("First post."), self._upload("Second post!")
+        corpus.add(first)
+        corpus.add(second)
+        corpus.remove(self.user, first.id)
+        first.delete()
+        incremental = corpus.for_user(self.user)
+        rebuilt = corpus.rebuild(self.user)
+        self.assertEqual((incremental.text, incremental.stats), (rebuilt.text, rebuilt.stats))
+        self.assertEqual(incremental.text, "Second post!")
+
+    def test_first_delete_for_a_user_without_a_corpus_keeps_the_other_uploads(self):
+        gone, kept = self._upload("Deleted post."), self._upload("Remaining post.")  # ingested before UserCorpus
+        corpus.remove(self.user, gone.id)
+        gone.delete()
+        built = corpus.for_user(self.user)
+        self.assertEqual([s["upload_id"] for s in built.segments], [kept.id])
+        self.assertEqual(built.length, len("Remaining post."))
+
+
+class FunFactsTests(FakeUpstreamTestCase):
+    @override_settings(OPENAI_REASONING_TOKENS=0)
+    def test_model_facts_are_capped_in_count_and_length(self):
+        completions = clients.get_openai().chat.completions
+        with mock.patch.object(completions, "create", wraps=completions.create) as create:
+            facts = ai_client.generate_style_fun_facts({"formality": "casual"}, "Ship it. Then ship it again!", count=3)
+        self.assertEqual(create.call_args.kwargs["max_completion_tokens"], 50 * 3 + 50)
+        self.assertNotIn("temperature", create.call_args.kwargs)
+        self.assertLessEqual(len(facts), 3)
+        self.assertTrue(all(len(f) <= 120 for f in facts))
+        self.assertEqual(ai_client.generate_style_fun_facts({}, "Some text.", count=0), [])
+
+
+class PlanTopicsJobTests(FakeUpstreamTestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="writer", credits=10)
+        Onboarding.objects.create(user=self.user, topical_keywords="pricing, churn, onboarding")
+        StyleProfile.objects.create(user=self.user, summary_json={}, active=True)
+
+    def test_plan_topics_fills_every_missing_day(self):
+        days = [date.today() + timedelta(days=i) for i in range(1, 4)]
+        job = jobs.enqueue(self.user, Job.KIND_PLAN_TOPICS, {"dates": [d.isoformat() for d in days]})
+        self.assertEqual(job.status, Job.STATUS_DONE, job.error)
+        self.assertEqual(job.result, {"planned": 3})
+        for d in days:
+            self.assertTrue(TopicSuggestion.objects.filter(user=self.user, target_date=d).exists())
+
+        job = jobs.enqueue(self.user, Job.KIND_PLAN_TOPICS, {"dates": [d.isoformat() for d in days]})
+        self.assertEqual(job.result, {"planned": 0})
+
+    @override_settings(TOPIC_SUGGESTIONS_PER_DAY=3, OPENAI_REASONING_TOKENS=500)
+    def test_plan_call_sends_its_schema_and_output_cap(self):
+        completions = clients.get_openai().chat.completions
+        with mock.patch.object(completions, "create", wraps=completions.create) as create:
+            jobs.enqueue(self.user, Job.KIND_PLAN_TOPICS, {"dates": [(date.today() + timedelta(days=1)).isoformat()]})
+        sent = create.call_args.kwargs
+        self.assertEqual(sent["max_completion_tokens"], 40 * 3 * 1 + 100 + 500)
+        self.assertEqual(sent["response_format"]["json_schema"]["name"], "topic_plan")
+
+
+class ImageSearchTests(FakeUpstreamTestCase):
+    def setUp(self):
+        self.enterContext(override_settings(PEXELS_API_KEY="test", UNSPLASH_ACCESS_KEY="test"))
+        caches[settings.IMAGE_SEARCH_CACHE_ALIAS].clear()
+
+    def _requests(self):
+        stats = clients.pool_stats()
+        return sum(stats.get(name, {}).get("requests", 0) for name in ("pexels", "unsplash"))
+
+    def test_results_are_merged_then_served_from_cache(self):
+        results = images.search_images("standing desk", 4)
+        self.assertEqual(len(results), 4)
+        self.assertEqual([r["source"] for r in results[:2]], ["Pexels", "Unsplash"])
+        before = self._requests()
+        self.assertEqual(images.search_images("standing desk", 4), results)
+        self.assertEqual(images.lookup("Standing  desk", 4), (results, False))
+        self.assertEqual(self._requests(), before)
+
+    def test_stale_entry_is_served_while_a_refresh_replaces_it(self):
+        stale = [{"url": "https://example.com/old.jpg", "source": "Pexels"}]
+        with override_settings(UNSPLASH_ACCESS_KEY=""):
+            images._store(images._key("pexels", "desk", 3), stale, at=time.time() - settings.IMAGE_SEARCH_TTL - 1)
+            self.assertEqual(images.lookup("desk", 3), (stale, False))
+            images._refresh("pexels", "desk", 3).result(timeout=5)  # joins the refresh lookup started
+            fresh, pending = images.lookup("desk", 3)
+        self.assertFalse(pending)
+        self.assertEqual(len(fresh), 3)
+        self.assertNotIn(stale[0], fresh)
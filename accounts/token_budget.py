@@ -0,0 +1,129 @@
+import math
+import re
+
+from django.conf import settings
+
+# Token budgets for text we send upstream. estimate_tokens() is a fast local approximation
+# (no tokenizer download); it errs slightly high for English prose, so a text that fits the
+# estimate fits the model. fit() trims at paragraph, then sentence, then word boundaries.
+
+_PIECES = re.compile(r"\w+|[^\w\s]")
+_LONG = re.compile(r"\w{7,}")
+_VERY_LONG = re.compile(r"\w{13,}")
+_PARAGRAPHS = re.compile(r"\n\s*\n")
+_SENTENCE_BREAK = re.compile(r"((?<=[.!?…])[\"')\]]*[ \t]+|\n)")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Words of up to ~6 characters are usually one BPE token, longer words two or more;
+    punctuation is a token of its own. Whichever of that and chars/4 is higher wins.
+    """
+    if not text:
+        return 0
+    return max(_pieces(text), math.ceil(len(text) / 4))
+
+
+def _pieces(text: str) -> int:
+    return len(_PIECES.findall(text)) + len(_LONG.findall(text)) + len(_VERY_LONG.findall(text))
+
+
+def budget(feature: str) -> int:
+    return settings.TOKEN_BUDGETS[feature]
+
+
+def truncate(text: str, max_tokens: int) -> str:
+    """Longest prefix of whole paragraphs/sentences within max_tokens (word cut only as a last resort)."""
+    text = (text or "").strip()
+    # estimate >= chars/4, so anything longer than 4*max_tokens chars can't fit; skip counting it
+    if len(text) <= 4 * max_tokens and estimate_tokens(text) <= max_tokens:
+        return text
+
+    kept, used = [], 0
+    for para in _PARAGRAPHS.split(text):
+        para = para.strip()
+        if not para:
+            continue
+        remaining = max_tokens - used
+        if len(para) < 4 * remaining:
+            cost = estimate_tokens(para) + 1  # +1 for the paragraph break
+            if cost <= remaining:
+                kept.append(para)
+                used += cost
+                continue
+        # Paragraph doesn't fit whole: take as many of its sentences as do
+        head = para[: 4 * remaining + 1]
+        parts = _SENTENCE_BREAK.split(head)  # [sentence, break, sentence, break, ...]
+        partial = ""
+        for i in range(0, len(parts), 2):
+            if i + 1 >= len(parts) and len(head) < len(para):
+                break  # last piece was cut by the slice, not a whole sentence
+            sentence = parts[i] + (parts[i + 1] if i + 1 < len(parts) else "")
+            cost = estimate_tokens(sentence) + 1
+            if used + cost > max_tokens:
+                break
+            partial += sentence
+            used += cost
+        if partial.strip():
+            kept.append(partial.rstrip())
+        elif not kept:
+            kept.append(_split_words(para, max_tokens)[0])  # a single giant first sentence
+        break
+    return "\n\n".join(kept)
+
+
+def fit(text: str, feature: str) -> str:
+    """truncate() to the TOKEN_BUDGETS entry for `feature`."""
+    return truncate(text, budget(feature))
+
+
+def _split_words(text: str, limit: int) -> list:
+    """All of `text` as word-bounded pieces of at most `limit` tokens (a giant word is sliced)."""
+    out, current, pieces, chars = [], [], 0, 0
+    for word in text.split(" "):
+        if estimate_tokens(word) > limit:
+            if current:
+                out.append(" ".join(current))
+                current, pieces, chars = [], 0, 0
+            out.extend(word[i:i + 4 * limit] for i in range(0, len(word), 4 * limit))
+            continue
+        # Same sums as estimate_tokens() of the joined piece, counting the space after each word
+        if current and max(pieces + _pieces(word), math.ceil((chars + len(word) + 1) / 4)) > limit:
+            out.append(" ".join(current))
+            current, pieces, chars = [], 0, 0
+        current.append(word)
+        pieces += _pieces(word)
+        chars += len(word) + 1
+    if current:
+        out.append(" ".join(current))
+    return out
+
+
+def chunks(text: str, max_tokens: int, max_chunks: int = None) -> list:
+    """
+    Greedily packs whole sentences/lines into pieces of at most max_tokens each. A sentence
+    longer than that is split at word boundaries over several pieces, so no text is dropped.
+    """
+    parts = _SENTENCE_BREAK.split((text or "").strip())
+    units = []
+    for i in range(0, len(parts), 2):
+        unit = parts[i] + (parts[i + 1] if i + 1 < len(parts) else "")
+        if estimate_tokens(unit) <= max_tokens:
+            units.append(unit)
+            continue
+        pieces = _split_words(unit, max_tokens)
+        units.extend(piece + " " for piece in pieces[:-1])
+        units.append(pieces[-1])
+    out, current, used = [], [], 0
+    for unit in units:
+        cost = estimate_tokens(unit)
+        if current and used + cost > max_tokens:
+            out.append("".join(current).strip())
+            if max_chunks and len(out) >= max_chunks:
+                return out
+            current, used = [], 0
+        current.append(unit)
+        used += cost
+    if current and "".join(current).strip():
+        out.append("".join(current).strip())
+    return out[:max_chunks] if max_chunks else out
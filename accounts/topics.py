@@ -0,0 +1,193 @@
+import logging
+import re
+from datetime import date
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+
+from .ai_client import plan_topics
+from .models import ContentItem, GuidelineSchedule, Onboarding, StyleProfile, TopicSuggestion
+
+log = logging.getLogger(__name__)
+
+# Topic ideas per calendar day. A day's pillar comes from the user's weekly GuidelineSchedule.
+# Ideas are planned for many days in one model call (ai_client.plan_topics), seeded with the
+# pillar keywords, the onboarding topical keywords and the profile's recurring themes, and told
+# which topics were already written so it doesn't repeat them. Results are stored as
+# TopicSuggestion rows per (user, pillar, date); pages only read them (suggestions()), and the
+# planning itself runs in the PLAN_TOPICS job or inside jobs that need topics anyway.
+
+_SPLIT = re.compile(r"[,;\n]+")
+_WORD = re.compile(r"[^\W_]+")
+_FILLER = frozenset("a an and the of for to in on with your you how why what is are my our vs".split())
+_REPEAT_OVERLAP = 0.6  # share of distinct words two topics need in common to count as the same idea
+
+
+def _split(text: str) -> List[str]:
+    seen, out = set(), []
+    for part in _SPLIT.split(text or ""):
+        part = part.strip()
+        if part and part.lower() not in seen:
+            seen.add(part.lower())
+            out.append(part)
+    return out
+
+
+def _key(topic: str) -> frozenset:
+    return frozenset(w for w in _WORD.findall(topic.lower()) if w not in _FILLER)
+
+
+def _is_repeat(key: frozenset, seen: List[frozenset]) -> bool:
+    if not key:
+        return True
+    return any(key == other or len(key & other) / len(key | other) >= _REPEAT_OVERLAP for other in seen)
+
+
+def pillars_for(user, dates: Iterable[date]) -> Dict[date, Optional[object]]:
+    """{date: GuidelinePillar or None} from the weekly schedule."""
+    by_dow = {
+        s.day_of_week: s.pillar
+        for s in GuidelineSchedule.objects.filter(user=user).select_related("pillar")
+    }
+    return {d: by_dow.get(d.weekday()) for d in dates}
+
+
+def _current(user, dates: List[date], pillars: Dict[date, Optional[object]]):
+    """Unused suggestions for `dates` that match each day's current pillar."""
+    rows = TopicSuggestion.objects.filter(user=user, target_date__in=dates, used=False)
+    return [r for r in rows if r.pillar_id == getattr(pillars[r.target_date], "id", None)]
+
+
+def suggestions(user, day: date, pillar=None) -> List[str]:
+    """Cached ideas for `day` (its pillar given by the caller); never calls the model."""
+    rows = TopicSuggestion.objects.filter(user=user, target_date=day, used=False, pillar=pillar)
+    return list(rows.values_list("topic", flat=True)[: settings.TOPIC_SUGGESTIONS_PER_DAY])
+
+
+def missing(user, dates: Iterable[date]) -> List[date]:
+    """Dates with nothing planned for their current pillar."""
+    dates = sorted(set(dates))
+    pillars = pillars_for(user, dates)
+    planned = {r.target_date for r in _current(user, dates, pillars)}
+    return [d for d in dates if d not in planned]
+
+
+def _context(user) -> dict:
+    onboarding = Onboarding.objects.filter(user=user).first()
+    profile = StyleProfile.objects.filter(user=user, active=True).only("summary_json").first()
+    themes = (profile.summary_json.get("thematic_pillars") if profile else None) or []
+    return {
+        "topics": _split(onboarding.topical_keywords)[:20] if onboarding else [],
+        "industry": onboarding.industry if onboarding else "",
+        "themes": [str(t) for t in themes][:8] if isinstance(themes, list) else [],
+    }
+
+
+def _history(user, exclude_dates: List[date]) -> List[str]:
+    """Recent content topics plus ideas already planned for other days, newest first."""
+    written = ContentItem.objects.filter(user=user).order_by("-created_at").values_list("topic", flat=True)
+    planned = (
+        TopicSuggestion.objects.filter(user=user, used=False)
+        .exclude(target_date__in=exclude_dates)
+        .order_by("-target_date", "rank")
+        .values_list("topic", flat=True)
+    )
+    limit = settings.TOPIC_HISTORY_ITEMS
+    return list(written[:limit]) + list(planned[:limit])
+
+
+def _fallback(pillar, context: dict, n: int, seen: List[frozenset]) -> List[str]:
+    """Keyword-based ideas for a day the model left short (or when it can't be reached)."""
+    keywords = (_split(pillar.keywords) if pillar else []) or context["topics"] or context["themes"]
+    angles = ("{k}: lessons learned", "{k}: common mistakes to avoid", "A practical guide to {k}",
+              "What most people get wrong about {k}", "{k}: my checklist")
+    out = []
+    for i, k in enumerate(keywords * len(angles)):
+        topic = angles[(i // max(1, len(keywords))) % len(angles)].format(k=k)
+        topic = topic[0].upper() + topic[1:]
+        key = _key(topic)
+        if not _is_repeat(key, seen):
+            seen.append(key)
+            out.append(topic)
+            if len(out) >= n:
+                break
+    if not out and pillar:
+        out.append(pillar.title)
+    return out
+
+
+def plan(user, dates: Iterable[date], per_day: int = None, allow_fallback: bool = False) -> Dict[date, List[str]]:
+    """
+    Plans `per_day` ideas for each of `dates` in one model call and stores them, replacing the
+    days' unused suggestions. Ideas that repeat past content or each other are dropped. With
+    allow_fallback, a failed call or a short day is filled from keywords instead of raising.
+    """
+    dates = sorted(set(dates))
+    if not dates:
+        return {}
+    per_day = per_day or settings.TOPIC_SUGGESTIONS_PER_DAY
+    pillars = pillars_for(user, dates)
+    context = _context(user)
+    history = _history(user, dates)
+    seen = [_key(t) for t in history]
+
+    days = [{
+        "date": d.isoformat(),
+        "weekday": d.strftime("%A"),
+        "pillar": p.title if p else "",
+        "about": p.description[:200] if p else "",
+        "keywords": _split(p.keywords)[:10] if p else [],
+    } for d, p in pillars.items()]
+    try:
+        raw = plan_topics(days, context, per_day, history)
+    except Exception as e:
+        if not allow_fallback:
+            raise
+        log.warning("Topic planning for user %s failed, using keywords: %s", user.pk, e)
+        raw = {}
+
+    planned = {}
+    for d in dates:
+        kept = []
+        for topic in raw.get(d.isoformat(), []):
+            topic = topic.strip().strip('"“”')[:200]
+            key = _key(topic)
+            if not _is_repeat(key, seen):
+                seen.append(key)
+                kept.append(topic)
+            if len(kept) >= per_day:
+                break
+        if len(kept) < per_day and allow_fallback:
+            kept += _fallback(pillars[d], context, per_day - len(kept), seen)
+        planned[d] = kept
+
+    with transaction.atomic():
+        TopicSuggestion.objects.filter(user=user, target_date__in=dates, used=False).delete()
+        TopicSuggestion.objects.bulk_create([
+            TopicSuggestion(user=user, pillar=pillars[d], target_date=d, rank=i, topic=t)
+            for d, topics in planned.items() for i, t in enumerate(topics)
+        ])
+    return planned
+
+
+def take(user, dates: Iterable[date]) -> Dict[date, Optional[str]]:
+    """
+    One topic per date for drafting, marked used so it isn't offered again. Dates with nothing
+    planned are planned first (one call for all of them).
+    """
+    dates = sorted(set(dates))
+    todo = missing(user, dates)
+    if todo:
+        plan(user, todo, allow_fallback=True)
+    pillars = pillars_for(user, dates)
+    picked = {}
+    for row in sorted(_current(user, dates, pillars), key=lambda r: (r.target_date, r.rank)):
+        picked.setdefault(row.target_date, row)
+    TopicSuggestion.objects.filter(id__in=[r.id for r in picked.values()]).update(used=True)
+    return {d: picked[d].topic if d in picked else None for d in dates}
+
+
+def mark_used(user, topic: str):
+    """A suggestion was turned into content (generate page): stop offering it."""
+    TopicSuggestion.objects.filter(user=user, used=False, topic__iexact=topic.strip()).update(used=True)
@@ -0,0 +1,168 @@
+import atexit
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import close_old_connections
+
+log = logging.getLogger(__name__)
+
+# Per-call LLM usage ledger. Calls are buffered in memory and written with one
+# bulk_create per batch (or every LLM_USAGE_FLUSH_SECONDS), never one row per request.
+
+_current_user_id = contextvars.ContextVar("llm_usage_user_id", default=None)
+
+_buffer = []
+_lock = threading.Lock()
+_flusher = None
+
+
+@contextmanager
+def attribute(user_id):
+    """Attributes every LLM call made inside the block (including fan-out threads) to this user."""
+    token = _current_user_id.set(user_id)
+    try:
+        yield
+    finally:
+        _current_user_id.reset(token)
+
+
+def attributed(user_id, iterable):
+    """
+    Iterates `iterable` with each step inside attribute(user_id). For streaming responses, whose
+    generators run after the middleware's block has closed; closing it early (client gone)
+    closes the inner iterator under the same attribution.
+    """
+    it = iter(iterable)
+    try:
+        while True:
+            with attribute(user_id):
+                try:
+                    item = next(it)
+                except StopIteration:
+                    return
+            yield item
+    finally:
+        close = getattr(it, "close", None)
+        if close is not None:
+            with attribute(user_id):
+                close()
+
+
+class UsageContextMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        user = getattr(request, "user", None)
+        with attribute(user.pk if user is not None and user.is_authenticated else None):
+            return self.get_response(request)
+
+
+class CallStats:
+    """Filled in by the caller inside track(); anything left unset is recorded as 0."""
+
+    def __init__(self, model: str):
+        self.model = model
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.retries = 0
+        self.cached = False
+
+    def add_usage(self, usage):
+        # Chat usage uses prompt/completion_tokens; Images uses input/output_tokens
+        if usage is None:
+            return
+        self.prompt_tokens += getattr(usage, "prompt_tokens", None) or getattr(usage, "input_tokens", None) or 0
+        self.completion_tokens += getattr(usage, "completion_tokens", None) or getattr(usage, "output_tokens", None) or 0
+
+
+def cost_usd(model: str, prompt_tokens: int, completion_tokens: int) -> Decimal:
+    price_in, price_out = settings.LLM_PRICING.get(model, (0, 0))  # USD per 1M tokens
+    return (Decimal(str(price_in)) * prompt_tokens + Decimal(str(price_out)) * completion_tokens) / Decimal(1_000_000)
+
+
+@contextmanager
+def track(feature: str, model: str):
+    stats = CallStats(model)
+    started = time.monotonic()
+    user_id = _current_user_id.get()  # a stream may be finished (or closed) elsewhere
+    outcome, error = "ok", ""
+    try:
+        yield stats
+    except GeneratorExit:
+        outcome, error = "aborted", "Stream closed before it finished"
+        raise
+    except Exception as e:
+        outcome, error = "error", f"{e.__class__.__name__}: {e}"[:200]
+        raise
+    finally:
+        if stats.cached and outcome == "ok":
+            outcome = "cached"
+        record(
+            user_id=user_id,
+            feature=feature,
+            model=stats.model,
+            prompt_tokens=stats.prompt_tokens,
+            completion_tokens=stats.completion_tokens,
+            latency_ms=int((time.monotonic() - started) * 1000),
+            retries=stats.retries,
+            outcome=outcome,
+            error=error,
+        )
+
+
+def record(**fields):
+    if not settings.LLM_USAGE_ENABLED:
+        return
+    from .models import LLMCall
+
+    fields.setdefault("user_id", _current_user_id.get())
+    fields["cost_usd"] = cost_usd(fields["model"], fields.get("prompt_tokens", 0), fields.get("completion_tokens", 0))
+    with _lock:
+        _buffer.append(LLMCall(**fields))
+        full = len(_buffer) >= settings.LLM_USAGE_BATCH_SIZE
+    _ensure_flusher()
+    if full:
+        flush()
+
+
+def flush():
+    from .models import LLMCall
+
+    with _lock:
+        batch = _buffer[:]
+        del _buffer[:]
+    if not batch:
+        return 0
+    try:
+        LLMCall.objects.bulk_create(batch)
+    except Exception:
+        # The ledger is observability, not billing; losing a batch must not fail a request
+        log.exception("Dropping %d LLM usage rows", len(batch))
+        return 0
+    return len(batch)
+
+
+def _flush_loop():
+    while True:
+        time.sleep(settings.LLM_USAGE_FLUSH_SECONDS)
+        flush()
+        close_old_connections()
+
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is not None:
+        return
+    with _lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, name="llm-usage-flush", daemon=True)
+            _flusher.start()
+
+
+atexit.register(flush)
@@ -1,4 +1,3 @@
-from PyPDF2 import PdfReader
 import io, re
 from collections import Counter
 from .models import CreditTransaction
@@ -16,12 +15,9 @@ def extract_text_from_file(f, file_type: str) -> str:
                 return data.decode("latin-1", errors="ignore")
         return str(data)
     elif file_type == "PDF":
-        # PyPDF2 expects a file-like object; if InMemoryUploadedFile, it already is
-        reader = PdfReader(f)
-        texts = []
-        for page in reader.pages:
-            texts.append(page.extract_text() or "")
-        return "\n".join(texts)
+        # Page-parallel, budgeted reader; see accounts/extraction.py
+        from .extraction import extract
+        return extract(f, file_type)[0]
     return ""
 
 def simple_style_summary(onboarding_keywords: str, corpus: str) -> dict:
@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.db import transaction
+
+from . import deltas
+from .models import ContentItem, ContentVersion
+
+# How ContentVersion bodies are stored. With CONTENT_VERSION_STORAGE="delta", every new version
+# stores a compressed delta against the one before it (accounts/deltas.py), and every
+# CONTENT_KEYFRAME_EVERY-th version (or one that rewrote most of the text) is a full keyframe.
+# The latest version always keeps its full body_md as well, so the hot path,
+# item.versions.first().body_md, reads one row exactly as before; the copy is dropped when a
+# newer version supersedes it. Older versions are read through ContentVersion.body: the nearest
+# stored body plus at most CONTENT_KEYFRAME_EVERY - 1 deltas.
+
+_MAX_DELTA_RATIO = 0.6  # a delta bigger than this share of the compressed body is stored as a keyframe instead
+
+
+def _delta_or_none(base: str, body_md: str):
+    delta = deltas.encode(base, body_md)
+    return delta if len(delta) <= _MAX_DELTA_RATIO * deltas.compressed_size(body_md) else None
+
+
+def create(item: ContentItem, body_md: str, meta_json: dict) -> ContentVersion:
+    """Adds the next version of `item`. Call inside the transaction that debits its credits."""
+    prev = item.versions.first()
+    version_no = (prev.version_no if prev else 0) + 1
+    delta = None
+    if prev is not None and settings.CONTENT_VERSION_STORAGE == "delta":
+        last_keyframe = item.versions.filter(is_keyframe=True).values_list("version_no", flat=True).first() or 0
+        if version_no - last_keyframe < settings.CONTENT_KEYFRAME_EVERY:
+            delta = _delta_or_none(prev.body, body_md)
+    version = ContentVersion.objects.create(
+        content=item, version_no=version_no, body_md=body_md, meta_json=meta_json,
+        is_keyframe=delta is None, delta=delta,
+    )
+    if prev is not None and not prev.is_keyframe and prev.delta is not None:
+        ContentVersion.objects.filter(pk=prev.pk).update(body_md="")  # no longer the latest
+    return version
+
+
+def stored_bytes(version: ContentVersion) -> int:
+    return len((version.body_md or "").encode("utf-8")) + len(version.delta or b"")
+
+
+def _rewrite(item: ContentItem, as_deltas: bool) -> tuple:
+    """Re-stores all of `item`'s versions; returns (bytes before, bytes after)."""
+    with transaction.atomic():
+        rows = list(ContentVersion.objects.select_for_update().filter(content=item).order_by("version_no"))
+        before = sum(map(stored_bytes, rows))
+        text, last_keyframe = "", 0
+        for i, row in enumerate(rows):
+            body = row.body_md if (row.body_md or row.is_keyframe or row.delta is None) else deltas.apply(text, row.delta)
+            delta = None
+            if as_deltas and i and row.version_no - last_keyframe < settings.CONTENT_KEYFRAME_EVERY:
+                delta = _delta_or_none(text, body)
+            if delta is None:
+                last_keyframe = row.version_no
+            is_latest = i == len(rows) - 1
+            row.is_keyframe, row.delta = delta is None, delta
+            row.body_md = body if (delta is None or is_latest) else ""
+            text = body
+        ContentVersion.objects.bulk_update(rows, ["body_md", "is_keyframe", "delta"])
+    return before, sum(map(stored_bytes, rows))
+
+
+def compact(item: ContentItem) -> tuple:
+    """Converts an item's history (e.g. rows written before delta storage) to keyframes + deltas."""
+    return _rewrite(item, as_deltas=True)
+
+
+def expand(item: ContentItem) -> tuple:
+    """Stores every version in full again (before switching CONTENT_VERSION_STORAGE to "full")."""
+    return _rewrite(item, as_deltas=False)
@@ -1,8 +1,10 @@
 from django.contrib import messages
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.views import LoginView
 from django.shortcuts import redirect, render, get_object_or_404
+from django.template.loader import render_to_string
 from django.db.models import Count, Max, Q
 from .forms import SignupForm, OnboardingForm, TypedPostForm
 from .models import Onboarding, User
@@ -11,18 +13,22 @@ from datetime import datetime, date, timedelta
 from zoneinfo import ZoneInfo
 from django.utils import timezone
 import calendar
-from django.http import HttpResponseForbidden, JsonResponse
+from django.http import HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+import json
 from django.views.decorators.http import require_POST
 from django.db import transaction
 from .forms import UploadForm, GenerateContentForm, ApproveForm, ImproveForm, ChangeTopicForm, AutoPopulateForm
-from .models import Upload, StyleProfile, Onboarding, User, CreditTransaction, ContentItem, ContentVersion, GuidelineSchedule, GuidelinePillar, ContentHeroImage
+from .models import Upload, StyleProfile, Onboarding, User, CreditTransaction, ContentItem, ContentVersion, GuidelinePillar, ContentHeroImage, Job
+from .jobs import JobError, enqueue, locked_user_with_credits
 #from .utils import extract_text_from_file, simple_style_summary, record_credit_change, stub_generate_content, stub_improve_content, stub_change_topic_content
-from .ai_client import generate_blog, generate_style_fun_facts, generate_linkedin, improve_content as gpt_improve, change_topic as gpt_change
-from .ai_client import analyze_style_profile, generate_meta_from_body, suggest_image_search_term
+from .ai_client import generate_meta_from_body, suggest_image_search_term
+from .ai_client import stream_blog, stream_linkedin, stream_improve
 from django.core.paginator import Paginator
-from .utils import record_credit_change, extract_text_from_file, merge_user_inputs_into_profile_json, style_scores_from_profile
-from .images import search_images
-from openai import OpenAI
+from .utils import record_credit_change, style_scores_from_profile
+from . import images
+from .style import onboarding_seed, rebuild_profile
+from . import clients, corpus as user_corpus, ingest, llm_cache, resilience, sections, token_budget, topics, usage, versions
 import logging
 from django.conf import settings
 
@@ -33,14 +39,11 @@ IMPROVE_COST = 1
 CHANGE_TOPIC_COST = 2
 HERO_IMAGE_COST = 2
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
 SIZE = "1024x1024"  # wide banner
 
 
 log = logging.getLogger(__name__)
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 HERO_IMAGE_COST = 2
 
 @login_required
@@ -53,46 +56,45 @@ def create_hero_image(request, item_id):
 
     # 1) Generate a concise image prompt
     try:
-        prompt_resp = client.chat.completions.create(
-            model="gpt-5-mini",
-            messages=[
-                {"role": "system", "content": "You write precise image prompts for marketing hero banners."},
-                {"role": "user", "content":
-                    "Create ONE concise hero-image prompt for this content. "
-                    "Style: clean, modern, editorial, photographic, high contrast, brand-safe. "
-                    "No people's faces unless essential. Avoid text in image.\n\n"
-                    f"CONTENT:\n{latest.body_md[:12000]}"
-                },
-            ],
-        )
+        with usage.track("hero_prompt", "gpt-5-mini") as stats:
+            prompt_resp = resilience.call("openai", lambda: clients.get_openai().chat.completions.create(
+                model="gpt-5-mini",
+                messages=[
+                    {"role": "system", "content": "You write precise image prompts for marketing hero banners."},
+                    {"role": "user", "content":
+                        "Create ONE concise hero-image prompt for this content. "
+                        "Style: clean, modern, editorial, photographic, high contrast, brand-safe. "
+                        "No people's faces unless essential. Avoid text in image.\n\n"
+                        f"CONTENT:\n{token_budget.fit(latest.body_md, 'hero_prompt_body')}"
+                    },
+                ],
+            ), stats=stats)
+            stats.add_usage(prompt_resp.usage)
         image_prompt = (prompt_resp.choices[0].message.content or "").strip()
         if not image_prompt:
             return JsonResponse({"ok": False, "error": "Empty image prompt."}, status=400)
+    except resilience.CircuitOpenError as e:
+        return JsonResponse({"ok": False, "error": str(e)}, status=503)
     except Exception as e:
         log.exception("Prompt generation failed")
         return JsonResponse({"ok": False, "error": f"Prompt generation failed: {e}"}, status=500)
 
-    # 2) Create the image (single size), retry once on transient 5xx
-    def _gen():
-        return client.images.generate(model="gpt-image-1", prompt=image_prompt, size=SIZE)
-
+    # 2) Create the image (single size); transient 5xx/429 are retried by resilience.call
     img_resp = None
     try:
         log.info("Calling images.generate size=%s", SIZE)
-        img_resp = _gen()
+        with usage.track("hero_image", "gpt-image-1") as stats:
+            img_resp = resilience.call(
+                "openai",
+                lambda: clients.get_openai().images.generate(model="gpt-image-1", prompt=image_prompt, size=SIZE),
+                stats=stats,
+            )
+            stats.add_usage(getattr(img_resp, "usage", None))
+    except resilience.CircuitOpenError as e:
+        return JsonResponse({"ok": False, "error": str(e)}, status=503)
     except Exception as e:
-        # retry on gateway/network errors
-        msg = str(e)
-        if "502" in msg or "503" in msg or "504" in msg or "temporar" in msg.lower():
-            log.warning("Image gen transient error, retrying once: %s", e)
-            try:
-                img_resp = _gen()
-            except Exception as e2:
-                log.warning("Retry failed: %s", e2)
-                return JsonResponse({"ok": False, "error": f"Image generation failed: {e2}"}, status=502)
-        else:
-            log.warning("Image gen failed: %s", e)
-            return JsonResponse({"ok": False, "error": f"Image generation failed: {e}"}, status=502)
+        log.warning("Image gen failed: %s", e)
+        return JsonResponse({"ok": False, "error": f"Image generation failed: {e}"}, status=502)
 
     # 3) Prefer hosted URL, else persist b64 to MEDIA and return served URL
     hero_url = ""
@@ -185,41 +187,11 @@ def onboarding_view(request):
             has_profile = StyleProfile.objects.filter(user=user).exists()
 
             if not has_uploads and not has_profile:
-                # Build a seed "corpus" from onboarding answers (only if they exist)
-                parts = []
-                # NOTE: use your actual field names on Onboarding
-                if getattr(onboarding, "author_bio", None):
-                    parts.append(onboarding.author_bio)
-                if getattr(onboarding, "user_style_self_desc", None):
-                    parts.append(onboarding.user_style_self_desc)
-                if getattr(onboarding, "writing_style_keywords", None):
-                    parts.append(f"Topical keywords: {onboarding.writing_style_keywords}")
-
-                corpus = "\n".join([p for p in parts if (p or "").strip()]).strip()
-
-                if corpus:
-                    try:
-                        # Let AI analyze this seed corpus
-                        # You can pass a hint with keywords if your analyze function supports it
-                        summary = analyze_style_profile(
-                            corpus[:8000],
-                            onboarding_keywords=getattr(onboarding, "writing_style_keywords", "") or ""
-                        )
-                        # Merge the onboarding values into the profile JSON
-                        summary = merge_user_inputs_into_profile_json(summary, onboarding)
-
-                        # Create v1 active style profile
-                        StyleProfile.objects.filter(user=user, active=True).update(active=False)
-                        StyleProfile.objects.create(
-                            user=user,
-                            version=1,
-                            summary_json=summary,
-                            active=True
-                        )
-                        messages.success(request, "Onboarding saved. Your initial Style Profile has been created from your preferences.")
-                    except Exception:
-                        # Fail soft: onboarding saved, but profile creation failed
-                        messages.warning(request, "Onboarding saved. We couldn’t auto-create a Style Profile right now—please use My Style → Regenerate.")
+                # Seed a first profile from the answers themselves (style.rebuild_profile uses
+                # them when there is little or no writing to analyse), off the request path
+                if onboarding_seed(onboarding):
+                    enqueue(user, Job.KIND_INGEST, {})
+                    messages.success(request, "Onboarding saved. We’re creating your initial Style Profile from your preferences.")
                 else:
                     messages.info(request, "Onboarding saved. Add uploads or type a recent post in My Style to build your Style Profile.")
             else:
@@ -258,125 +230,67 @@ def upload_file_view(request):
     ext = os.path.splitext(up.file.name.lower())[1]
     up.file_type = "TXT" if ext == ".txt" else "PDF"
     up.bytes = request.FILES["file"].size
+    up.file_data = request.FILES["file"].read()
+    request.FILES["file"].seek(0)
+    up.status = Upload.STATUS_STORED
     up.save()
 
-    # 1) Extract TEXT from the uploaded file
-    with up.file.open("rb") as f:
-        extracted = extract_text_from_file(f, up.file_type) or ""
-    up.text_extract = extracted
-    up.save(update_fields=["text_extract"])
-
-    # 2) Rebuild the style profile from ALL uploads (free)
-    corpus = "\n".join(
-        Upload.objects.filter(user=request.user).values_list("text_extract", flat=True)
-    ).strip()
-
-    if corpus:
-        trimmed = corpus[:15000]  # keep token usage under control
-        onboarding = getattr(request.user, "onboarding", None)
-        keywords = onboarding.writing_style_keywords if onboarding else ""
-
-        # deactivate old profile and bump version
-        StyleProfile.objects.filter(user=request.user, active=True).update(active=False)
-        latest = StyleProfile.objects.filter(user=request.user).first()
-        next_version = 1 + (latest.version if latest else 0)
-
-        summary = analyze_style_profile(trimmed, onboarding_keywords=keywords)
-        summary = merge_user_inputs_into_profile_json(summary, onboarding)
-
-        StyleProfile.objects.create(
-            user=request.user,
-            version=next_version,
-            summary_json=summary,
-            active=True,
-        )
-        messages.success(request, f"File uploaded. Style Profile v{next_version} regenerated from your uploads.")
-    else:
-        messages.warning(request, "File uploaded, but no text could be extracted to update your Style Profile.")
-
+    # Extract -> normalize -> analyse -> publish happen in the background (accounts/ingest.py)
+    enqueue(request.user, Job.KIND_INGEST, {"upload_id": up.id})
+    messages.success(request, "File uploaded. We’re reading it now; your Style Profile updates when it’s done.")
     return redirect("my_style")
 
 @login_required
 @require_POST
 def delete_upload_view(request, upload_id: int):
     up = get_object_or_404(Upload, id=upload_id, user=request.user)
-    up.file.delete(save=False)
+    if up.file:
+        up.file.delete(save=False)
+    user_corpus.remove(request.user, up.id)
     up.delete()
-    messages.info(request, "File deleted.")
+    # Remaining uploads are already analysed: this is a local re-merge, no model calls
+    profile, _ = rebuild_profile(request.user, analyze_missing=False)
+    if profile:
+        messages.info(request, f"File deleted. Style Profile v{profile.version} rebuilt from your remaining uploads.")
+    else:
+        # Nothing analysed is left: the old profile still describes the deleted texts
+        StyleProfile.objects.filter(user=request.user, active=True).update(active=False)
+        messages.info(request, "File deleted. Your Style Profile was cleared; upload a file to build a new one.")
     return redirect("my_style")
 
 @login_required
 @require_POST
-@transaction.atomic
 def regenerate_style_profile_view(request):
-    
-    extracts = list(Upload.objects.filter(user=request.user).values_list("text_extract", flat=True))
-    corpus = "\n".join(Upload.objects.filter(user=request.user).values_list("text_extract", flat=True))
-
-    # If corpus is short, softly pad with onboarding fields (bio, style, topical keywords)
-    onboarding = getattr(request.user, "onboarding", None)
-    if onboarding and len(corpus) < 500:
-        pad = " ".join(filter(None, [onboarding.bio, onboarding.style_self_desc, onboarding.topical_keywords]))
-        corpus = (corpus + "\n" + (pad or "")).strip()
-
-    if not corpus.strip():
-        rebuilt = []
-        for up in Upload.objects.filter(user=request.user):
-            try:
-                with up.file.open("rb") as f:
-                    txt = extract_text_from_file(f, up.file_type) or ""
-                if txt.strip():
-                    up.text_extract = txt
-                    up.save(update_fields=["text_extract"])
-                    rebuilt.append(txt)
-            except Exception:
-                pass
-        corpus = "\n".join(rebuilt)
-
-    if not corpus.strip():
+    if not Upload.objects.filter(user=request.user).exists() and not onboarding_seed(getattr(request.user, "onboarding", None)):
         messages.error(request, "Please upload at least one TXT/PDF with text content.")
         return redirect("my_style")
-    
-    trimmed = corpus[:15000]
-
-    onboarding = getattr(request.user, "onboarding", None)
-    keywords = onboarding.writing_style_keywords if onboarding else ""
-
-    try:
-        summary = analyze_style_profile(trimmed, onboarding_keywords=keywords)
-        summary = merge_user_inputs_into_profile_json(summary, onboarding)
-    except Exception as e:
-        messages.error(request, f"Could not analyze style right now. Please try again. ({e.__class__.__name__})")
-        return redirect("my_style")
-    
-    facts = []
-    try:
-        if len(corpus) >= 400:
-            facts = generate_style_fun_facts(summary, corpus)
-    except Exception:
-        facts = []
 
-    StyleProfile.objects.filter(user=request.user, active=True).update(active=False)
-    latest = StyleProfile.objects.filter(user=request.user).order_by("-version").first()
-    next_version = 1 + (latest.version if latest else 0)
-    
-    new_profile = StyleProfile.objects.create(
-        user=request.user,
-        version=next_version,
-        summary_json=summary,
-        fun_facts=facts,
-        active=True,
+    # Re-run ingestion for uploads that lost their text or got stuck on a failed stage, in the
+    # background like any upload; the last of these jobs rebuilds the profile (+ fun facts)
+    payload = {"fun_facts_min_chars": 400}
+    stuck = (
+        Upload.objects.filter(user=request.user).filter(Q(text_extract="") | ~Q(status_error=""))
+        .exclude(file__isnull=True).exclude(file="").defer("file_data")
     )
-
-    StyleProfile.objects.filter(user=request.user).exclude(id=new_profile.id).update(active=False)
-
-    messages.success(request, f"Style Profile v{next_version} generated from your uploads.")
+    retried = 0
+    for up in stuck:
+        if not up.text_extract:
+            ingest.restart(up)
+        else:
+            up.status_error = ""
+            up.save(update_fields=["status_error"])
+        enqueue(request.user, Job.KIND_INGEST, {**payload, "upload_id": up.id})
+        retried += 1
+    if not retried:
+        enqueue(request.user, Job.KIND_INGEST, payload)
+
+    messages.info(request, "Rebuilding your Style Profile in the background; it updates here when it’s done.")
     return redirect("my_style")
 
 @login_required
 def my_style_view(request):
      
-    uploads = Upload.objects.filter(user=request.user).order_by("-created_at")
+    uploads = Upload.objects.filter(user=request.user).defer("file_data").order_by("-created_at")
 
     # Active style profile (single, if any)
     active_profile = StyleProfile.objects.filter(user=request.user, active=True).first()
@@ -406,6 +320,13 @@ def my_style_view(request):
     else:
         fun_facts = list(raw_facts)
 
+    # Profile rebuilds still running in the background (per-upload progress is polled separately)
+    ingest_job = (
+        Job.objects.filter(user=request.user, kind=Job.KIND_INGEST, status__in=[Job.STATUS_QUEUED, Job.STATUS_RUNNING])
+        .order_by("-created_at")
+        .first()
+    )
+
     return render(request, "accounts/my_style.html", {
         "uploads": uploads,
         "active_profile": active_profile,
@@ -413,8 +334,37 @@ def my_style_view(request):
         "upload_form": upload_form,
         "onboarding_form": onboarding_form,
         "fun_facts": fun_facts,
+        "ingest_job": ingest_job,
     })
 
+
+@login_required
+def upload_status_view(request):
+    """Ingest stage of each upload, polled by My Style while any is still being processed."""
+    rows = Upload.objects.filter(user=request.user).order_by("-created_at")
+    profile = StyleProfile.objects.filter(user=request.user, active=True).only("version").first()
+    return JsonResponse({
+        "uploads": [
+            {"id": up.id, "status": up.status, "label": up.get_status_display(), "error": up.status_error, "pending": up.is_pending}
+            for up in rows.only("id", "status", "status_error")
+        ],
+        "profile_version": profile.version if profile else None,
+    })
+
+
+@login_required
+@require_POST
+def retry_upload_view(request, upload_id: int):
+    up = get_object_or_404(Upload, id=upload_id, user=request.user)
+    if up.status == Upload.STATUS_FAILED:
+        ingest.restart(up)
+    else:
+        up.status_error = ""
+        up.save(update_fields=["status_error"])
+    enqueue(request.user, Job.KIND_INGEST, {"upload_id": up.id})
+    messages.info(request, "Retrying that upload in the background.")
+    return redirect("my_style")
+
 @login_required
 def credits_view(request):
     txns = CreditTransaction.objects.filter(user=request.user)
@@ -431,6 +381,26 @@ def mock_add_credits(request):
     messages.success(request, "Added 10 credits for testing.")
     return redirect("credits")
 
+def _plan_topics_job(user, start: date):
+    """
+    The user's PLAN_TOPICS job covering the TOPIC_PLAN_DAYS from `start`: the one already
+    running, a new one if any of those days lack ideas, or None. A recent failure isn't retried
+    on every page load, and neither are days a recent job already planned but got no ideas for
+    (its banner reloads the page when it's done).
+    """
+    recent = Job.objects.filter(user=user, kind=Job.KIND_PLAN_TOPICS).order_by("-created_at").first()
+    if recent and recent.is_active:
+        return recent
+    todo = topics.missing(user, [start + timedelta(days=i) for i in range(settings.TOPIC_PLAN_DAYS)])
+    if not todo:
+        return None
+    if recent and recent.created_at > timezone.now() - timedelta(minutes=10):
+        if recent.status == Job.STATUS_FAILED:
+            return None
+        if {d.isoformat() for d in todo} <= set(recent.payload.get("dates", [])):
+            return None
+    return enqueue(user, Job.KIND_PLAN_TOPICS, {"dates": [d.isoformat() for d in todo]})
+
 @login_required
 def generate_view(request):
     active_profile = StyleProfile.objects.filter(user=request.user, active=True).first()
@@ -453,14 +423,15 @@ def generate_view(request):
     if request.method == "POST" and form.is_valid():
         chosen_date = form.cleaned_data["target_date"]
 
-    # Figure pillar for that weekday
-    dow = chosen_date.weekday()
-    sched = GuidelineSchedule.objects.filter(user=request.user, day_of_week=dow).first()
-    suggestions = []
-    pillar_for_day = None
-    if sched and sched.pillar:
-        pillar_for_day = sched.pillar
-        suggestions = suggest_topics_stub(pillar_for_day, active_profile.summary_json, n=3)
+    # Pillar for that weekday and its planned ideas; only ever read here, planning runs in a job
+    pillar_for_day = topics.pillars_for(request.user, [chosen_date])[chosen_date]
+    suggestions = topics.suggestions(request.user, chosen_date, pillar_for_day)
+    plan_job = None
+    if not suggestions and request.method == "GET":
+        plan_job = _plan_topics_job(request.user, chosen_date)
+        if plan_job and not plan_job.is_active:  # ran inline (JOBS_RUN_INLINE)
+            suggestions = topics.suggestions(request.user, chosen_date, pillar_for_day)
+            plan_job = None
 
     if request.method == "POST" and form.is_valid():
         ctype = form.cleaned_data["type"]
@@ -477,31 +448,125 @@ def generate_view(request):
         local_midnight = datetime.combine(target_date, datetime.min.time())
         aware_local = timezone.make_aware(local_midnight, user_tz)
 
-        item = ContentItem.objects.create(
-            user=request.user,
-            type=ctype,
-            topic=topic,
-            status=ContentItem.STATUS_DRAFT,
-            scheduled_for=aware_local,
-        )
-        if ctype == "BLOG":
-            body_md, meta_json = generate_blog(topic, active_profile.summary_json)
-        else:
-            body_md, meta_json = generate_linkedin(topic, active_profile.summary_json)
-
-        ContentVersion.objects.create(content=item, version_no=1, body_md=body_md, meta_json=meta_json)
-
-        record_credit_change(request.user, -cost, "GEN", f"Generated {ctype} for {target_date.isoformat()} – '{topic}'")
-        messages.success(request, f"{ctype.title()} draft for {target_date.isoformat()} created. {cost} credits deducted.")
-        return redirect("content_detail", content_id=item.id)
+        topics.mark_used(request.user, topic)
+        # Drafting happens on a worker; the item, its version and the debit are created there together
+        job = enqueue(request.user, Job.KIND_GENERATE, {
+            "cost": cost,
+            "type": ctype,
+            "topic": topic,
+            "target_date": target_date.isoformat(),
+            "scheduled_for": aware_local.isoformat(),
+        })
+        if job.status == Job.STATUS_DONE:  # ran inline (JOBS_RUN_INLINE)
+            return redirect(job.result["url"])
+        if job.status == Job.STATUS_FAILED:
+            messages.error(request, f"Generation failed: {job.error} No credits were deducted.")
+            return redirect("generate")
+        messages.success(request, f"{ctype.title()} draft for {target_date.isoformat()} is being written. {cost} credits will be deducted when it's ready.")
+        return redirect("generate")
+
+    # Drafts still being written; the banner follows each to its item when it's done
+    generate_jobs = Job.objects.filter(
+        user=request.user, kind=Job.KIND_GENERATE, status__in=[Job.STATUS_QUEUED, Job.STATUS_RUNNING]
+    )
 
     return render(request, "accounts/generate.html", {
         "form": form,
         "active_profile": active_profile,
         "suggestions": suggestions,
         "pillar_for_day": pillar_for_day,
+        "plan_job": plan_job,
+        "generate_jobs": generate_jobs,
     })
 
+# --- Streaming (SSE) variants of generate / improve ---
+# The browser POSTs the same form via fetch() and reads text/event-stream chunks;
+# the version is persisted and credits debited only once the stream completes.
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _relay(stream, parts: list):
+    """Forwards model chunks as SSE 'chunk' events; returns the stream's meta dict."""
+    try:
+        while True:
+            try:
+                text = next(stream)
+            except StopIteration as stop:
+                return stop.value or {}
+            parts.append(text)
+            yield _sse("chunk", {"text": text})
+    finally:
+        stream.close()  # client gone: stop reading upstream now, not when garbage-collected
+
+def _sse_response(events, user) -> StreamingHttpResponse:
+    # The generator runs after the middleware's usage.attribute() block has closed
+    resp = StreamingHttpResponse(usage.attributed(user.pk, events), content_type="text/event-stream")
+    resp["Cache-Control"] = "no-cache"
+    resp["X-Accel-Buffering"] = "no"  # keep proxies from buffering the stream
+    return resp
+
+@login_required
+@require_POST
+def generate_stream_view(request):
+    active_profile = StyleProfile.objects.filter(user=request.user, active=True).first()
+    if not active_profile:
+        return JsonResponse({"ok": False, "error": "No active Style Profile found."}, status=400)
+
+    form = GenerateContentForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({"ok": False, "error": "Please fix the form errors."}, status=400)
+
+    ctype = form.cleaned_data["type"]
+    topic = form.cleaned_data["topic"].strip()
+    target_date = form.cleaned_data["target_date"]
+    cost = CREDIT_COSTS[ctype]
+    if request.user.credits < cost:
+        return JsonResponse({"ok": False, "error": f"Not enough credits. {ctype} requires {cost} credits."}, status=402)
+
+    user_tz = ZoneInfo(getattr(request.user, "timezone", "Asia/Kolkata") or "Asia/Kolkata")
+    aware_local = timezone.make_aware(datetime.combine(target_date, datetime.min.time()), user_tz)
+    user = request.user
+    style = active_profile.ensure_compiled()
+
+    def events():
+        item = ContentItem.objects.create(
+            user=user,
+            type=ctype,
+            topic=topic,
+            status=ContentItem.STATUS_DRAFT,
+            scheduled_for=aware_local,
+        )
+        topics.mark_used(user, topic)
+        saved = False
+        try:
+            yield _sse("start", {"item_id": item.id})
+            parts = []
+            try:
+                stream = stream_blog(topic, style) if ctype == "BLOG" else stream_linkedin(topic, style)
+                meta_json = yield from _relay(stream, parts)
+            except Exception as e:
+                log.exception("Streaming generation failed")
+                yield _sse("error", {"error": f"Generation failed: {e.__class__.__name__}"})
+                return
+
+            # The stream took a while: re-check credits on a locked, fresh row before debiting
+            try:
+                with transaction.atomic():
+                    locked = locked_user_with_credits(user.pk, cost)
+                    ContentVersion.objects.create(content=item, version_no=1, body_md="".join(parts), meta_json=meta_json)
+                    record_credit_change(locked, -cost, "GEN", f"Generated {ctype} for {target_date.isoformat()} – '{topic}'")
+            except JobError as e:
+                yield _sse("error", {"error": str(e)})
+                return
+            saved = True
+            yield _sse("done", {"url": reverse("content_detail", args=[item.id]), "version_no": 1})
+        finally:
+            if not saved:
+                item.delete()  # failed, unaffordable or abandoned by the client: no empty item left behind
+
+    return _sse_response(events(), user)
+
 @login_required
 def history_view(request):
     qs = ContentItem.objects.filter(user=request.user).order_by("-created_at")
@@ -516,6 +581,7 @@ def content_detail_view(request, content_id: int):
     latest = item.versions.first()  # ordered by -version_no
     image_query = ""
     image_results = []
+    image_pending = False
 
     if latest and latest.body_md:
         # Compute once, save, and reuse next time.
@@ -530,16 +596,53 @@ def content_detail_view(request, content_id: int):
             image_query = latest.image_search_term
 
         if image_query:
-            image_results = search_images(image_query)  # unchanged
+            # Cached results only; a miss is fetched in the background and loaded by content_images_view
+            image_results, image_pending = images.lookup(image_query)
+
+    pending_jobs = item.jobs.filter(status__in=[Job.STATUS_QUEUED, Job.STATUS_RUNNING])
 
     return render(request, "accounts/content_detail.html", {
         "item": item,
         "latest": latest,
+        "sections": sections.choices(latest.body_md) if latest else [],
+        "pending_jobs": pending_jobs,
         "image_query": image_query,
         "image_results": image_results,
+        "image_sources": images.sources(image_results),
+        "image_pending": image_pending,
         # ... any other context you pass ...
     })
 
+@login_required
+def content_images_view(request, content_id: int):
+    """Image ideas for the latest version as a rendered fragment, once the search has finished."""
+    item = get_object_or_404(ContentItem, id=content_id, user=request.user)
+    latest = item.versions.only("image_search_term").first()
+    query = latest.image_search_term if latest else ""
+    results = images.search_images(query) if query else []
+    html = ""
+    if results:
+        html = render_to_string("accounts/_image_ideas.html", {"image_query": query, "image_results": results, "image_sources": images.sources(results)}, request=request)
+    return JsonResponse({"query": query, "count": len(results), "html": html})
+
+@login_required
+def job_status_view(request, job_id: int):
+    job = get_object_or_404(Job, id=job_id, user=request.user)
+    return JsonResponse({
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "progress": job.progress,
+        "note": job.progress_note,
+        "error": job.error,
+        "url": job.result.get("url", ""),
+        # Per-date state for auto-populate batches
+        "items": [
+            {"date": d.isoformat(), "status": st, "content_id": cid}
+            for d, st, cid in job.batch_items.values_list("target_date", "status", "content_id")
+        ],
+    })
+
 @login_required
 @require_POST
 def approve_content_view(request, content_id: int):
@@ -563,7 +666,7 @@ def improve_content_view(request, content_id: int):
         messages.error(request, "No version to improve.")
         return redirect("content_detail", content_id=item.id)
 
-    form = ImproveForm(request.POST)
+    form = ImproveForm(request.POST, sections=sections.choices(latest.body_md))
     if not form.is_valid():
         messages.error(request, "Please fix the form errors for Improve.")
         return redirect("content_detail", content_id=item.id)
@@ -577,21 +680,58 @@ def improve_content_view(request, content_id: int):
         messages.error(request, "No active Style Profile found.")
         return redirect("my_style")
 
-    opts = form.cleaned_data
-    new_body, new_meta = gpt_improve(item.type, latest.body_md, active_profile.summary_json, opts)
+    enqueue(request.user, Job.KIND_IMPROVE, {"cost": IMPROVE_COST, "opts": form.cleaned_data}, content=item)
+    messages.success(request, f"Improving your draft. {IMPROVE_COST} credit will be deducted when the new version is ready.")
+    return redirect("content_detail", content_id=item.id)
+
+@login_required
+@require_POST
+def improve_content_stream_view(request, content_id: int):
+    item = get_object_or_404(ContentItem, id=content_id, user=request.user)
+    latest = item.versions.first()
+    if not latest:
+        return JsonResponse({"ok": False, "error": "No version to improve."}, status=400)
 
-    REGENERATE = True  # toggle (move to settings if you want)
+    form = ImproveForm(request.POST, sections=sections.choices(latest.body_md))
+    if not form.is_valid():
+        return JsonResponse({"ok": False, "error": "Please fix the form errors for Improve."}, status=400)
 
-    meta_for_new_version = (
-        generate_meta_from_body(new_body) if (REGENERATE and item.type == "BLOG") else (latest.meta_json or {})
-    )
+    if request.user.credits < IMPROVE_COST:
+        return JsonResponse({"ok": False, "error": f"Not enough credits. Improve requires {IMPROVE_COST} credit."}, status=402)
+
+    active_profile = StyleProfile.objects.filter(user=request.user, active=True).first()
+    if not active_profile:
+        return JsonResponse({"ok": False, "error": "No active Style Profile found."}, status=400)
 
-    next_ver = (latest.version_no or 1) + 1
-    ContentVersion.objects.create(content=item, version_no=next_ver, body_md=new_body, meta_json=meta_for_new_version)
+    opts = form.cleaned_data
+    user = request.user
 
-    record_credit_change(request.user, -IMPROVE_COST, "IMPROVE", f"Improve content v{next_ver} for '{item.topic}'")
-    messages.success(request, f"Improved content to v{next_ver}. {IMPROVE_COST} credit deducted.")
-    return redirect("content_detail", content_id=item.id)
+    def events():
+        yield _sse("start", {"item_id": item.id})
+        parts = []
+        try:
+            meta = yield from _relay(stream_improve(item.type, latest.body_md, active_profile.ensure_compiled(), opts), parts)
+        except Exception as e:
+            log.exception("Streaming improve failed")
+            yield _sse("error", {"error": f"Improve failed: {e.__class__.__name__}"})
+            return
+
+        new_body = "".join(parts)
+        if item.type == "BLOG" and not meta.get("sections"):
+            meta_for_new_version = generate_meta_from_body(new_body)
+        else:
+            meta_for_new_version = latest.meta_json or {}
+        try:
+            with transaction.atomic():
+                locked = locked_user_with_credits(user.pk, IMPROVE_COST)
+                next_ver = versions.create(item, new_body, meta_for_new_version).version_no
+                record_credit_change(locked, -IMPROVE_COST, "IMPROVE", f"Improve content v{next_ver} for '{item.topic}'")
+        except JobError as e:
+            yield _sse("error", {"error": str(e)})
+            return
+        yield _sse("done", {"url": reverse("content_detail", args=[item.id]), "version_no": next_ver})
+
+    return _sse_response(events(), user)
 
 @login_required
 @require_POST
@@ -612,19 +752,8 @@ def change_topic_view(request, content_id: int):
         return redirect("my_style")
 
     new_topic = form.cleaned_data["new_topic"].strip()
-    body_md, meta_json = gpt_change(item.type, new_topic, active_profile.summary_json)
-
-    latest = item.versions.first()
-    next_ver = (latest.version_no if latest else 0) + 1
-    ContentVersion.objects.create(content=item, version_no=next_ver, body_md=body_md, meta_json=meta_json)
-
-    # update item topic
-    item.topic = new_topic
-    item.status = ContentItem.STATUS_DRAFT
-    item.save(update_fields=["topic","status"])
-
-    record_credit_change(request.user, -CHANGE_TOPIC_COST, "GEN", f"Change Topic → '{new_topic}'")
-    messages.success(request, f"Topic changed and v{next_ver} created. {CHANGE_TOPIC_COST} credits deducted.")
+    enqueue(request.user, Job.KIND_CHANGE_TOPIC, {"cost": CHANGE_TOPIC_COST, "new_topic": new_topic}, content=item)
+    messages.success(request, f"Rewriting for the new topic. {CHANGE_TOPIC_COST} credits will be deducted when it's ready.")
     return redirect("content_detail", content_id=item.id)
 
 @login_required
@@ -678,7 +807,15 @@ def calendar_view(request):
     prev_first = (first_this_month - timedelta(days=1)).replace(day=1)
     next_month_day1 = (date(year, mon, last_day) + timedelta(days=1)).replace(day=1)
 
+    # Running auto-populate batch (?job=<id>) gets a live progress banner
+    batch_job = None
+    job_q = request.GET.get("job")
+    if job_q and job_q.isdigit():
+        batch_job = Job.objects.filter(id=int(job_q), user=request.user).first()
+
     context = {
+        "batch_job": batch_job,
+        "max_batch_dates": settings.AUTO_POPULATE_MAX_DATES,
         "mode": mode,
         "year": year,
         "month": mon,        # keep as int
@@ -693,7 +830,6 @@ def calendar_view(request):
 
 @login_required
 @require_POST
-@transaction.atomic
 def auto_populate_view(request):
     form = AutoPopulateForm(request.POST)
     if not form.is_valid():
@@ -715,8 +851,9 @@ def auto_populate_view(request):
     if not dates:
         messages.error(request, "Provide at least one date.")
         return redirect("calendar")
-    if len(dates) > 7:
-        messages.error(request, "Select at most 7 dates at a time.")
+    dates = sorted(set(dates))
+    if len(dates) > settings.AUTO_POPULATE_MAX_DATES:
+        messages.error(request, f"Select at most {settings.AUTO_POPULATE_MAX_DATES} dates at a time.")
         return redirect("calendar")
 
     active_profile = StyleProfile.objects.filter(user=request.user, active=True).first()
@@ -730,40 +867,14 @@ def auto_populate_view(request):
         messages.error(request, f"Not enough credits. Need {total_cost}, you have {request.user.credits}.")
         return redirect("credits")
 
-    # Timezone-aware scheduling
-    user_tz = ZoneInfo(getattr(request.user, "timezone", "Asia/Kolkata") or "Asia/Kolkata")
-
-    created = 0
-    for d in dates:
-        local_midnight = datetime.combine(d, datetime.min.time())
-        aware_local = timezone.make_aware(local_midnight, user_tz)
-
-        topic_seed = None
-        # Optional: bias topics by user_topical_keywords if blank topic
-        # We’ll generate using the calendar day’s pillar suggestion later if desired.
-
-        # Generate content body/meta
-        if ctype == "BLOG":
-            body_md, meta_json = generate_blog(topic_seed or f"Idea for {d.isoformat()}", active_profile.summary_json)
-        else:
-            body_md, meta_json = generate_linkedin(topic_seed or f"Idea for {d.isoformat()}", active_profile.summary_json)
-
-        item = ContentItem.objects.create(
-            user=request.user,
-            type=ctype,
-            topic=meta_json.get("meta_title") or topic_seed or f"{ctype.title()} for {d.isoformat()}",
-            status=ContentItem.STATUS_DRAFT,
-            scheduled_for=aware_local,
-        )
-        ContentVersion.objects.create(content=item, version_no=1, body_md=body_md, meta_json=meta_json)
-        created += 1
-
-    # Single debit for the batch
-    record_credit_change(request.user, -total_cost, "GEN", f"Auto-generate {created} {ctype} items")
-
-    messages.success(request, f"Created {created} {ctype.title()} draft(s). {total_cost} credits deducted.")
+    job = enqueue(request.user, Job.KIND_AUTO_POPULATE, {
+        "content_type": ctype,
+        "unit_cost": COSTS[ctype],
+        "dates": [d.isoformat() for d in dates],
+    })
+    messages.success(request, f"Generating {len(dates)} {ctype.title()} draft(s) in the background. Credits are deducted per finished draft.")
     # Bounce back to the month that contains the first selected date
-    return redirect(f"/calendar/?month={dates[0].strftime('%Y-%m')}&mode=list")
+    return redirect(f"/calendar/?month={dates[0].strftime('%Y-%m')}&mode=list&job={job.id}")
 
 
 @login_required
@@ -779,40 +890,23 @@ def add_typed_post_view(request):
         messages.error(request, "Text is empty.")
         return redirect("my_style")
 
-    # Save as an Upload of type TEXT
-    Upload.objects.create(
+    # Save as an Upload of type TEXT; the text is already extracted
+    up = Upload.objects.create(
         user=request.user,
         file=None,
         file_type="TEXT",
+        source="TEXT",
         text_extract=text,
         bytes=len(text.encode("utf-8")),
-        # source="TEXT"  # if you added the field
+        status=Upload.STATUS_EXTRACTED,
     )
 
-    # Rebuild style profile from ALL uploads + onboarding
-    extracts = list(Upload.objects.filter(user=request.user).values_list("text_extract", flat=True))
-    corpus = "\n".join([t for t in extracts if (t or "").strip()])[:15000]
-    onboarding = getattr(request.user, "onboarding", None)
-    keywords = onboarding.writing_style_keywords if onboarding else ""
-
-    if not corpus:
-        messages.warning(request, "Saved your text, but couldn’t build a profile (no text found).")
-        return redirect("my_style")
-
-    summary = analyze_style_profile(corpus, onboarding_keywords=keywords)
-    summary = merge_user_inputs_into_profile_json(summary, onboarding)
-
-    StyleProfile.objects.filter(user=request.user, active=True).update(active=False)
-    latest = StyleProfile.objects.filter(user=request.user).order_by("-version").first()
-    next_ver = 1 + (latest.version if latest else 0)
-    StyleProfile.objects.create(user=request.user, version=next_ver, summary_json=summary, active=True)
-
-    messages.success(request, f"Added your post and generated Style Profile v{next_ver}.")
+    enqueue(request.user, Job.KIND_INGEST, {"upload_id": up.id})
+    messages.success(request, "Added your post. Your Style Profile updates in a moment.")
     return redirect("my_style")
 
 @login_required
 @require_POST
-@transaction.atomic
 def save_onboarding_inline(request):
     onboarding = getattr(request.user, "onboarding", None)
     if onboarding is None:
@@ -825,56 +919,16 @@ def save_onboarding_inline(request):
 
     # 1) Save updated author preferences
     onboarding = form.save()
+    request.user.onboarding = onboarding
 
-    # 2) Build/refresh corpus from uploads
-    extracts = list(
-        Upload.objects.filter(user=request.user).values_list("text_extract", flat=True)
-    )
-    corpus = "\n".join([t for t in extracts if (t or "").strip()])
-
-    # Soft pad with onboarding fields if corpus is too short
-    if len(corpus) < 500:
-        pad = " ".join(filter(None, [onboarding.bio, onboarding.style_self_desc, onboarding.topical_keywords]))
-        corpus = (corpus + "\n" + (pad or "")).strip()
-
-    if not corpus.strip():
-        # If still nothing to analyze, just mark onboarding saved and return
+    # 2) Re-merge upload partials with the new preferences in the background (+ fun facts,
+    #    lower threshold so most users see something)
+    if not Upload.objects.filter(user=request.user).exists() and not onboarding_seed(onboarding):
         messages.success(request, "Preferences saved. Add an upload or a typed post to generate your Style Profile.")
         return redirect("my_style")
 
-    trimmed = corpus[:15000]
-    keywords = onboarding.writing_style_keywords or ""
-
-    # 3) Analyze + merge onboarding inputs into the profile JSON
-    try:
-        summary = analyze_style_profile(trimmed, onboarding_keywords=keywords)
-        summary = merge_user_inputs_into_profile_json(summary, onboarding)
-    except Exception as e:
-        messages.error(request, f"Could not analyze style right now. ({e.__class__.__name__})")
-        return redirect("my_style")
-
-    # 4) Generate fun facts on this same path (lower threshold so most users see something)
-    facts = []
-    try:
-        if len(corpus) >= 120:
-            facts = generate_style_fun_facts(summary, corpus)
-    except Exception:
-        facts = []
-
-    # 5) Deactivate old active profile and create a new one with fun_facts
-    StyleProfile.objects.filter(user=request.user, active=True).update(active=False)
-    latest = StyleProfile.objects.filter(user=request.user).order_by("-version").first()
-    next_version = 1 + (latest.version if latest else 0)
-
-    StyleProfile.objects.create(
-        user=request.user,
-        version=next_version,
-        summary_json=summary,
-        fun_facts=facts,   # ← ensure fun facts are saved here
-        active=True,
-    )
-
-    messages.success(request, f"Preferences saved. Style Profile v{next_version} generated.")
+    enqueue(request.user, Job.KIND_INGEST, {"fun_facts_min_chars": 120})
+    messages.success(request, "Preferences saved. Updating your Style Profile…")
     return redirect("my_style")
 
 def _build_image_prompt(post_text: str, topic: str) -> str:
@@ -907,15 +961,18 @@ def _generate_image_openai(prompt: str, size: str = "1024x1024") -> str:
     Example using OpenAI Images:
     """
     # Avoid failing if no key; fall back to placeholder
-    api_key = os.getenv("OPENAI_API_KEY")
+    api_key = settings.OPENAI_API_KEY
     if not api_key:
         # graceful fallback
         return f"https://placehold.co/{size}/111/fff?text=AI+Hero"
 
-    # ---- Example (pseudo) — adapt to your OpenAI client ----
-    from openai import OpenAI
-    client = OpenAI(api_key=api_key)
-    rsp = client.images.generate(model="gpt-image-1", prompt=prompt, size=size)
+    with usage.track("hero_image", "gpt-image-1") as stats:
+        rsp = resilience.call(
+            "openai",
+            lambda: clients.get_openai().images.generate(model="gpt-image-1", prompt=prompt, size=size),
+            stats=stats,
+        )
+        stats.add_usage(getattr(rsp, "usage", None))
     return rsp.data[0].url
 
 # -----------------------
@@ -960,3 +1017,12 @@ def generate_content_hero(request, item_id: int):
 
     messages.success(request, "Hero image created (−2 credits).")
     return redirect('content_detail', item.id)
+
+@staff_member_required
+def ops_metrics_view(request):
+    """Per-process runtime counters for operators (this worker only)."""
+    return JsonResponse({
+        "llm_cache": llm_cache.cache.stats(),
+        "circuits": resilience.breaker_stats(),
+        "http_pools": clients.pool_stats(),
+    })
@@ -20,8 +20,136 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-5-nano")
+# Added to every max_completion_tokens cap: reasoning models (gpt-5*, o*) count their hidden
+# reasoning against it, and a cap sized for the visible answer alone can leave that empty.
+OPENAI_REASONING_TOKENS = int(os.getenv(
+    "OPENAI_REASONING_TOKENS", "2000" if OPENAI_MODEL.startswith(("gpt-5", "o1", "o3", "o4")) else "0"
+))
 
 PEXELS_API_KEY = os.getenv("PEXELS_API_KEY", "")
+UNSPLASH_ACCESS_KEY = os.getenv("UNSPLASH_ACCESS_KEY", "")
+
+# Upstream base URLs; point all three at `manage.py fake_upstream` for offline dev and load tests
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "")  # empty = SDK default (api.openai.com/v1)
+PEXELS_BASE_URL = os.getenv("PEXELS_BASE_URL", "https://api.pexels.com").rstrip("/")
+UNSPLASH_BASE_URL = os.getenv("UNSPLASH_BASE_URL", "https://api.unsplash.com").rstrip("/")
+
+# Shared upstream HTTP clients (accounts/clients.py). Pool size per service per worker process:
+# gunicorn --threads plus the fan-out and batch pools that can hit the same upstream at once.
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "60"))
+HTTP_TIMEOUTS = {  # seconds; OpenAI reads stay under gunicorn --timeout=120
+    "default": {"connect": 5, "read": 30},
+    "openai": {"connect": 5, "read": float(os.getenv("OPENAI_READ_TIMEOUT", "110"))},
+    "pexels": {"connect": 3, "read": 8},
+    "unsplash": {"connect": 3, "read": 8},
+}
+
+# Concurrent fan-out for independent upstream calls (body + meta, etc.)
+FANOUT_MAX_WORKERS = int(os.getenv("FANOUT_MAX_WORKERS", "8"))
+AI_FANOUT_DEADLINE = float(os.getenv("AI_FANOUT_DEADLINE", "100"))  # stay under gunicorn --timeout=120
+
+# Input token budgets per feature (accounts/token_budget.py); text is trimmed at paragraph/sentence boundaries
+TOKEN_BUDGETS = {
+    "style_partial": int(os.getenv("TOKEN_BUDGET_STYLE_PARTIAL", "3000")),        # one analyze_style_profile chunk
+    "onboarding_corpus": int(os.getenv("TOKEN_BUDGET_ONBOARDING_CORPUS", "2000")),  # first profile at onboarding
+    "fun_facts_corpus": int(os.getenv("TOKEN_BUDGET_FUN_FACTS_CORPUS", "3000")),
+    "hero_prompt_body": int(os.getenv("TOKEN_BUDGET_HERO_PROMPT_BODY", "2500")),
+    "image_term_body": int(os.getenv("TOKEN_BUDGET_IMAGE_TERM_BODY", "1000")),
+    "topic_history": int(os.getenv("TOKEN_BUDGET_TOPIC_HISTORY", "1200")),  # already-covered topics sent to the planner
+}
+
+# Uploads longer than one style_partial budget are analysed in up to this many chunks
+STYLE_MAX_CHUNKS_PER_TEXT = int(os.getenv("STYLE_MAX_CHUNKS_PER_TEXT", "6"))
+# Fun facts on My Style: computed from corpus statistics; the model only tops up a shortfall
+FUN_FACTS_COUNT = int(os.getenv("FUN_FACTS_COUNT", "10"))
+# Representative samples for prompts that can't take the whole corpus (accounts/sampler.py):
+# uploads weighted by source type and by recency (weight halves every HALF_LIFE_DAYS);
+# passages whose word-trigram overlap with an already chosen one reaches NEAR_DUPLICATE are skipped
+STYLE_SAMPLE_HALF_LIFE_DAYS = float(os.getenv("STYLE_SAMPLE_HALF_LIFE_DAYS", "180"))
+STYLE_SAMPLE_SOURCE_WEIGHTS = {"TEXT": 1.5, "TXT": 1.0, "PDF": 0.8}  # typed posts are pure voice; PDFs carry boilerplate
+STYLE_SAMPLE_NEAR_DUPLICATE = float(os.getenv("STYLE_SAMPLE_NEAR_DUPLICATE", "0.8"))
+# Upload text extraction (accounts/extraction.py). PDFs are read on a process pool, in page order,
+# until UPLOAD_TEXT_BUDGET_CHARS of text is in hand. PDF_EXTRACT_WORKERS=0 reads on the request thread.
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "2"))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "4"))
+UPLOAD_TEXT_BUDGET_CHARS = int(os.getenv("UPLOAD_TEXT_BUDGET_CHARS", "200000"))
+PDF_PAGE_MAX_CHARS = int(os.getenv("PDF_PAGE_MAX_CHARS", "20000"))
+PDF_PAGE_TIMEOUT_SECONDS = float(os.getenv("PDF_PAGE_TIMEOUT_SECONDS", "5"))
+PDF_EXTRACT_DEADLINE_SECONDS = float(os.getenv("PDF_EXTRACT_DEADLINE_SECONDS", "30"))
+PDF_WORKER_MEMORY_MB = int(os.getenv("PDF_WORKER_MEMORY_MB", "1024"))  # address-space cap per worker; 0 = none
+PDF_WORKER_MAX_TASKS = int(os.getenv("PDF_WORKER_MAX_TASKS", "200"))  # recycle workers to bound leaks
+# Unchanged style inputs reuse the active profile; set to 1 to still record a (copied) new version
+STYLE_REUSE_AS_NEW_VERSION = os.getenv("STYLE_REUSE_AS_NEW_VERSION", "0") == "1"
+
+# Blog generate/improve: body + SEO meta in one JSON-schema response (0 = separate meta call)
+AI_STRUCTURED_OUTPUT = os.getenv("AI_STRUCTURED_OUTPUT", "1") == "1"
+
+# LLM response cache: "local" (per-process LRU), "django" (shared tier), "tiered" (both) or "off"
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "tiered")
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512"))
+LLM_CACHE_ALIAS = "llm"
+
+# Stock image search cache (accounts/images.py): results are fresh for IMAGE_SEARCH_TTL, then served
+# stale for up to IMAGE_SEARCH_STALE_TTL more while a background refresh runs. Empty results and
+# provider errors are cached for IMAGE_SEARCH_NEGATIVE_TTL. IMAGE_SEARCH_WAIT bounds how long the
+# images endpoint waits for a refresh; refreshes run on IMAGE_SEARCH_WORKERS threads of their own.
+IMAGE_SEARCH_TTL = int(os.getenv("IMAGE_SEARCH_TTL", str(6 * 3600)))
+IMAGE_SEARCH_STALE_TTL = int(os.getenv("IMAGE_SEARCH_STALE_TTL", str(7 * 24 * 3600)))
+IMAGE_SEARCH_NEGATIVE_TTL = int(os.getenv("IMAGE_SEARCH_NEGATIVE_TTL", "600"))
+IMAGE_SEARCH_WAIT = float(os.getenv("IMAGE_SEARCH_WAIT", "8"))
+IMAGE_SEARCH_WORKERS = int(os.getenv("IMAGE_SEARCH_WORKERS", "2"))
+IMAGE_SEARCH_CACHE_ALIAS = "images"
+
+# Background jobs (`manage.py run_jobs`). JOBS_RUN_INLINE=1 runs them on the request thread (dev, no worker).
+JOBS_RUN_INLINE = os.getenv("JOBS_RUN_INLINE", "0") == "1"
+JOBS_POLL_INTERVAL = float(os.getenv("JOBS_POLL_INTERVAL", "1.0"))
+JOBS_STALE_AFTER = int(os.getenv("JOBS_STALE_AFTER", "600"))  # seconds a RUNNING job may go without a progress heartbeat
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "2"))
+
+# Calendar auto-populate batches
+AUTO_POPULATE_MAX_DATES = int(os.getenv("AUTO_POPULATE_MAX_DATES", "31"))
+AUTO_POPULATE_CONCURRENCY = int(os.getenv("AUTO_POPULATE_CONCURRENCY", "4"))  # drafts in flight per batch
+AUTO_POPULATE_COMMIT_EVERY = int(os.getenv("AUTO_POPULATE_COMMIT_EVERY", "5"))  # finished drafts per insert
+
+# ContentVersion storage (accounts/versions.py): "delta" keeps older versions as compressed deltas
+# with a full keyframe every CONTENT_KEYFRAME_EVERY versions; "full" stores every body in full
+CONTENT_VERSION_STORAGE = os.getenv("CONTENT_VERSION_STORAGE", "delta")
+CONTENT_KEYFRAME_EVERY = int(os.getenv("CONTENT_KEYFRAME_EVERY", "10"))
+
+# Topic suggestions (accounts/topics.py): planned TOPIC_PLAN_DAYS at a time in one model call,
+# TOPIC_SUGGESTIONS_PER_DAY ideas per day, steering clear of the last TOPIC_HISTORY_ITEMS topics
+TOPIC_PLAN_DAYS = int(os.getenv("TOPIC_PLAN_DAYS", "7"))
+TOPIC_SUGGESTIONS_PER_DAY = int(os.getenv("TOPIC_SUGGESTIONS_PER_DAY", "3"))
+TOPIC_HISTORY_ITEMS = int(os.getenv("TOPIC_HISTORY_ITEMS", "100"))
+
+# Upstream resilience (accounts.resilience): retry policy per service + shared breaker settings.
+# max_delay also caps how long a request thread may sleep for a server-requested Retry-After.
+UPSTREAM_POLICIES = {
+    "default": {"max_attempts": 3, "base_delay": 1.0, "max_delay": 10.0},
+    "openai": {"max_attempts": 3, "base_delay": 1.0, "max_delay": 20.0},
+    "pexels": {"max_attempts": 2, "base_delay": 0.5, "max_delay": 3.0},
+    "unsplash": {"max_attempts": 2, "base_delay": 0.5, "max_delay": 3.0},
+}
+CIRCUIT_BREAKER = {
+    "failure_rate": float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5")),  # open at >= 50% failures...
+    "min_calls": int(os.getenv("CIRCUIT_MIN_CALLS", "8")),             # ...over at least this many calls
+    "window_seconds": 60,
+    "cooldown_seconds": int(os.getenv("CIRCUIT_COOLDOWN", "30")),     # then one probe call decides
+}
+
+# Per-call LLM usage ledger (accounts.LLMCall), written in batches
+LLM_USAGE_ENABLED = os.getenv("LLM_USAGE_ENABLED", "1") == "1"
+LLM_USAGE_BATCH_SIZE = int(os.getenv("LLM_USAGE_BATCH_SIZE", "50"))
+LLM_USAGE_FLUSH_SECONDS = float(os.getenv("LLM_USAGE_FLUSH_SECONDS", "30"))
+# USD per 1M tokens: (input, output). Unknown models are recorded at 0.
+LLM_PRICING = {
+    "gpt-5": (1.25, 10.00),
+    "gpt-5-mini": (0.25, 2.00),
+    "gpt-5-nano": (0.05, 0.40),
+    "gpt-image-1": (5.00, 40.00),
+}
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
@@ -59,6 +187,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.usage.UsageContextMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -96,6 +225,25 @@ DATABASES = {
    
 AUTH_USER_MODEL = "accounts.User"  # << custom user
 
+# "llm" is the shared tier of the LLM response cache. Set LLM_CACHE_DB=1 to back it
+# with the database (run `manage.py createcachetable` once) so all workers share it.
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "llm": (
+        {"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": "llm_cache",
+         "OPTIONS": {"MAX_ENTRIES": 5000}}
+        if os.getenv("LLM_CACHE_DB", "0") == "1"
+        else {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "llm"}
+    ),
+    # Stock image search results (accounts/images.py); same table as "llm" when LLM_CACHE_DB=1
+    "images": (
+        {"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": "llm_cache",
+         "KEY_PREFIX": "images", "OPTIONS": {"MAX_ENTRIES": 5000}}
+        if os.getenv("LLM_CACHE_DB", "0") == "1"
+        else {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "images"}
+    ),
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -11,6 +11,8 @@ from django.contrib.auth.views import LogoutView
 from django.http import HttpResponse
 import os
 from accounts.views import my_style_view,add_typed_post_view,create_hero_image,save_onboarding_inline, upload_file_view, delete_upload_view, regenerate_style_profile_view, credits_view, mock_add_credits, generate_view, history_view, content_detail_view, approve_content_view, improve_content_view, change_topic_view, calendar_view, auto_populate_view
+from accounts.views import generate_stream_view, improve_content_stream_view, ops_metrics_view, job_status_view, content_images_view
+from accounts.views import upload_status_view, retry_upload_view
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -23,21 +25,28 @@ urlpatterns = [
     path("my-style/", my_style_view, name="my_style"),
     path("my-style/upload/", upload_file_view, name="upload_file"),
     path("my-style/delete/<int:upload_id>/", delete_upload_view, name="delete_upload"),
+    path("my-style/uploads/status/", upload_status_view, name="upload_status"),
+    path("my-style/uploads/<int:upload_id>/retry/", retry_upload_view, name="retry_upload"),
     path("my-style/regenerate/", regenerate_style_profile_view, name="regenerate_style"),
     path("credits/", credits_view, name="credits"),
     path("credits/add/", mock_add_credits, name="mock_add_credits"),
     path("generate/", generate_view, name="generate"),
+    path("generate/stream/", generate_stream_view, name="generate_stream"),
     path("history/", history_view, name="history"),
     path("content/<int:content_id>/", content_detail_view, name="content_detail"),
+    path("content/<int:content_id>/images/", content_images_view, name="content_images"),
     path("content/<int:content_id>/approve/", approve_content_view, name="approve_content"),
     path("content/<int:content_id>/improve/", improve_content_view, name="improve_content"),
+    path("content/<int:content_id>/improve/stream/", improve_content_stream_view, name="improve_content_stream"),
     path("content/<int:content_id>/change-topic/", change_topic_view, name="change_topic"),
+    path("jobs/<int:job_id>/status/", job_status_view, name="job_status"),
     path("calendar/", calendar_view, name="calendar"),
     path("calendar/auto-populate/", auto_populate_view, name="auto_populate"),
     path("my-style/add-typed/", add_typed_post_view, name="add_typed_post"),
     path("my-style/save-prefs/", save_onboarding_inline, name="save_onboarding_inline"),
     path("content/<int:item_id>/hero-image", create_hero_image, name="create_hero_image"),
     path("healthz/", lambda r: HttpResponse("ok", content_type="text/plain")),
+    path("ops/metrics/", ops_metrics_view, name="ops_metrics"),
 ]
 
 # Serve user-uploaded media from the mounted disk in ALL environments.